@@ -6,10 +6,9 @@ import time
 from dotenv import load_dotenv
 import json
 from dex_base import DexBase
-from util import sqrt_ratio_x96_to_price
+from tracing import span, traced
 
 load_dotenv()
-logging.basicConfig(filename='log', level=logging.INFO)
 
 with open('abi/aero_pool_abi.json') as f:
     UNISWAP_V3_PAIR_ABI = json.load(f)
@@ -21,6 +20,10 @@ with open('abi/erc20_abi.json') as f:
     ERC20_ABI = json.load(f)
 
 class AerodromeV3Dex(DexBase):
+    chain = 'base'
+    BATCHABLE_READS = ('slot0', 'liquidity')
+    PRICE_DECIMALS = 6
+
     def __init__(self, pair_address, quote_token_address='0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913'):
         self.pair_address = pair_address
         self.router_address = Web3.to_checksum_address('0xBE6D8f0d05cC4be24d5167a3eF062215bE6D18a5')  # Aerodrome V3 Router
@@ -31,23 +34,22 @@ class AerodromeV3Dex(DexBase):
         self.token0 = self.pair.functions.token0().call()
         self.token1 = self.pair.functions.token1().call()
         self.tick_spacing = self.pair.functions.tickSpacing().call()
+        self.fee = self.pair.functions.fee().call()
         self.token0_contract = self.web3.eth.contract(address=self.token0, abi=ERC20_ABI)
         self.token1_contract = self.web3.eth.contract(address=self.token1, abi=ERC20_ABI)
         self.token0_decimals = self.token0_contract.functions.decimals().call()
         self.token1_decimals = self.token1_contract.functions.decimals().call()
 
+    @traced(cat='dex')
     def get_price(self):
-        slot0 = self.pair.functions.slot0().call()
-        sqrtPriceX96 = slot0[0]
-        price = sqrt_ratio_x96_to_price(sqrtPriceX96, self.token0_decimals, self.token1_decimals)
-        # 如果quote token是token0，返回price（token1 per token0）；否则返回倒数（token0 per token1）
-        if self.quote_token_address == self.token0:
-            price_inv = 1 / price if price != 0 else 0
-            logging.info(f"Current price (quote token per base token): {price_inv}")
-            return round(price_inv, 6)
-        else:
-            logging.info(f"Current price (base token per quote token): {price}")
-            return round(price, 6)
+        with span('eth_call', cat='rpc', chain=self.chain):
+            slot0 = self.pair.functions.slot0().call()
+        price = self.price_from_sqrt_price(slot0[0])
+        logging.debug("Current price (quote token per base token): %s", price)
+        return price
+
+    def snapshot_reads(self):
+        return [self.pair.functions.slot0(), self.pair.functions.liquidity()]
 
     def swap(self, amount_in, token_in_is0, amount_out_min=0, sqrt_price_limit_x96=0):
         token_in = self.token0 if token_in_is0 else self.token1
@@ -55,19 +57,6 @@ class AerodromeV3Dex(DexBase):
         nonce = self.web3.eth.get_transaction_count(self.account.address)
         # 根据 token_in 动态选择 approve 的 token 合约
         approve_contract = self.token0_contract if token_in_is0 else self.token1_contract
-        approve_tx = approve_contract.functions.approve(self.router_address, amount_in).build_transaction({
-            'from': self.account.address,
-            'nonce': nonce
-        })
-        signed_approve = self.web3.eth.account.sign_transaction(approve_tx, self.account.key)
-        approve_hash = self.web3.eth.send_raw_transaction(signed_approve.raw_transaction)
-        logging.info(f"Approve tx: {approve_hash.hex()}")
-        res = self.web3.eth.wait_for_transaction_receipt(approve_hash)
-        if res.status == 1:
-            logging.info("Approve transaction succeeded!")
-        else:
-            logging.info("Approve transaction failed!")
-
         # Prepare swap params for exactInputSingle
         params = (
             token_in,           # tokenIn
@@ -86,10 +75,30 @@ class AerodromeV3Dex(DexBase):
             'gas': 10000000,
             'gasPrice': int(self.web3.eth.gas_price)
         })
+        # 先假定授权已完成来模拟，必然 revert 的 swap 连 approve 也不发送（失败时抛出 SwapReverted）
+        simulated = self.preflight(swap_tx, token_in, amount_in, amount_out_min, sqrt_price_limit_x96,
+                                   approve_contract=approve_contract)
+        approve_tx = approve_contract.functions.approve(self.router_address, amount_in).build_transaction({
+            'from': self.account.address,
+            'nonce': nonce
+        })
+        signed_approve = self.web3.eth.account.sign_transaction(approve_tx, self.account.key)
+        approve_hash = self.web3.eth.send_raw_transaction(signed_approve.raw_transaction)
+        logging.info("Approve tx: %s", approve_hash.hex())
+        res = self.wait_for_receipt(approve_hash)
+        if res.status == 1:
+            logging.info("Approve transaction succeeded!")
+        else:
+            logging.info("Approve transaction failed!")
+            # 模拟时假定了授权，approve 失败后 swap 必然 revert，不再发送
+            raise RuntimeError(f"Approve transaction {approve_hash.hex()} failed, swap not sent")
+        if simulated is None:
+            # 无法覆盖该 token 的授权时，在 approve 之后再模拟
+            self.preflight(swap_tx, token_in, amount_in, amount_out_min, sqrt_price_limit_x96)
         signed_swap = self.web3.eth.account.sign_transaction(swap_tx, self.account.key)
         swap_hash = self.web3.eth.send_raw_transaction(signed_swap.raw_transaction)
-        logging.info(f"Swap tx: {swap_hash.hex()}")
-        receipt = self.web3.eth.wait_for_transaction_receipt(swap_hash)
+        logging.info("Swap tx: %s", swap_hash.hex())
+        receipt = self.wait_for_receipt(swap_hash)
         if receipt.status == 1:
             logging.info("Swap transaction succeeded!")
         else:
@@ -0,0 +1,393 @@
+"""
+Columnar daily archive of the history tables, read back through mmap.
+
+    python archive.py export --root archive/             # append every settled UTC day not yet archived
+    python archive.py info --root archive/
+
+Each table gets a directory with one immutable file per UTC day and a
+`manifest.json` listing them. A file is
+
+    MAGIC | column blocks (8-byte aligned) | footer JSON | footer length (u32) | MAGIC
+
+Columns are typed little-endian arrays: times as int64 microseconds since the
+epoch, NUMERIC as float64, text as int32 codes into a dictionary kept in the
+footer. Blocks are zlib-compressed by default; with `--compression none` the
+reader hands out memoryviews straight into the mapped file (wrap them with
+`numpy.frombuffer` / `pyarrow.py_buffer` for zero-copy arrays). Either way a
+scan only touches the columns and days it asks for.
+"""
+import argparse
+import bisect
+import datetime
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import data
+from log_config import setup_logging
+
+
+MAGIC = b'RAVECOL1'
+FORMAT_VERSION = 1
+DEFAULT_ROOT = os.environ.get('ARCHIVE_ROOT', 'archive')
+MANIFEST = 'manifest.json'
+# Rows fetched per round trip from the server-side cursor
+FETCH_SIZE = 50_000
+# Days are archived only once this old: the daily kline fetch still backfills
+# recent days, and archive files are never rewritten (query_service caches
+# pages older than the same horizon forever)
+SETTLE_DAYS = int(os.environ.get('ARCHIVE_SETTLE_DAYS', '2'))
+_FOOTER_TAIL = struct.Struct('<I8s')
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+Column = Union[memoryview, array]
+
+
+@dataclass(frozen=True)
+class ColumnSpec:
+    name: str
+    typecode: str        # array typecode of the stored values ('i' codes for dictionary columns)
+    select: str          # SQL expression producing the value
+    dictionary: bool = False
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    table: str
+    time_column: str     # partitioning / ordering column, stored as int64 microseconds
+    order_by: str
+    columns: Tuple[ColumnSpec, ...]
+
+
+def _micros(column: str) -> str:
+    return f"(extract(epoch FROM {column}) * 1000000)::bigint"
+
+
+TABLES = {
+    'rave_dex_historical': TableSpec(
+        'rave_dex_historical', 'created_at', 'created_at, id', (
+            ColumnSpec('created_at', 'q', _micros('created_at')),
+            ColumnSpec('id', 'q', 'id'),
+            ColumnSpec('dex_type', 'h', 'dex_type'),
+            ColumnSpec('price', 'd', 'price::float8'),
+        )),
+    'token_pair_volume_hourly': TableSpec(
+        'token_pair_volume_hourly', 'open_time', 'open_time, token_pair, type', (
+            ColumnSpec('open_time', 'q', _micros('open_time')),
+            ColumnSpec('close_time', 'q', _micros('close_time')),
+            ColumnSpec('token_pair', 'i', 'token_pair', dictionary=True),
+            ColumnSpec('type', 'i', 'type', dictionary=True),
+            ColumnSpec('open_price', 'd', 'open_price::float8'),
+            ColumnSpec('close_price', 'd', 'close_price::float8'),
+            ColumnSpec('volume', 'd', 'volume::float8'),
+            ColumnSpec('quote_volume', 'd', 'quote_volume::float8'),
+        )),
+}
+
+
+def to_micros(value: datetime.datetime) -> int:
+    """Naive datetimes are taken as local time, like the rest of the collectors."""
+    if value.tzinfo is None:
+        value = value.astimezone()
+    delta = value - _EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def from_micros(value: int) -> datetime.datetime:
+    return _EPOCH + datetime.timedelta(microseconds=value)
+
+
+# ---- writing ------------------------------------------------------------------------
+
+def write_partition(path: str, spec: TableSpec, columns: Dict[str, array],
+                    dictionaries: Dict[str, List[str]], compression: str = 'zlib'):
+    """Write one column file atomically (temp file + rename); `columns` must share one length."""
+    if compression not in ('zlib', 'none'):
+        raise ValueError(f"Unknown compression {compression!r}")
+    rows = len(columns[spec.time_column])
+    footer = {
+        'version': FORMAT_VERSION, 'table': spec.table, 'rows': rows, 'time_column': spec.time_column,
+        'columns': [],
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        for column in spec.columns:
+            values = columns[column.name]
+            if sys.byteorder != 'little':
+                values = array(values.typecode, values)
+                values.byteswap()
+            raw = values.tobytes()
+            block = zlib.compress(raw, 1) if compression == 'zlib' else raw
+            f.write(b'\0' * (-f.tell() % 8))
+            entry = {
+                'name': column.name, 'type': column.typecode, 'offset': f.tell(),
+                'length': len(block), 'codec': compression,
+            }
+            if column.dictionary:
+                entry['dictionary'] = dictionaries[column.name]
+            footer['columns'].append(entry)
+            f.write(block)
+        times = columns[spec.time_column]
+        if rows:
+            footer['min_time'], footer['max_time'] = times[0], times[-1]
+        encoded = json.dumps(footer, separators=(',', ':')).encode()
+        f.write(encoded)
+        f.write(_FOOTER_TAIL.pack(len(encoded), MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _load_manifest(directory: str, table: str) -> dict:
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return {'table': table, 'exported_through': None, 'partitions': []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(directory: str, manifest: dict):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def _export_day(conn, spec: TableSpec, day: datetime.date, path: str, compression: str) -> int:
+    start = datetime.datetime.combine(day, datetime.time(), datetime.timezone.utc)
+    columns = {column.name: array(column.typecode) for column in spec.columns}
+    dictionaries = {column.name: {} for column in spec.columns if column.dictionary}
+    select = ', '.join(column.select for column in spec.columns)
+    # Named (server-side) cursor: rows stream in FETCH_SIZE batches instead of one result set
+    with conn.cursor(name=f'archive_{spec.table}') as cur:
+        cur.itersize = FETCH_SIZE
+        cur.execute(
+            f"SELECT {select} FROM {spec.table} "
+            f"WHERE {spec.time_column} >= %s AND {spec.time_column} < %s ORDER BY {spec.order_by}",
+            (start, start + datetime.timedelta(days=1)),
+        )
+        while True:
+            batch = cur.fetchmany(FETCH_SIZE)
+            if not batch:
+                break
+            for column, values in zip(spec.columns, zip(*batch)):
+                if column.dictionary:
+                    codes = dictionaries[column.name]
+                    values = [codes.setdefault(value, len(codes)) for value in values]
+                columns[column.name].extend(values)
+    # End the read transaction the named cursor ran in
+    conn.commit()
+    rows = len(columns[spec.time_column])
+    if rows:
+        write_partition(path, spec, columns, {name: list(codes) for name, codes in dictionaries.items()},
+                        compression)
+    return rows
+
+
+def export_table(conn, spec: TableSpec, root: str = DEFAULT_ROOT, compression: str = 'zlib',
+                 until: Optional[datetime.date] = None) -> int:
+    """
+    Archive every complete UTC day after the manifest's `exported_through`
+    (or from the oldest row on the first run) up to `until`, exclusive,
+    default SETTLE_DAYS before today. Existing files are never rewritten.
+    Returns rows written.
+    """
+    directory = os.path.join(root, spec.table)
+    os.makedirs(directory, exist_ok=True)
+    manifest = _load_manifest(directory, spec.table)
+    until = until or datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(days=SETTLE_DAYS)
+    if manifest['exported_through']:
+        day = datetime.date.fromisoformat(manifest['exported_through']) + datetime.timedelta(days=1)
+    else:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT min({spec.time_column}) FROM {spec.table}")
+            oldest = cur.fetchone()[0]
+        if oldest is None:
+            return 0
+        day = oldest.astimezone(datetime.timezone.utc).date()
+
+    total = 0
+    while day < until:
+        filename = f'{day.isoformat()}.col'
+        rows = _export_day(conn, spec, day, os.path.join(directory, filename), compression)
+        if rows:
+            manifest['partitions'].append({'day': day.isoformat(), 'file': filename, 'rows': rows})
+        manifest['exported_through'] = day.isoformat()
+        _save_manifest(directory, manifest)
+        logging.info("Archived %d %s rows for %s", rows, spec.table, day)
+        total += rows
+        day += datetime.timedelta(days=1)
+    return total
+
+
+# ---- reading ----------------------------------------------------------------------
+
+class PartitionFile:
+    """
+    One mapped column file. Uncompressed columns are memoryviews into the
+    mapping, so views must be released before `close()`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        length, magic = _FOOTER_TAIL.unpack_from(self._map, len(self._map) - _FOOTER_TAIL.size)
+        if self._map[:len(MAGIC)] != MAGIC or magic != MAGIC:
+            raise ValueError(f"{path} is not a column archive file")
+        footer_end = len(self._map) - _FOOTER_TAIL.size
+        self.footer = json.loads(self._map[footer_end - length:footer_end])
+        self.rows: int = self.footer['rows']
+        self._columns = {entry['name']: entry for entry in self.footer['columns']}
+        self._decompressed: Dict[str, array] = {}
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self._columns)
+
+    def column(self, name: str) -> Column:
+        entry = self._columns[name]
+        start, end = entry['offset'], entry['offset'] + entry['length']
+        if entry['codec'] == 'none' and sys.byteorder == 'little':
+            return memoryview(self._map)[start:end].cast(entry['type'])
+        values = self._decompressed.get(name)
+        if values is None:
+            raw = self._map[start:end]
+            values = array(entry['type'], zlib.decompress(raw) if entry['codec'] == 'zlib' else raw)
+            if sys.byteorder != 'little':
+                values.byteswap()
+            self._decompressed[name] = values
+        return values
+
+    def is_dictionary(self, name: str) -> bool:
+        return 'dictionary' in self._columns[name]
+
+    def dictionary(self, name: str) -> List[str]:
+        return self._columns[name]['dictionary']
+
+    def decode(self, name: str) -> List[str]:
+        """Dictionary column as Python strings (a copy)."""
+        dictionary = self.dictionary(name)
+        return [dictionary[code] for code in self.column(name)]
+
+    def time_slice(self, start: Optional[int], end: Optional[int]) -> slice:
+        """Row range with start <= time < end; rows are stored in time order."""
+        times = self.column(self.footer['time_column'])
+        lo = 0 if start is None else bisect.bisect_left(times, start)
+        hi = len(times) if end is None else bisect.bisect_left(times, end)
+        if isinstance(times, memoryview):
+            times.release()
+        return slice(lo, hi)
+
+    def close(self):
+        self._decompressed.clear()
+        try:
+            self._map.close()
+        except BufferError:
+            # A caller still holds a view; the mapping goes away with the last one
+            logging.debug("%s still has live column views, leaving it mapped", self.path)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveReader:
+    """Time-ranged, column-pruned scans over one table's archive directory."""
+
+    def __init__(self, table: str, root: str = DEFAULT_ROOT):
+        self.table = table
+        self.directory = os.path.join(root, table)
+        self.manifest = _load_manifest(self.directory, table)
+
+    def partitions(self, start: Optional[datetime.datetime] = None,
+                   end: Optional[datetime.datetime] = None) -> List[dict]:
+        """Manifest entries whose UTC day overlaps [start, end)."""
+        first = start.astimezone(datetime.timezone.utc).date() if start else None
+        last = end.astimezone(datetime.timezone.utc).date() if end else None
+        return [
+            entry for entry in self.manifest['partitions']
+            if (first is None or entry['day'] >= first.isoformat())
+            and (last is None or entry['day'] <= last.isoformat())
+        ]
+
+    def scan(self, columns: Sequence[str], start: Optional[datetime.datetime] = None,
+             end: Optional[datetime.datetime] = None) -> Iterator[Dict[str, Column]]:
+        """
+        Yield {column: values} per day file, trimmed to [start, end). Numeric
+        values are only valid until the next iteration, when the file is
+        unmapped; copy them (`array(view)`, `numpy.array(view)`) to keep them.
+        Dictionary codes are per file, so text columns come back as lists of str.
+        """
+        start_us = to_micros(start) if start else None
+        end_us = to_micros(end) if end else None
+        for entry in self.partitions(start, end):
+            partition = PartitionFile(os.path.join(self.directory, entry['file']))
+            rows = partition.time_slice(start_us, end_us)
+            batch = {
+                name: partition.decode(name)[rows] if partition.is_dictionary(name) else partition.column(name)[rows]
+                for name in columns
+            }
+            try:
+                yield batch
+            finally:
+                for values in batch.values():
+                    if isinstance(values, memoryview):
+                        values.release()
+                del batch
+                partition.close()
+
+    def read(self, columns: Sequence[str], start: Optional[datetime.datetime] = None,
+             end: Optional[datetime.datetime] = None) -> Dict[str, array]:
+        """Concatenated copy of `columns` over [start, end); text columns are lists of str."""
+        result: Dict[str, Union[array, List[str]]] = {}
+        for batch in self.scan(columns, start, end):
+            for name, values in batch.items():
+                if name in result:
+                    result[name].extend(values)
+                elif isinstance(values, list):
+                    result[name] = values
+                else:
+                    result[name] = array(values.format if isinstance(values, memoryview) else values.typecode,
+                                         values)
+        return result
+
+
+def _info(root: str):
+    for table in TABLES:
+        manifest = _load_manifest(os.path.join(root, table), table)
+        rows = sum(entry['rows'] for entry in manifest['partitions'])
+        print(f"{table}: {len(manifest['partitions'])} files, {rows} rows, "
+              f"exported through {manifest['exported_through']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=('export', 'info'))
+    parser.add_argument('--root', default=DEFAULT_ROOT)
+    parser.add_argument('--table', choices=sorted(TABLES), action='append', help='default: all tables')
+    parser.add_argument('--compression', choices=('zlib', 'none'), default='zlib')
+    args = parser.parse_args()
+
+    setup_logging(json_format=False, console=True)
+    if args.command == 'info':
+        _info(args.root)
+    else:
+        conn = data.get_conn()
+        try:
+            for name in args.table or TABLES:
+                export_table(conn, TABLES[name], args.root, args.compression)
+        finally:
+            conn.close()
+        _info(args.root)
@@ -1,6 +1,9 @@
 import json
 import math
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import logging
 from eth_abi import encode
@@ -8,8 +11,8 @@ from eth_account import Account
 from eth_account.messages import encode_defunct
 from web3 import Web3
 import dotenv
-
-logging.basicConfig(level=logging.INFO)
+from metrics import time_http
+from tracing import traced
 
 
 dotenv.load_dotenv()
@@ -24,6 +27,17 @@ priKey = dotenv.get_key(".env", "PRIVATE_KEY")
 
 host = 'https://fapi.asterdex.com'
 
+# 交易所批量接口单次上限
+MAX_BATCH_ORDERS = 5
+MAX_BATCH_CANCEL = 10
+BATCH_WORKERS = 8
+# 明确表示接口不支持的错误码（UNSUPPORTED_OPERATION），只有这种情况才会逐单重新提交
+BATCH_UNSUPPORTED_CODES = (-1020,)
+ORDER_NOT_FOUND_CODE = -2013
+
+_nonce_lock = threading.Lock()
+_last_nonce = 0
+
 def place_order(symbol, side, quantity, price, position_side='BOTH', order_type='LIMIT', time_in_force='GTC'):
     api = {
         'url': '/fapi/v3/order',
@@ -45,11 +59,11 @@ def place_order(symbol, side, quantity, price, position_side='BOTH', order_type=
         order_id = data.get('orderId')
         status = data.get('status')
         if order_id is None or status is None:
-            logging.error(f"place_order failed: orderId or status missing, response: {data}")
+            logging.error("place_order failed: orderId or status missing, response: %s", data)
             raise ValueError("place_order failed: orderId or status missing")
         return order_id, status
     except Exception as e:
-        logging.error(f"Error parsing response: {e}")
+        logging.error("Error parsing response: %s", e)
         raise ValueError("Error parsing response")
 def get_order(symbol, side, order_id, order_type='LIMIT'):
     api = {
@@ -87,17 +101,178 @@ def cancel_order(symbol, order_id):
     }
     return call(api)
 
+# 批量下单
+# orders: [{'symbol', 'side', 'quantity', 'price', 可选 'position_side', 'order_type', 'time_in_force'}, ...]
+# 返回与orders一一对应的结果列表：成功为订单dict，失败为 {'code', 'msg'}
+def place_batch_orders(orders):
+    items = [
+        {
+            'symbol': order['symbol'],
+            'positionSide': order.get('position_side', 'BOTH'),
+            'type': order.get('order_type', 'LIMIT'),
+            'side': order['side'],
+            'timeInForce': order.get('time_in_force', 'GTC'),
+            'quantity': order['quantity'],
+            'price': order['price'],
+        }
+        for order in orders
+    ]
+    chunks = [items[i:i + MAX_BATCH_ORDERS] for i in range(0, len(items), MAX_BATCH_ORDERS)]
+    with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(chunks) or 1)) as executor:
+        chunk_results = list(executor.map(_place_order_chunk, chunks))
+    return [result for chunk in chunk_results for result in chunk]
+
+def _place_order_chunk(items):
+    # 先为每单指定 newClientOrderId，批量请求结果不明确时可以按该 id 查询对账，避免重复下单
+    items = [dict(item, newClientOrderId=item.get('newClientOrderId') or _new_client_order_id()) for item in items]
+    api = {
+        'url': '/fapi/v3/batchOrders',
+        'method': 'POST',
+        'params': {'batchOrders': items}
+    }
+    try:
+        res = call_response(api)
+    except requests.exceptions.RequestException as e:
+        logging.error("batchOrders request failed, reconciling by client order id: %s", e)
+        return _reconcile_orders(items)
+    try:
+        data = res.json()
+    except ValueError:
+        data = None
+    if isinstance(data, list) and len(data) == len(items):
+        return data
+    if res.status_code == 404 or (isinstance(data, dict) and data.get('code') in BATCH_UNSUPPORTED_CODES):
+        # 交易所明确表示不支持批量接口，订单未被接受，可以逐单下单
+        logging.warning("batchOrders unsupported (%s), falling back to single orders", data)
+        return _dispatch_concurrently(_place_single_order, items)
+    if isinstance(data, dict) and data.get('code') is not None and res.status_code < 500:
+        # 整批被明确拒绝（参数错误等），逐单重试也会被拒
+        logging.error("batchOrders rejected: %s", data)
+        return [data] * len(items)
+    logging.error("Ambiguous batchOrders reply (HTTP %s): %s, reconciling by client order id",
+                  res.status_code, res.text[:200])
+    return _reconcile_orders(items)
+
+def _new_client_order_id():
+    return 'rb' + uuid.uuid4().hex
+
+def _reconcile_orders(items):
+    """批量下单结果不明确时逐单查询 newClientOrderId：已存在的直接返回，确认不存在的才重新下单"""
+    def reconcile(item):
+        data = json.loads(get_order_by_client_id(item['symbol'], item['newClientOrderId']))
+        if data.get('orderId') is not None:
+            return data
+        if data.get('code') == ORDER_NOT_FOUND_CODE:
+            return _place_single_order(item)
+        # 查询本身失败，订单状态未知，不重试以免重复下单
+        return {'code': data.get('code'), 'msg': f"order state unknown: {data.get('msg')}"}
+    return _dispatch_concurrently(reconcile, items)
+
+def get_order_by_client_id(symbol, client_order_id):
+    api = {
+        'url': '/fapi/v3/order',
+        'method': 'GET',
+        'params': {
+            'symbol': symbol,
+            'origClientOrderId': client_order_id
+        }
+    }
+    return call(api)
+
+def _place_single_order(item):
+    return json.loads(call({'url': '/fapi/v3/order', 'method': 'POST', 'params': item}))
+
+# 批量撤单，返回与order_ids一一对应的结果列表
+def cancel_batch_orders(symbol, order_ids):
+    chunks = [order_ids[i:i + MAX_BATCH_CANCEL] for i in range(0, len(order_ids), MAX_BATCH_CANCEL)]
+    with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(chunks) or 1)) as executor:
+        chunk_results = list(executor.map(lambda chunk: _cancel_order_chunk(symbol, chunk), chunks))
+    return [result for chunk in chunk_results for result in chunk]
+
+def _cancel_order_chunk(symbol, order_ids):
+    # 预先序列化为数字数组：_trim_dict 会把列表元素转成字符串
+    order_id_list = json.dumps([int(order_id) for order_id in order_ids], separators=(',', ':'))
+    api = {
+        'url': '/fapi/v3/batchOrders',
+        'method': 'DELETE',
+        'params': {'symbol': symbol, 'orderIdList': order_id_list}
+    }
+    try:
+        data = json.loads(call(api))
+    except Exception as e:
+        logging.error("batch cancel request failed: %s", e)
+        data = None
+    if isinstance(data, list) and len(data) == len(order_ids):
+        return data
+    logging.warning("batch cancel unavailable (%s), falling back to single cancels", data)
+    return _dispatch_concurrently(lambda order_id: json.loads(cancel_order(symbol, order_id)), order_ids)
+
+# 撤销某交易对全部挂单
+def cancel_all_orders(symbol):
+    api = {
+        'url': '/fapi/v3/allOpenOrders',
+        'method': 'DELETE',
+        'params': {'symbol': symbol}
+    }
+    return call(api)
+
+def _dispatch_concurrently(fn, items):
+    def run(item):
+        try:
+            return fn(item)
+        except Exception as e:
+            return {'code': None, 'msg': str(e)}
+    with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(items) or 1)) as executor:
+        return list(executor.map(run, items))
+
+# 账户余额
+def get_balance():
+    return call({'url': '/fapi/v3/balance', 'method': 'GET', 'params': {}})
+
+# 持仓
+def get_position_risk(symbol=None):
+    return call({'url': '/fapi/v3/positionRisk', 'method': 'GET', 'params': {'symbol': symbol} if symbol else {}})
+
+# 用户数据流 listenKey：创建 / 延长有效期(60分钟) / 关闭
+def start_user_stream():
+    data = json.loads(call({'url': '/fapi/v3/listenKey', 'method': 'POST', 'params': {}}))
+    listen_key = data.get('listenKey')
+    if listen_key is None:
+        raise ValueError(f"start_user_stream failed: {data}")
+    return listen_key
+
+def keepalive_user_stream():
+    res = call_response({'url': '/fapi/v3/listenKey', 'method': 'PUT', 'params': {}})
+    # listenKey 过期或无效时抛出异常，由调用方重新创建
+    res.raise_for_status()
+    return res.text
+
+def close_user_stream():
+    return call({'url': '/fapi/v3/listenKey', 'method': 'DELETE', 'params': {}})
+
 # 获取最新价格
+@traced(cat='http')
 def get_latest_price(symbol):
     url = host + '/fapi/v1/ticker/price'
     params = {'symbol': symbol}
-    res = requests.get(url, params=params)
+    with time_http('aster_future', '/fapi/v1/ticker/price'):
+        res = requests.get(url, params=params)
     try:
         data = res.json()
         return data.get('price')
     except Exception as e:
-        print(f"Error parsing price response: {e}")
+        logging.error("Error parsing price response: %s", e)
         return None
+
+# 获取深度快照
+def get_depth(symbol, limit=1000):
+    url = host + '/fapi/v1/depth'
+    params = {'symbol': symbol, 'limit': limit}
+    res = requests.get(url, params=params, timeout=10)
+    res.raise_for_status()
+    return res.json()
+
+@traced(cat='http')
 def get_latest_funding_rate(symbol):
     """
     获取最新资金费率
@@ -107,26 +282,62 @@ def get_latest_funding_rate(symbol):
     url = host + '/fapi/v1/premiumIndex'
     params = {'symbol': symbol}
     try:
-        res = requests.get(url, params=params)
+        with time_http('aster_future', '/fapi/v1/premiumIndex'):
+            res = requests.get(url, params=params)
         data = res.json()
         market_price = round(float(data.get('markPrice', 0)), 6)
         index_price = round(float(data.get('indexPrice', 0)), 6)
         founding_rate = round(float(data.get('lastFundingRate', 0)), 6)
         return market_price, index_price, founding_rate
     except Exception as e:
-        logging.error(f"Error fetching funding rate: {e}")
+        logging.error("Error fetching funding rate: %s", e)
         return None
 
+@traced(cat='http')
+def get_all_premium_index():
+    """
+    不带 symbol 调用 /fapi/v1/premiumIndex，一次返回全部合约
+    :return: {symbol: (mark_price, index_price, funding_rate)}，请求失败时返回空 dict
+    """
+    url = host + '/fapi/v1/premiumIndex'
+    try:
+        with time_http('aster_future', '/fapi/v1/premiumIndex:all'):
+            res = requests.get(url, timeout=10)
+        res.raise_for_status()
+        return {
+            item['symbol']: (
+                round(float(item.get('markPrice', 0)), 6),
+                round(float(item.get('indexPrice', 0)), 6),
+                round(float(item.get('lastFundingRate', 0)), 6),
+            )
+            for item in res.json()
+        }
+    except Exception as e:
+        logging.error("Error fetching premium index for all symbols: %s", e)
+        return {}
+
 def call(api):
-    nonce = math.trunc(time.time() * 1000000)
+    return call_response(api).text
+
+# 返回原始 Response，需要区分 HTTP 状态码时使用
+def call_response(api):
+    nonce = _next_nonce()
     my_dict = api['params']
     return send(api['url'], api['method'], sign(my_dict, nonce))
 
+# 并发请求时保证nonce严格递增
+def _next_nonce():
+    global _last_nonce
+    with _nonce_lock:
+        _last_nonce = max(math.trunc(time.time() * 1000000), _last_nonce + 1)
+        return _last_nonce
+
 def sign(my_dict,nonce):
     my_dict = {key: value for key, value in my_dict.items() if  value is not None}
     my_dict['recvWindow'] = 50000
     my_dict['timestamp'] = int(round(time.time()*1000))
-    msg = trim_param(my_dict,nonce)
+    my_dict = _trim_dict(my_dict)
+    msg = _params_hash(my_dict, nonce)
     signable_msg = encode_defunct(hexstr=msg)
     signed_message = Account.sign_message(signable_message=signable_msg, private_key=priKey)
     my_dict['nonce'] = nonce
@@ -136,15 +347,22 @@ def sign(my_dict,nonce):
     return  my_dict
 
 def trim_param(my_dict,nonce) -> str:
-    _trim_dict(my_dict)
-    json_str = json.dumps(my_dict, sort_keys=True).replace(' ', '').replace('\'','\"')
+    return _params_hash(_trim_dict(my_dict), nonce)
+
+def _params_hash(trimmed, nonce) -> str:
+    json_str = signing_json(trimmed)
     encoded = encode(['string', 'address', 'address', 'uint256'], [json_str, user, signer, nonce])
     keccak_hex =Web3.keccak(encoded).hex()
     return keccak_hex
 
+# 参与签名的字符串：已trim的参数按key排序序列化
+def signing_json(trimmed) -> str:
+    return json.dumps(trimmed, sort_keys=True).replace(' ', '').replace('\'','\"')
+
+# 返回新dict，不修改传入的参数（嵌套dict/list序列化为JSON字符串）
 def _trim_dict(my_dict) :
-    for key in my_dict:
-        value = my_dict[key]
+    trimmed = {}
+    for key, value in my_dict.items():
         if isinstance(value, list):
             new_value = []
             for item in value:
@@ -152,31 +370,34 @@ def _trim_dict(my_dict) :
                     new_value.append(json.dumps(_trim_dict(item)))
                 else:
                     new_value.append(str(item))
-            my_dict[key] = json.dumps(new_value)
+            trimmed[key] = json.dumps(new_value)
             continue
         if isinstance(value, dict):
-            my_dict[key] = json.dumps(_trim_dict(value))
+            trimmed[key] = json.dumps(_trim_dict(value))
             continue
-        my_dict[key] = str(value)
+        trimmed[key] = str(value)
 
-    return my_dict
+    return trimmed
 
+@traced(cat='http')
 def send(url, method, my_dict):
-    url = host + url
+    with time_http('aster_future', url):
+        return _send(host + url, method, my_dict)
+
+def _send(url, method, my_dict):
     if method == 'POST':
         headers = {
             'Content-Type': 'application/x-www-form-urlencoded',
             'User-Agent': 'PythonApp/1.0'
         }
-        res = requests.post(url, data=my_dict, headers=headers)
-        return res.text
+        return requests.post(url, data=my_dict, headers=headers)
     if method == 'GET':
-        res = requests.get(url, params=my_dict)
-        return res.text
+        return requests.get(url, params=my_dict)
     if method == 'DELETE':
-        res = requests.delete(url, data=my_dict)
-        return res.text
-
+        return requests.delete(url, data=my_dict)
+    if method == 'PUT':
+        return requests.put(url, data=my_dict)
+    raise ValueError(f"Unsupported method {method}")
 
 
 # if __name__ == '__main__':
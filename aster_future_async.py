@@ -0,0 +1,180 @@
+"""Asyncio client for signed Aster futures requests over a pooled connection."""
+import json
+import logging
+import threading
+import time
+from typing import List, Optional
+
+import aiohttp
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from eth_utils import keccak, to_canonical_address
+
+import aster_future
+from aster_future import _trim_dict, signing_json
+
+
+class SigningContext:
+    """
+    Everything in `aster_future.sign` that does not depend on the request, prepared once.
+
+    The key is parsed into a LocalAccount a single time and the static part of the
+    `abi.encode(string, address, address, uint256)` payload (string offset, user,
+    signer) is pre-encoded, so per request only the JSON body, the nonce and the
+    ECDSA signature are computed. Nonces are strictly increasing so concurrent
+    requests in the same microsecond never collide.
+    """
+
+    def __init__(self, user: str, signer: str, private_key: str, recv_window: int = 50000):
+        self.user = user
+        self.signer = signer
+        self.recv_window = recv_window
+        self._account = Account.from_key(private_key)
+        # Head of the ABI encoding: offset of the dynamic string (4 words), then both addresses
+        self._head = (
+            (128).to_bytes(32, 'big')
+            + to_canonical_address(user).rjust(32, b'\0')
+            + to_canonical_address(signer).rjust(32, b'\0')
+        )
+        self._last_nonce = 0
+        self._nonce_lock = threading.Lock()
+
+    def next_nonce(self) -> int:
+        with self._nonce_lock:
+            nonce = max(int(time.time() * 1000000), self._last_nonce + 1)
+            self._last_nonce = nonce
+            return nonce
+
+    def params_hash(self, trimmed: dict, nonce: int) -> bytes:
+        """keccak(abi.encode(json, user, signer, nonce)), same digest as `aster_future.trim_param`."""
+        body = signing_json(trimmed).encode()
+        padding = b'\0' * (-len(body) % 32)
+        encoded = (
+            self._head + nonce.to_bytes(32, 'big')
+            + len(body).to_bytes(32, 'big') + body + padding
+        )
+        return keccak(encoded)
+
+    def sign(self, params: dict) -> dict:
+        """Return the form fields for a signed request, like `aster_future.sign`."""
+        my_dict = {key: value for key, value in params.items() if value is not None}
+        my_dict['recvWindow'] = self.recv_window
+        my_dict['timestamp'] = int(round(time.time() * 1000))
+        my_dict = _trim_dict(my_dict)
+        nonce = self.next_nonce()
+        digest = self.params_hash(my_dict, nonce)
+        signed_message = self._account.sign_message(encode_defunct(primitive=digest))
+        my_dict['nonce'] = nonce
+        my_dict['user'] = self.user
+        my_dict['signer'] = self.signer
+        my_dict['signature'] = '0x' + signed_message.signature.hex()
+        return my_dict
+
+
+class AsyncAsterFutureClient:
+    """
+    Async counterpart of the `aster_future` order helpers.
+
+    All requests share one aiohttp session (keep-alive pool of up to
+    `max_connections` sockets), so concurrent calls issued with
+    `asyncio.gather` are pipelined over warm connections instead of a new TCP/TLS
+    handshake per request.
+
+    Usage:
+        async with AsyncAsterFutureClient() as client:
+            results = await asyncio.gather(*(client.place_order(...) for ...))
+    """
+
+    def __init__(self, user: Optional[str] = None, signer: Optional[str] = None,
+                 private_key: Optional[str] = None, host: str = aster_future.host,
+                 max_connections: int = 10, timeout: float = 10):
+        self.host = host
+        self.signing = SigningContext(
+            user or aster_future.user, signer or aster_future.signer, private_key or aster_future.priKey
+        )
+        self.max_connections = max_connections
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=self.timeout, headers={'User-Agent': 'PythonApp/1.0'}
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def call(self, url: str, method: str, params: dict):
+        """Sign and send one request; returns the decoded JSON body."""
+        my_dict = self.signing.sign(params)
+        session = self._get_session()
+        if method == 'GET':
+            request = session.get(self.host + url, params=my_dict)
+        else:
+            request = session.request(method, self.host + url, data=my_dict)
+        async with request as res:
+            text = await res.text()
+        try:
+            return json.loads(text)
+        except ValueError:
+            logging.error("Non-JSON response from %s %s: %s", method, url, text)
+            raise
+
+    async def place_order(self, symbol, side, quantity, price, position_side='BOTH', order_type='LIMIT',
+                          time_in_force='GTC'):
+        data = await self.call('/fapi/v3/order', 'POST', {
+            'symbol': symbol,
+            'positionSide': position_side,
+            'type': order_type,
+            'side': side,
+            'timeInForce': time_in_force,
+            'quantity': quantity,
+            'price': price,
+        })
+        order_id = data.get('orderId') if isinstance(data, dict) else None
+        status = data.get('status') if isinstance(data, dict) else None
+        if order_id is None or status is None:
+            logging.error("place_order failed: orderId or status missing, response: %s", data)
+            raise ValueError("place_order failed: orderId or status missing")
+        return order_id, status
+
+    async def get_order(self, symbol, side, order_id, order_type='LIMIT'):
+        return await self.call('/fapi/v3/order', 'GET', {
+            'symbol': symbol,
+            'side': side,
+            'type': order_type,
+            'orderId': order_id,
+        })
+
+    async def cancel_order(self, symbol, order_id):
+        return await self.call('/fapi/v3/order', 'DELETE', {
+            'symbol': symbol,
+            'orderId': order_id,
+        })
+
+    async def get_open_orders(self, symbol=None) -> List[dict]:
+        return await self.call('/fapi/v3/openOrders', 'GET', {'symbol': symbol} if symbol else {})
+
+
+# if __name__ == '__main__':
+#     async def demo():
+#         async with AsyncAsterFutureClient() as client:
+#             orders = await asyncio.gather(
+#                 client.place_order('NEIROUSDT', 'BUY', '200000', 0.00010),
+#                 client.place_order('NEIROUSDT', 'BUY', '200000', 0.00009),
+#             )
+#             print(await client.get_open_orders('NEIROUSDT'))
+#             await asyncio.gather(*(client.cancel_order('NEIROUSDT', order_id) for order_id, _ in orders))
+#     asyncio.run(demo())
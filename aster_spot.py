@@ -1,11 +1,14 @@
 import time
 import hmac
+import json
+from concurrent.futures import ThreadPoolExecutor
 import hashlib
 import requests
 import dotenv
 import logging
+from metrics import time_http
+from tracing import traced
 
-logging.basicConfig(level=logging.INFO)
 
 # API base url for spot trading
 host = 'https://sapi.asterdex.com'
@@ -14,6 +17,8 @@ dotenv.load_dotenv()
 signer = dotenv.get_key(".env", "SPOT_API_KEY")
 priKey = dotenv.get_key(".env", "SPOT_API_SECRET")
 
+BATCH_WORKERS = 8
+
 # 签名方法（HMAC SHA256），保持参数顺序与实际请求一致
 def sign(params, secret):
     # 只签名未带signature的参数，且顺序与params一致
@@ -49,16 +54,16 @@ def place_order(symbol, side, quantity=None, quoteOrderQty=None, price=None, new
     url = host + '/api/v1/order'
     res = requests.post(url, data=params, headers=headers)
     try:
-        print(res.text)
+        logging.debug("place_order response: %s", res.text)
         data = res.json()
         order_id = data.get('orderId')
         status = data.get('status')
         if order_id is None or status is None:
-            logging.error(f"place_order failed: orderId or status missing, response: {data}")
+            logging.error("place_order failed: orderId or status missing, response: %s", data)
             raise ValueError("place_order failed: orderId or status missing")
         return order_id, status
     except Exception as e:
-        logging.error(f"Error parsing response: {e}")
+        logging.error("Error parsing response: %s", e)
         raise ValueError("Error parsing response")
 
 # 撤销订单
@@ -124,10 +129,88 @@ def get_open_orders(symbol=None):
     res = requests.get(url, params=params, headers=headers)
     return res.text
 
+# 账户信息（余额）
+def get_account():
+    params = {
+        'recvWindow': 5000,
+        'timestamp': int(round(time.time()*1000))
+    }
+    params['signature'] = sign(params, priKey)
+    headers = {
+        'X-MBX-APIKEY': signer,
+        'User-Agent': 'PythonApp/1.0'
+    }
+    url = host + '/api/v1/account'
+    res = requests.get(url, params=params, headers=headers)
+    return res.text
+
+# 用户数据流 listenKey：创建 / 延长有效期(60分钟) / 关闭，只需要API KEY
+def start_user_stream():
+    headers = {'X-MBX-APIKEY': signer, 'User-Agent': 'PythonApp/1.0'}
+    res = requests.post(host + '/api/v1/listenKey', headers=headers)
+    data = res.json()
+    listen_key = data.get('listenKey')
+    if listen_key is None:
+        raise ValueError(f"start_user_stream failed: {data}")
+    return listen_key
+
+def keepalive_user_stream(listen_key):
+    headers = {'X-MBX-APIKEY': signer, 'User-Agent': 'PythonApp/1.0'}
+    res = requests.put(host + '/api/v1/listenKey', data={'listenKey': listen_key}, headers=headers)
+    # listenKey 过期或无效时抛出异常，由调用方重新创建
+    res.raise_for_status()
+    return res.text
+
+def close_user_stream(listen_key):
+    headers = {'X-MBX-APIKEY': signer, 'User-Agent': 'PythonApp/1.0'}
+    res = requests.delete(host + '/api/v1/listenKey', data={'listenKey': listen_key}, headers=headers)
+    return res.text
+
+# 批量下单：现货没有批量下单接口，用线程池并发逐单提交（每单一次独立请求）
+# orders: [{place_order 的关键字参数}, ...]
+# 返回与orders一一对应的结果列表：成功为 {'orderId', 'status'}，失败为 {'code', 'msg'}
+def place_batch_orders(orders):
+    def place(order):
+        order_id, status = place_order(**order)
+        return {'orderId': order_id, 'status': status}
+    return _dispatch_concurrently(place, orders)
+
+# 批量撤单，返回与order_ids一一对应的结果列表
+def cancel_batch_orders(symbol, order_ids):
+    return _dispatch_concurrently(lambda order_id: json.loads(cancel_order(symbol, order_id=order_id)), order_ids)
+
+# 撤销某交易对全部挂单（单次请求）
+def cancel_all_orders(symbol):
+    params = {
+        'symbol': symbol,
+        'recvWindow': 5000,
+        'timestamp': int(round(time.time()*1000))
+    }
+    params['signature'] = sign(params, priKey)
+    headers = {
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'X-MBX-APIKEY': signer,
+        'User-Agent': 'PythonApp/1.0'
+    }
+    url = host + '/api/v1/allOpenOrders'
+    res = requests.delete(url, data=params, headers=headers)
+    return res.text
+
+def _dispatch_concurrently(fn, items):
+    def run(item):
+        try:
+            return fn(item)
+        except Exception as e:
+            return {'code': None, 'msg': str(e)}
+    with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(items) or 1)) as executor:
+        return list(executor.map(run, items))
+
+@traced(cat='http')
 def get_latest_price_spot(symbol):
     url = host + '/api/v1/ticker/price'
     params = {'symbol': symbol}
-    res = requests.get(url, params=params)
+    with time_http('aster_spot', '/api/v1/ticker/price'):
+        res = requests.get(url, params=params)
     try:
         data = res.json()
         return round(float(data.get('price', 0)), 6)
@@ -135,6 +218,30 @@ def get_latest_price_spot(symbol):
         logging.error("Error parsing spot price response: %s", e)
         return None
 
+@traced(cat='http')
+def get_all_spot_prices():
+    """
+    不带 symbol 调用 /api/v1/ticker/price，一次返回全部交易对
+    :return: {symbol: price}，请求失败时返回空 dict
+    """
+    url = host + '/api/v1/ticker/price'
+    try:
+        with time_http('aster_spot', '/api/v1/ticker/price:all'):
+            res = requests.get(url, timeout=10)
+        res.raise_for_status()
+        return {item['symbol']: round(float(item['price']), 6) for item in res.json() if item.get('price')}
+    except Exception as e:
+        logging.error("Error fetching all spot prices: %s", e)
+        return {}
+
+# 获取深度快照
+def get_depth(symbol, limit=1000):
+    url = host + '/api/v1/depth'
+    params = {'symbol': symbol, 'limit': limit}
+    res = requests.get(url, params=params, timeout=10)
+    res.raise_for_status()
+    return res.json()
+
 
 #     # 下单 LIMIT
 #     order_id, status = place_order('CDLUSDT', 'BUY', quantity='200', price='0.04')
@@ -0,0 +1,363 @@
+"""Order, fill, balance and position state for Aster accounts, fed by user-data streams."""
+import json
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+import aster_future
+import aster_spot
+from aster_ws import FUTURES_WS_HOST, SPOT_WS_HOST, StreamConnection
+
+
+# listenKey is valid for 60 minutes; renew well before that
+KEEPALIVE_INTERVAL = 30 * 60
+MAX_FILLS_PER_SYMBOL = 1000
+MAX_CLOSED_ORDERS = 5000
+FINAL_ORDER_STATUSES = {'FILLED', 'CANCELED', 'EXPIRED', 'REJECTED'}
+
+
+@dataclass
+class OrderState:
+    market: str
+    symbol: str
+    order_id: int
+    client_order_id: str
+    side: str
+    order_type: str
+    status: str
+    price: float
+    orig_qty: float
+    executed_qty: float
+    avg_price: float
+    position_side: Optional[str]
+    update_time: int
+
+
+@dataclass
+class Fill:
+    market: str
+    symbol: str
+    order_id: int
+    trade_id: int
+    side: str
+    price: float
+    qty: float
+    commission: float
+    commission_asset: Optional[str]
+    is_maker: bool
+    time: int
+
+
+@dataclass
+class Balance:
+    market: str
+    asset: str
+    free: float
+    locked: float
+
+
+@dataclass
+class Position:
+    symbol: str
+    position_side: str
+    amount: float
+    entry_price: float
+    unrealized_pnl: float
+
+
+class AccountStateTracker:
+    """
+    In-memory account state for one market ('spot' or 'future').
+
+    On start (and after every reconnect) the state is seeded once from REST, then
+    kept current from the user-data stream: executionReport /
+    outboundAccountPosition on spot, ORDER_TRADE_UPDATE / ACCOUNT_UPDATE on
+    futures. Open orders are indexed by order id, client order id and symbol;
+    fills are kept per symbol (bounded). The listenKey is kept alive every
+    `KEEPALIVE_INTERVAL` seconds and replaced when the exchange expires it.
+    """
+
+    def __init__(self, market: str):
+        if market not in ('spot', 'future'):
+            raise ValueError(f"Unknown market: {market}")
+        self.market = market
+        self._lock = threading.RLock()
+        self._orders: Dict[int, OrderState] = {}
+        self._orders_by_client_id: Dict[str, int] = {}
+        self._open_by_symbol: Dict[str, Set[int]] = {}
+        # Closed orders stay queryable until MAX_CLOSED_ORDERS newer ones have closed,
+        # including orders first seen already final (MARKET / IOC fills)
+        self._closed_order_ids: Deque[int] = deque()
+        self._closed_queued: Set[int] = set()
+        self._fills: Dict[str, Deque[Fill]] = {}
+        self._balances: Dict[str, Balance] = {}
+        self._positions: Dict[Tuple[str, str], Position] = {}
+        self._listen_key: Optional[str] = None
+        self._connection: Optional[StreamConnection] = None
+        self._stopped = threading.Event()
+        self._keepalive_thread = None
+
+    # ---- lifecycle -------------------------------------------------------
+
+    def start(self):
+        self._stopped.clear()
+        self._open_stream()
+        self._keepalive_thread = threading.Thread(
+            target=self._keepalive_loop, name=f'aster-{self.market}-listenkey', daemon=True
+        )
+        self._keepalive_thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._connection is not None:
+            self._connection.stop()
+        if self._listen_key is not None:
+            try:
+                if self.market == 'spot':
+                    aster_spot.close_user_stream(self._listen_key)
+                else:
+                    aster_future.close_user_stream()
+            except Exception as e:
+                logging.error("Closing listenKey failed (%s): %s", self.market, e)
+            self._listen_key = None
+
+    def _open_stream(self):
+        if self.market == 'spot':
+            self._listen_key = aster_spot.start_user_stream()
+            host = SPOT_WS_HOST
+        else:
+            self._listen_key = aster_future.start_user_stream()
+            host = FUTURES_WS_HOST
+        if self._connection is not None:
+            self._connection.stop()
+        self._connection = StreamConnection(
+            f"{host}/ws/{self._listen_key}", self._on_message,
+            name=f'aster-{self.market}-user', on_open=self._bootstrap,
+        )
+        self._connection.start()
+
+    def _keepalive_loop(self):
+        while not self._stopped.wait(KEEPALIVE_INTERVAL):
+            try:
+                if self.market == 'spot':
+                    aster_spot.keepalive_user_stream(self._listen_key)
+                else:
+                    aster_future.keepalive_user_stream()
+            except Exception as e:
+                logging.error("listenKey keepalive failed (%s), opening a new stream: %s", self.market, e)
+                self._renew()
+
+    def _renew(self):
+        try:
+            self._open_stream()
+        except Exception as e:
+            logging.error("Opening user stream failed (%s): %s", self.market, e)
+
+    def _bootstrap(self):
+        """Seed state from REST; events missed while disconnected are covered by this."""
+        if self.market == 'spot':
+            orders = json.loads(aster_spot.get_open_orders())
+            account = json.loads(aster_spot.get_account())
+            balances = [Balance('spot', b['asset'], float(b['free']), float(b['locked']))
+                        for b in account.get('balances', [])]
+            positions = []
+        else:
+            orders = json.loads(aster_future.get_open_orders())
+            balances = [Balance('future', b['asset'], float(b['balance']), 0.0)
+                        for b in json.loads(aster_future.get_balance())]
+            positions = [
+                Position(p['symbol'], p.get('positionSide', 'BOTH'), float(p['positionAmt']),
+                         float(p['entryPrice']), float(p.get('unRealizedProfit', 0)))
+                for p in json.loads(aster_future.get_position_risk())
+            ]
+        with self._lock:
+            open_ids = set()
+            for o in orders:
+                state = self._order_from_rest(o)
+                open_ids.add(state.order_id)
+                self._upsert_order(state)
+            # Orders we still think are open but REST no longer lists were closed while offline
+            missing = [self._orders[oid] for ids in self._open_by_symbol.values() for oid in ids
+                       if oid not in open_ids]
+            self._balances = {b.asset: b for b in balances}
+            self._positions = {(p.symbol, p.position_side): p for p in positions if p.amount != 0}
+        # Query their final state (filled vs canceled) outside the lock
+        for state in self._fetch_final_states(missing):
+            with self._lock:
+                self._upsert_order(state)
+        logging.info("Account state seeded (%s): %d open orders, %d closed while offline",
+                     self.market, len(orders), len(missing))
+
+    def _order_from_rest(self, o: dict) -> OrderState:
+        return OrderState(
+            market=self.market,
+            symbol=o['symbol'],
+            order_id=int(o['orderId']),
+            client_order_id=o.get('clientOrderId', ''),
+            side=o['side'],
+            order_type=o['type'],
+            status=o['status'],
+            price=float(o['price']),
+            orig_qty=float(o['origQty']),
+            executed_qty=float(o['executedQty']),
+            avg_price=float(o.get('avgPrice', 0) or 0),
+            position_side=o.get('positionSide'),
+            update_time=int(o.get('updateTime', o.get('time', 0))),
+        )
+
+    def _fetch_final_states(self, orders: List[OrderState]) -> List[OrderState]:
+        """
+        REST state of orders that left the open list. An order whose query fails
+        keeps its last known state and is retried on the next bootstrap, rather
+        than being guessed as canceled.
+        """
+        states = []
+        for order in orders:
+            try:
+                if self.market == 'spot':
+                    data = json.loads(aster_spot.get_order(order.symbol, order_id=order.order_id))
+                else:
+                    data = json.loads(aster_future.get_order(order.symbol, order.side, order.order_id,
+                                                             order.order_type))
+                states.append(self._order_from_rest(data))
+            except Exception as e:
+                logging.error("Fetching final state of order %s (%s) failed: %s", order.order_id, self.market, e)
+        return states
+
+    # ---- event handling ----------------------------------------------------
+
+    def _on_message(self, event: dict):
+        kind = event.get('e')
+        if kind == 'listenKeyExpired':
+            logging.warning("listenKey expired (%s), opening a new stream", self.market)
+            threading.Thread(target=self._renew, daemon=True).start()
+        elif kind == 'executionReport':
+            self._apply_order_event(event, event.get('E', 0))
+        elif kind == 'ORDER_TRADE_UPDATE':
+            self._apply_order_event(event['o'], event.get('E', 0))
+        elif kind == 'outboundAccountPosition':
+            with self._lock:
+                for b in event['B']:
+                    self._balances[b['a']] = Balance('spot', b['a'], float(b['f']), float(b['l']))
+        elif kind == 'ACCOUNT_UPDATE':
+            self._apply_account_update(event['a'])
+
+    def _apply_order_event(self, o: dict, event_time: int):
+        state = OrderState(
+            market=self.market,
+            symbol=o['s'],
+            order_id=int(o['i']),
+            client_order_id=o.get('c', ''),
+            side=o['S'],
+            order_type=o['o'],
+            status=o['X'],
+            price=float(o['p']),
+            orig_qty=float(o['q']),
+            executed_qty=float(o['z']),
+            avg_price=float(o.get('ap', 0) or 0),
+            position_side=o.get('ps'),
+            update_time=int(o.get('T', event_time)),
+        )
+        with self._lock:
+            self._upsert_order(state)
+            if o.get('x') == 'TRADE' and float(o.get('l', 0)) > 0:
+                fill = Fill(
+                    market=self.market,
+                    symbol=state.symbol,
+                    order_id=state.order_id,
+                    trade_id=int(o['t']),
+                    side=state.side,
+                    price=float(o['L']),
+                    qty=float(o['l']),
+                    commission=float(o.get('n', 0) or 0),
+                    commission_asset=o.get('N'),
+                    is_maker=bool(o.get('m')),
+                    time=int(o.get('T', event_time)),
+                )
+                fills = self._fills.get(state.symbol)
+                if fills is None:
+                    fills = self._fills[state.symbol] = deque(maxlen=MAX_FILLS_PER_SYMBOL)
+                fills.append(fill)
+
+    def _apply_account_update(self, update: dict):
+        with self._lock:
+            for b in update.get('B', []):
+                self._balances[b['a']] = Balance('future', b['a'], float(b['wb']), 0.0)
+            for p in update.get('P', []):
+                key = (p['s'], p.get('ps', 'BOTH'))
+                amount = float(p['pa'])
+                if amount == 0:
+                    self._positions.pop(key, None)
+                else:
+                    self._positions[key] = Position(
+                        p['s'], key[1], amount, float(p['ep']), float(p.get('up', 0))
+                    )
+
+    def _upsert_order(self, state: OrderState):
+        current = self._orders.get(state.order_id)
+        if current is not None and current.update_time > state.update_time:
+            return
+        self._orders[state.order_id] = state
+        if state.client_order_id:
+            self._orders_by_client_id[state.client_order_id] = state.order_id
+        self._index_open(state)
+
+    def _index_open(self, state: OrderState):
+        ids = self._open_by_symbol.setdefault(state.symbol, set())
+        if state.status not in FINAL_ORDER_STATUSES:
+            ids.add(state.order_id)
+            return
+        ids.discard(state.order_id)
+        if state.order_id not in self._closed_queued:
+            self._closed_queued.add(state.order_id)
+            self._closed_order_ids.append(state.order_id)
+        while len(self._closed_order_ids) > MAX_CLOSED_ORDERS:
+            expired_id = self._closed_order_ids.popleft()
+            self._closed_queued.discard(expired_id)
+            expired = self._orders.pop(expired_id, None)
+            if expired is not None and expired.client_order_id:
+                self._orders_by_client_id.pop(expired.client_order_id, None)
+
+    # ---- queries -------------------------------------------------------------
+
+    def get_order(self, order_id: Optional[int] = None, client_order_id: Optional[str] = None) -> Optional[OrderState]:
+        with self._lock:
+            if order_id is None and client_order_id is not None:
+                order_id = self._orders_by_client_id.get(client_order_id)
+            return self._orders.get(order_id) if order_id is not None else None
+
+    def get_open_orders(self, symbol: Optional[str] = None) -> List[OrderState]:
+        with self._lock:
+            symbols = [symbol] if symbol else list(self._open_by_symbol)
+            return [self._orders[oid] for s in symbols for oid in self._open_by_symbol.get(s, ())]
+
+    def get_fills(self, symbol: str, since: int = 0) -> List[Fill]:
+        """Fills for `symbol` with trade time >= `since` (ms), oldest first."""
+        with self._lock:
+            return [fill for fill in self._fills.get(symbol, ()) if fill.time >= since]
+
+    def get_balance(self, asset: str) -> Optional[Balance]:
+        with self._lock:
+            return self._balances.get(asset)
+
+    def get_balances(self) -> List[Balance]:
+        with self._lock:
+            return list(self._balances.values())
+
+    def get_position(self, symbol: str, position_side: str = 'BOTH') -> Optional[Position]:
+        with self._lock:
+            return self._positions.get((symbol, position_side))
+
+    def get_positions(self) -> List[Position]:
+        with self._lock:
+            return list(self._positions.values())
+
+
+# if __name__ == '__main__':
+#     tracker = AccountStateTracker('future')
+#     tracker.start()
+#     while True:
+#         time.sleep(5)
+#         print(tracker.get_open_orders('RAVEUSDT'), tracker.get_positions())
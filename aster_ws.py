@@ -0,0 +1,230 @@
+"""Aster WebSocket market-data streams with auto-reconnect and a last-value cache."""
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import websocket
+
+
+SPOT_WS_HOST = 'wss://sstream.asterdex.com'
+FUTURES_WS_HOST = 'wss://fstream.asterdex.com'
+
+# Cached values older than this are treated as missing so callers fall back to REST
+STALE_AFTER_SECONDS = 15
+RECONNECT_DELAY_MIN = 1
+RECONNECT_DELAY_MAX = 60
+
+
+class StreamConnection:
+    """
+    One websocket connection running in a daemon thread.
+
+    The connection is re-established with exponential backoff whenever it drops,
+    until `stop()` is called. `on_open` runs after every (re)connect.
+    """
+
+    def __init__(self, url: str, on_message: Callable[[dict], None], name: str = 'ws',
+                 on_open: Optional[Callable[[], None]] = None):
+        self.url = url
+        self.name = name
+        self._on_message = on_message
+        self._on_open = on_open
+        self._ws = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self.connected = False
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._ws is not None:
+            self._ws.close()
+
+    def _run(self):
+        delay = RECONNECT_DELAY_MIN
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._handle_open,
+                on_message=self._handle_message,
+                on_error=self._handle_error,
+                on_close=self._handle_close,
+            )
+            self._ws.run_forever(ping_interval=20, ping_timeout=10)
+            self.connected = False
+            if self._stopped.is_set():
+                break
+            # A connection that stayed up for a while resets the backoff
+            if time.monotonic() - started > RECONNECT_DELAY_MAX:
+                delay = RECONNECT_DELAY_MIN
+            logging.warning("%s disconnected, reconnecting in %ss", self.name, delay)
+            self._stopped.wait(delay)
+            delay = min(delay * 2, RECONNECT_DELAY_MAX)
+
+    def _handle_open(self, ws):
+        self.connected = True
+        logging.info("%s connected: %s", self.name, self.url)
+        if self._on_open is not None:
+            try:
+                self._on_open()
+            except Exception as e:
+                logging.error("%s open handler error: %s", self.name, e)
+
+    def _handle_message(self, ws, message):
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            logging.error("%s sent invalid JSON: %s", self.name, message)
+            return
+        try:
+            self._on_message(payload)
+        except Exception as e:
+            logging.error("%s message handler error: %s", self.name, e)
+
+    def _handle_error(self, ws, error):
+        logging.error("%s error: %s", self.name, error)
+
+    def _handle_close(self, ws, status_code, msg):
+        self.connected = False
+        logging.info("%s closed: %s %s", self.name, status_code, msg)
+
+
+def combined_stream_url(host: str, streams: List[str]) -> str:
+    """Build a combined-stream url, e.g. wss://.../stream?streams=a@bookTicker/b@kline_1h."""
+    return f"{host}/stream?streams={'/'.join(streams)}"
+
+
+class AsterMarketStream:
+    """
+    Streams bookTicker, kline and (futures only) markPrice for the given symbols
+    and keeps the latest value of each in memory.
+
+    Spot and futures each use one combined-stream connection. Readers get `None`
+    when a value is missing or older than `max_age` seconds.
+    """
+
+    def __init__(self, spot_symbols: Optional[List[str]] = None, future_symbols: Optional[List[str]] = None,
+                 kline_interval: str = '1h'):
+        self.spot_symbols = [s.upper() for s in (spot_symbols or [])]
+        self.future_symbols = [s.upper() for s in (future_symbols or [])]
+        self.kline_interval = kline_interval
+        # (market, symbol) -> (received_at, value)
+        self._book_tickers: Dict[Tuple[str, str], Tuple[float, tuple]] = {}
+        self._klines: Dict[Tuple[str, str], Tuple[float, dict]] = {}
+        self._mark_prices: Dict[str, Tuple[float, tuple]] = {}
+        self._kline_listeners: List[Callable[[str, str, dict], None]] = []
+        self._connections: List[StreamConnection] = []
+
+        if self.spot_symbols:
+            streams = self._symbol_streams(self.spot_symbols, ['bookTicker', f'kline_{kline_interval}'])
+            self._connections.append(StreamConnection(
+                combined_stream_url(SPOT_WS_HOST, streams),
+                lambda payload: self._dispatch('spot', payload),
+                name='aster-spot-ws',
+            ))
+        if self.future_symbols:
+            streams = self._symbol_streams(
+                self.future_symbols, ['bookTicker', 'markPrice@1s', f'kline_{kline_interval}']
+            )
+            self._connections.append(StreamConnection(
+                combined_stream_url(FUTURES_WS_HOST, streams),
+                lambda payload: self._dispatch('future', payload),
+                name='aster-future-ws',
+            ))
+
+    @staticmethod
+    def _symbol_streams(symbols: List[str], suffixes: List[str]) -> List[str]:
+        return [f"{symbol.lower()}@{suffix}" for symbol in symbols for suffix in suffixes]
+
+    def start(self):
+        for conn in self._connections:
+            conn.start()
+
+    def stop(self):
+        for conn in self._connections:
+            conn.stop()
+
+    def add_kline_listener(self, callback: Callable[[str, str, dict], None]):
+        """Register `callback(market, symbol, kline)`; it is called for every closed candle."""
+        self._kline_listeners.append(callback)
+
+    def remove_kline_listener(self, callback: Callable[[str, str, dict], None]):
+        if callback in self._kline_listeners:
+            self._kline_listeners.remove(callback)
+
+    def _dispatch(self, market: str, payload: dict):
+        data = payload.get('data', payload)
+        event = data.get('e')
+        received_at = time.time()
+        if event == 'bookTicker' or (event is None and 'b' in data and 'a' in data):
+            book = (float(data['b']), float(data['B']), float(data['a']), float(data['A']))
+            self._book_tickers[(market, data['s'])] = (received_at, book)
+        elif event == 'markPriceUpdate':
+            mark = (
+                round(float(data['p']), 6),
+                round(float(data['i']), 6),
+                round(float(data['r']), 6),
+            )
+            self._mark_prices[data['s']] = (received_at, mark)
+        elif event == 'kline':
+            kline = data['k']
+            self._klines[(market, data['s'])] = (received_at, kline)
+            if kline.get('x'):
+                for callback in self._kline_listeners:
+                    try:
+                        callback(market, data['s'], kline)
+                    except Exception as e:
+                        logging.error("Kline listener error for %s (%s): %s", data['s'], market, e)
+
+    @staticmethod
+    def _fresh(entry, max_age: float):
+        if entry is None:
+            return None
+        received_at, value = entry
+        if time.time() - received_at > max_age:
+            return None
+        return value
+
+    def get_book_ticker(self, market: str, symbol: str, max_age: float = STALE_AFTER_SECONDS):
+        """Return (bid, bid_qty, ask, ask_qty) or None."""
+        return self._fresh(self._book_tickers.get((market, symbol.upper())), max_age)
+
+    def get_kline(self, market: str, symbol: str, max_age: float = STALE_AFTER_SECONDS) -> Optional[dict]:
+        """Return the raw payload of the current (possibly still open) candle or None."""
+        return self._fresh(self._klines.get((market, symbol.upper())), max_age)
+
+    def get_spot_price(self, symbol: str, max_age: float = STALE_AFTER_SECONDS) -> Optional[float]:
+        """
+        Latest spot trade price, same rounding as `aster_spot.get_latest_price_spot`.
+
+        The close of the open candle is the last traded price; the book mid is used
+        when no kline has arrived yet.
+        """
+        kline = self.get_kline('spot', symbol, max_age)
+        if kline is not None:
+            return round(float(kline['c']), 6)
+        book = self.get_book_ticker('spot', symbol, max_age)
+        if book is not None:
+            return round((book[0] + book[2]) / 2, 6)
+        return None
+
+    def get_funding(self, symbol: str, max_age: float = STALE_AFTER_SECONDS):
+        """Return (mark_price, index_price, funding_rate) like `aster_future.get_latest_funding_rate`, or None."""
+        return self._fresh(self._mark_prices.get(symbol.upper()), max_age)
+
+
+# if __name__ == '__main__':
+#     stream = AsterMarketStream(['RAVEUSD1'], ['RAVEUSDT'])
+#     stream.start()
+#     while True:
+#         time.sleep(1)
+#         print(stream.get_spot_price('RAVEUSD1'), stream.get_funding('RAVEUSDT'))
@@ -0,0 +1,110 @@
+"""
+In-process stand-in for a psycopg2 connection.
+
+Statements are adapted with psycopg2's own quoting (so `execute_values`
+pays its real client-side cost), counted, and optionally delayed to model
+the server round trip. `install()` points data.py and fetch_kline_volume at
+the stub.
+"""
+import threading
+import time
+
+import psycopg2.extensions
+
+
+class DbStats:
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, sql_bytes: int):
+        with self._lock:
+            self.statements += 1
+            self.bytes += sql_bytes
+
+    def as_dict(self):
+        return {'statements': self.statements, 'commits': self.commits, 'sql_bytes': self.bytes}
+
+
+class StubCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+
+    def mogrify(self, sql, params=None):
+        if isinstance(sql, str):
+            sql = sql.encode()
+        if params is None:
+            return sql
+        quoted = tuple(psycopg2.extensions.adapt(value).getquoted() for value in params)
+        return sql % quoted
+
+    def execute(self, sql, params=None):
+        statement = self.mogrify(sql, params)
+        if self.connection.latency:
+            time.sleep(self.connection.latency)
+        self.connection.stats.record(len(statement))
+        self.rowcount = 1
+
+    def executemany(self, sql, seq):
+        for params in seq:
+            self.execute(sql, params)
+
+    def copy_expert(self, sql, file, size=8192):
+        data = file.read()
+        if self.connection.latency:
+            time.sleep(self.connection.latency)
+        self.connection.stats.record(len(data))
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StubConnection:
+    encoding = 'UTF8'
+    closed = 0
+
+    def __init__(self, stats: DbStats, latency: float = 0.0):
+        self.stats = stats
+        self.latency = latency
+
+    def cursor(self, *args, **kwargs):
+        return StubCursor(self)
+
+    def commit(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.stats._lock:
+            self.stats.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def install(latency: float = 0.0) -> DbStats:
+    """Replace the connection factories of data.py and fetch_kline_volume with the stub."""
+    import data
+    import fetch_kline_volume
+
+    stats = DbStats()
+    factory = lambda: StubConnection(stats, latency)  # noqa: E731
+    data.get_conn = factory
+    fetch_kline_volume.get_db_connection = factory
+    return stats
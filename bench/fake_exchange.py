@@ -0,0 +1,89 @@
+"""
+Local stand-in for the Aster spot/futures and Binance alpha REST endpoints used
+by price_mgr and fetch_kline_volume.
+
+Klines are generated on the fly from `startTime` / `endTime` / `limit`, so
+paginated backfills of any length work without stored data.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from fetch_kline_volume import interval_to_ms
+
+PRICE = 1.0
+
+
+def make_klines(interval: str, start_time: int, end_time: int, limit: int):
+    """REST kline rows: [open_time, open, high, low, close, volume, close_time, quote_volume, trades, ...]."""
+    step = interval_to_ms(interval)
+    first = -(-start_time // step) * step
+    rows = []
+    for open_time in range(first, end_time + 1, step):
+        if len(rows) >= limit:
+            break
+        drift = (open_time // step) % 100 / 10000
+        open_price = PRICE + drift
+        close_price = open_price + 0.0001
+        rows.append([
+            open_time, f'{open_price:.6f}', f'{close_price + 0.0002:.6f}', f'{open_price - 0.0002:.6f}',
+            f'{close_price:.6f}', '12345.67', open_time + step - 1, f'{12345.67 * open_price:.4f}',
+            42, '6000.00', f'{6000 * open_price:.4f}', '0',
+        ])
+    return rows
+
+
+class _ExchangeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; without this Nagle adds ~40ms per reply
+    disable_nagle_algorithm = True
+    latency = 0.0
+
+    def _reply(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        symbol = query.get('symbol', '')
+
+        if url.path in ('/api/v1/klines', '/fapi/v1/klines', '/bapi/defi/v1/public/alpha-trade/klines'):
+            now_ms = int(time.time() * 1000)
+            limit = int(query.get('limit', 500))
+            end_time = int(query.get('endTime', now_ms))
+            start_time = int(query.get('startTime', end_time - limit * interval_to_ms(query['interval'])))
+            rows = make_klines(query['interval'], start_time, end_time, limit)
+            if url.path.startswith('/bapi/'):
+                self._reply({'code': '000000', 'message': None, 'success': True, 'data': rows})
+            else:
+                self._reply(rows)
+        elif url.path in ('/api/v1/ticker/price', '/fapi/v1/ticker/price'):
+            self._reply({'symbol': symbol, 'price': f'{PRICE:.6f}', 'time': int(time.time() * 1000)})
+        elif url.path == '/fapi/v1/premiumIndex':
+            self._reply({
+                'symbol': symbol, 'markPrice': f'{PRICE:.6f}', 'indexPrice': f'{PRICE:.6f}',
+                'lastFundingRate': '0.00010000', 'time': int(time.time() * 1000),
+            })
+        else:
+            self._reply({'code': -1, 'msg': f'unknown path {url.path}'}, status=404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_exchange_server(latency: float = 0.0):
+    """Start the stand-in on a free port; returns (server, base url)."""
+    handler = type('ExchangeHandler', (_ExchangeHandler,), {'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-exchange', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
@@ -0,0 +1,216 @@
+"""
+Local JSON-RPC stand-in for the chains the DEX classes talk to.
+
+`eth_call` is answered from the ABIs in abi/: every view function gets a
+deterministic value (slot0 / getSlot0 report sqrtPriceX96 = 2**96, i.e.
+price 1.0 for equal decimals), and Multicall3 `tryBlockAndAggregate` /
+`aggregate3` answer each inner call the same way. Transactions are accepted
+and mined instantly so swap flows run end to end.
+"""
+import glob
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from eth_abi import decode, encode
+from eth_utils import function_abi_to_4byte_selector, keccak
+from eth_utils.abi import get_abi_output_types
+
+from dex_base import MULTICALL3_ABI
+
+TOKEN0 = '0x0000000000000000000000000000000000001000'
+TOKEN1 = '0x0000000000000000000000000000000000002000'
+SQRT_PRICE_X96 = 2 ** 96
+LIQUIDITY = 10 ** 24
+CHAIN_ID = 1
+GAS_PRICE = 10 ** 9
+
+_MULTICALL = {fn['name']: function_abi_to_4byte_selector(fn) for fn in MULTICALL3_ABI if fn.get('type') == 'function'}
+
+# Values for well-known outputs; everything else gets a per-type default
+_NAMED_VALUES = {
+    'token0': [TOKEN0],
+    'token1': [TOKEN1],
+    'decimals': [18],
+    'fee': [3000],
+    'tickSpacing': [60],
+    'allowance': [0],
+    'balanceOf': [10 ** 30],
+    'liquidity': [LIQUIDITY],
+    'getLiquidity': [LIQUIDITY],
+}
+
+
+def _default_value(abi_type: str):
+    if abi_type.endswith(']'):
+        return []
+    if abi_type.startswith(('uint', 'int')):
+        return 0
+    if abi_type == 'address':
+        return '0x' + '00' * 20
+    if abi_type == 'bool':
+        return True
+    if abi_type.startswith('bytes'):
+        return b'' if abi_type == 'bytes' else b'\x00' * int(abi_type[5:])
+    if abi_type == 'string':
+        return ''
+    raise ValueError(abi_type)
+
+
+def _load_functions(pattern='abi/*.json'):
+    """
+    selector -> (name, output types); the longest output list wins when ABIs share a selector.
+    State-changing functions are included so eth_call dry runs of swaps succeed.
+    """
+    functions = {}
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding='utf-8') as f:
+            abi = json.load(f)
+        for fn in abi:
+            if fn.get('type') != 'function':
+                continue
+            try:
+                output_types = get_abi_output_types(fn)
+            except Exception:
+                continue
+            if any(t.startswith('(') for t in output_types):
+                continue
+            selector = function_abi_to_4byte_selector(fn)
+            current = functions.get(selector)
+            if current is None or len(output_types) > len(current[1]):
+                functions[selector] = (fn['name'], output_types)
+    return functions
+
+
+class FakeChain:
+    """State shared by the request handlers of one server."""
+
+    def __init__(self, latency: float = 0.0, block_time: float = 1.0):
+        self.latency = latency
+        self.block_time = block_time
+        self.started = time.time()
+        self.functions = _load_functions()
+        # selector -> revert data, for calls that should fail
+        self.reverts = {}
+        self.transactions = {}
+        self.nonces = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def block_number(self) -> int:
+        return 1_000_000 + int((time.time() - self.started) / self.block_time)
+
+    def call(self, data: bytes):
+        """(success, return data) for one contract call."""
+        selector, args = data[:4], data[4:]
+        if selector == _MULTICALL['tryBlockAndAggregate']:
+            require_success, calls = decode(['bool', '(address,bytes)[]'], args)
+            results = [self.call(call_data) for _, call_data in calls]
+            block = self.block_number
+            return True, encode(['uint256', 'bytes32', '(bool,bytes)[]'],
+                                [block, keccak(block.to_bytes(32, 'big')), results])
+        if selector == _MULTICALL['aggregate3']:
+            (calls,) = decode(['(address,bool,bytes)[]'], args)
+            return True, encode(['(bool,bytes)[]'], [[self.call(call_data) for _, _, call_data in calls]])
+        if selector == _MULTICALL['getBlockNumber']:
+            return True, encode(['uint256'], [self.block_number])
+        if selector in self.reverts:
+            return False, self.reverts[selector]
+        function = self.functions.get(selector)
+        if function is None:
+            return False, b''
+        name, output_types = function
+        if name in ('slot0', 'getSlot0'):
+            values = [SQRT_PRICE_X96] + [_default_value(t) for t in output_types[1:]]
+        else:
+            values = _NAMED_VALUES.get(name) or [_default_value(t) for t in output_types]
+        return True, encode(output_types, values)
+
+    def send_raw_transaction(self, raw: str) -> str:
+        tx_hash = '0x' + keccak(hexstr=raw).hex()
+        with self._lock:
+            self.transactions[tx_hash] = self.block_number
+        return tx_hash
+
+    def receipt(self, tx_hash: str):
+        block = self.transactions.get(tx_hash)
+        if block is None:
+            return None
+        return {
+            'transactionHash': tx_hash, 'transactionIndex': '0x0',
+            'blockHash': '0x' + keccak(block.to_bytes(32, 'big')).hex(), 'blockNumber': hex(block),
+            'from': TOKEN0, 'to': TOKEN1, 'cumulativeGasUsed': '0x5208', 'gasUsed': '0x5208',
+            'effectiveGasPrice': hex(GAS_PRICE), 'contractAddress': None, 'logs': [],
+            'logsBloom': '0x' + '00' * 256, 'status': '0x1', 'type': '0x0',
+        }
+
+    def handle(self, request: dict):
+        method, params = request.get('method'), request.get('params') or []
+        if method == 'eth_call':
+            success, data = self.call(bytes.fromhex(params[0]['data'][2:]))
+            if not success:
+                return {'error': {'code': 3, 'message': 'execution reverted', 'data': '0x' + data.hex()}}
+            return {'result': '0x' + data.hex()}
+        if method == 'eth_chainId':
+            return {'result': hex(CHAIN_ID)}
+        if method == 'eth_blockNumber':
+            return {'result': hex(self.block_number)}
+        if method in ('eth_gasPrice', 'eth_maxPriorityFeePerGas'):
+            return {'result': hex(GAS_PRICE)}
+        if method == 'eth_estimateGas':
+            return {'result': hex(200_000)}
+        if method == 'eth_getTransactionCount':
+            return {'result': hex(self.nonces.get(params[0], 0))}
+        if method == 'eth_sendRawTransaction':
+            return {'result': self.send_raw_transaction(params[0])}
+        if method == 'eth_getTransactionReceipt':
+            return {'result': self.receipt(params[0])}
+        if method == 'eth_getBlockByNumber':
+            block = self.block_number
+            return {'result': {
+                'number': hex(block), 'hash': '0x' + keccak(block.to_bytes(32, 'big')).hex(),
+                'parentHash': '0x' + '00' * 32, 'timestamp': hex(int(time.time())),
+                'baseFeePerGas': hex(GAS_PRICE), 'gasLimit': hex(30_000_000), 'gasUsed': '0x0',
+                'extraData': '0x', 'miner': TOKEN0, 'transactions': [],
+            }}
+        return {'error': {'code': -32601, 'message': f'method {method} not supported'}}
+
+
+class _RpcHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; without this Nagle adds ~40ms per reply
+    disable_nagle_algorithm = True
+    chain: FakeChain = None
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)))
+        if self.chain.latency:
+            time.sleep(self.chain.latency)
+        requests = body if isinstance(body, list) else [body]
+        responses = []
+        for request in requests:
+            self.chain.calls += 1
+            response = {'jsonrpc': '2.0', 'id': request.get('id')}
+            response.update(self.chain.handle(request))
+            responses.append(response)
+        payload = json.dumps(responses if isinstance(body, list) else responses[0]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_rpc_server(latency: float = 0.0):
+    """Start a fake node on a free port; returns (server, url, chain state)."""
+    chain = FakeChain(latency)
+    handler = type('RpcHandler', (_RpcHandler,), {'chain': chain})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-rpc', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}', chain
@@ -0,0 +1,111 @@
+"""
+Benchmark signed Aster futures order placement: sync `aster_future` vs `AsyncAsterFutureClient`.
+
+Orders go to a local HTTP stand-in, so the numbers measure signing and
+client-side transport overhead only. Run from the repo root:
+
+    python -m bench.future_orders --orders 500 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from eth_account import Account
+
+import aster_future
+from aster_future_async import AsyncAsterFutureClient, SigningContext
+
+
+class _OrderHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    order_id = 0
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        _OrderHandler.order_id += 1
+        body = json.dumps({'orderId': _OrderHandler.order_id, 'status': 'NEW'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_DELETE = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_order_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _OrderHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def configure_test_keys():
+    """Use a throwaway key so the benchmark never needs real credentials."""
+    account = Account.create()
+    aster_future.user = Account.create().address
+    aster_future.signer = account.address
+    aster_future.priKey = account.key.hex()
+
+
+def bench_sign(count):
+    params = {'symbol': 'RAVEUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': '100', 'price': '0.5'}
+    started = time.perf_counter()
+    for i in range(count):
+        aster_future.sign(dict(params), i)
+    sync_rate = count / (time.perf_counter() - started)
+
+    context = SigningContext(aster_future.user, aster_future.signer, aster_future.priKey)
+    started = time.perf_counter()
+    for _ in range(count):
+        context.sign(params)
+    prepared_rate = count / (time.perf_counter() - started)
+    return {'sign_sync_per_sec': round(sync_rate, 1), 'sign_prepared_per_sec': round(prepared_rate, 1)}
+
+
+def bench_orders(count, concurrency, host):
+    aster_future.host = host
+    started = time.perf_counter()
+    for _ in range(count):
+        aster_future.place_order('RAVEUSDT', 'BUY', '100', '0.5')
+    sync_rate = count / (time.perf_counter() - started)
+
+    async def run_async():
+        semaphore = asyncio.Semaphore(concurrency)
+        async with AsyncAsterFutureClient(host=host, max_connections=concurrency) as client:
+            async def one():
+                async with semaphore:
+                    return await client.place_order('RAVEUSDT', 'BUY', '100', '0.5')
+            started_async = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(count)))
+            return count / (time.perf_counter() - started_async)
+
+    async_rate = asyncio.run(run_async())
+    return {'orders_sync_per_sec': round(sync_rate, 1), 'orders_async_per_sec': round(async_rate, 1)}
+
+
+def run(orders=500, concurrency=20):
+    configure_test_keys()
+    server, host = start_order_server()
+    try:
+        results = bench_sign(orders)
+        results.update(bench_orders(orders, concurrency, host))
+    finally:
+        server.shutdown()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.orders, args.concurrency), indent=2))
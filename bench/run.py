@@ -0,0 +1,289 @@
+"""
+Benchmark suite against local stand-ins for the RPC nodes, the exchanges and Postgres.
+
+Scenarios:
+    tick     full price_mgr tick (every chain + CEX feed) latency, plus unbatched get_price for comparison
+    kline    kline backfill rows/sec through fetch_kline_volume (range path and batch upsert)
+    sign     Aster futures request signing throughput
+    swap     Uniswap V3 swap transaction build + sign time, and the full approve + swap flow
+
+Run from the repo root; results are printed and optionally saved as JSON so
+runs from different commits can be compared:
+
+    python -m bench.run --out bench/results/$(git rev-parse --short HEAD).json
+    python -m bench.run --only tick kline --rpc-latency-ms 30 --baseline bench/results/abc1234.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_account import Account
+
+from bench.db_stub import install as install_db_stub
+from bench.fake_exchange import start_exchange_server
+from bench.fake_rpc import TOKEN0, TOKEN1, start_rpc_server
+
+SCENARIOS = ('tick', 'kline', 'sign', 'swap')
+
+# One venue per DEX implementation, spread over the three chains
+BENCH_VENUES = {
+    'dex': [
+        {'name': 'uniswap_v3', 'type': 'uniswap_v3', 'dex_type': 100, 'chain': 'eth', 'asset': 'BENCH',
+         'params': {'pair_address': '0x0000000000000000000000000000000000003001', 'quote_token_address': TOKEN1}},
+        {'name': 'uniswap_v4', 'type': 'uniswap_v4', 'dex_type': 101, 'chain': 'eth', 'asset': 'BENCH',
+         'params': {'pair_id': '0x' + '11' * 32, 'pool_mgr_address': '0x0000000000000000000000000000000000003002',
+                    'quote_token_address': TOKEN1, 'base_token_address': TOKEN0}},
+        {'name': 'pancake_v3', 'type': 'pancake_v3', 'dex_type': 102, 'chain': 'bsc', 'asset': 'BENCH',
+         'params': {'pair_address': '0x0000000000000000000000000000000000003003', 'quote_token_address': TOKEN1}},
+        {'name': 'pancake_v4', 'type': 'pancake_v4', 'dex_type': 103, 'chain': 'bsc', 'asset': 'BENCH',
+         'params': {'pair_id': '0x' + '22' * 32, 'pool_mgr_address': '0x0000000000000000000000000000000000003004',
+                    'quote_token_address': TOKEN1, 'base_token_address': TOKEN0}},
+        {'name': 'aerodrome_v3', 'type': 'aerodrome_v3', 'dex_type': 104, 'chain': 'base', 'asset': 'BENCH',
+         'params': {'pair_address': '0x0000000000000000000000000000000000003005', 'quote_token_address': TOKEN1}},
+    ],
+    'cex': [
+        {'name': 'aster_bench', 'type': 'aster', 'cex': 100, 'symbol': 'BENCH',
+         'spot_symbol': 'BENCHUSD1', 'future_symbol': 'BENCHUSDT', 'history': True},
+    ],
+}
+
+
+def _summary_ms(samples):
+    samples = sorted(samples)
+    percentiles = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+    return {
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3),
+        'p50_ms': round(percentiles[49] * 1000, 3),
+        'p95_ms': round(percentiles[94] * 1000, 3),
+        'p99_ms': round(percentiles[98] * 1000, 3),
+        'max_ms': round(samples[-1] * 1000, 3),
+    }
+
+
+class _NoStream:
+    """Stands in for AsterMarketStream with an empty cache, so every CEX read falls back to REST."""
+
+    def get_funding(self, symbol):
+        return None
+
+    def get_spot_price(self, symbol):
+        return None
+
+
+def bench_tick(rpc_url, exchange_url, ticks):
+    import aster_future
+    import aster_spot
+    import price_mgr
+    from venue_registry import parse_registry
+
+    key = Account.create().key.hex()
+    for chain in ('ETH', 'BSC', 'BASE'):
+        os.environ[f'{chain}_RPC'] = rpc_url
+        os.environ[f'{chain}_PRIVATE_KEY'] = key
+    aster_spot.host = aster_future.host = exchange_url
+
+    registry = parse_registry(BENCH_VENUES)
+    built = registry.build_dexes()
+    dexes_by_chain = {}
+    for venue, dex in built:
+        price_mgr.price_validator.register(venue.name, venue.asset)
+        dexes_by_chain.setdefault(venue.chain, []).append((venue, dex))
+    market_stream = _NoStream()
+
+    samples = []
+    with ThreadPoolExecutor(max_workers=price_mgr.MAX_POLL_WORKERS) as executor:
+        for _ in range(ticks):
+            now = datetime.datetime.now()
+            started = time.perf_counter()
+            tasks = [executor.submit(price_mgr.poll_chain, venue_dexes, now) for venue_dexes in dexes_by_chain.values()]
+            tasks += [executor.submit(price_mgr.poll_cex, feed, market_stream, now) for feed in registry.cex]
+            for task in tasks:
+                task.result()
+            samples.append(time.perf_counter() - started)
+
+    unbatched = []
+    for _ in range(max(ticks // 5, 1)):
+        started = time.perf_counter()
+        for _, dex in built:
+            dex.get_price()
+        unbatched.append(time.perf_counter() - started)
+
+    return {
+        'venues': len(built),
+        'chains': len(dexes_by_chain),
+        'ticks': ticks,
+        'tick': _summary_ms(samples),
+        'sequential_get_price': _summary_ms(unbatched),
+    }
+
+
+def bench_kline(exchange_url, days):
+    import fetch_kline_volume
+
+    fetch_kline_volume.API_HOST = exchange_url
+    fetch_kline_volume.FUTURES_API_HOST = exchange_url
+    fetch_kline_volume.ALPHA_API_HOST = exchange_url
+    end_ms = (int(time.time() * 1000) // 60_000) * 60_000
+    start_ms = end_ms - days * 86_400_000
+    rows = (end_ms - start_ms) // 60_000
+
+    started = time.perf_counter()
+    fetch_kline_volume._fetch_and_store_volume_range(
+        fetch_kline_volume.get_klines, 'BENCHUSD1', '1m', start_ms, end_ms, 'aster_spot')
+    range_elapsed = time.perf_counter() - started
+
+    klines = fetch_kline_volume.get_klines('BENCHUSD1', '1m', start_ms, end_ms, limit=fetch_kline_volume.MAX_KLINE_LIMIT)
+    batch = []
+    for kline in klines:
+        open_time, close_time, volume, quote_volume, open_price, close_price = \
+            fetch_kline_volume._normalize_kline_fields(kline)
+        batch.append(('BENCHUSD1', 'aster_spot', volume, quote_volume, open_price, close_price, open_time, close_time))
+    conn = fetch_kline_volume.get_db_connection()
+    repeats = max(rows // len(batch), 1)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fetch_kline_volume.upsert_kline_volume_batch(conn, batch)
+    batch_elapsed = time.perf_counter() - started
+
+    return {
+        'rows': rows,
+        'range_rows_per_sec': round(rows / range_elapsed, 1),
+        'batch_upsert_rows_per_sec': round(repeats * len(batch) / batch_elapsed, 1),
+    }
+
+
+def bench_sign_throughput(count):
+    from bench.future_orders import bench_sign, configure_test_keys
+
+    configure_test_keys()
+    return bench_sign(count)
+
+
+def bench_swap(rpc_url, count):
+    from web3 import Web3
+
+    from uniswap_v3 import UniswapV3Dex
+
+    os.environ['ETH_PRIVATE_KEY'] = Account.create().key.hex()
+    dex = UniswapV3Dex(Web3.to_checksum_address('0x0000000000000000000000000000000000003001'),
+                       TOKEN1, web3=Web3(Web3.HTTPProvider(rpc_url)))
+    router = dex.web3.eth.contract(address=dex.router_address, abi=dex.router_abi)
+
+    build = []
+    for nonce in range(count):
+        started = time.perf_counter()
+        params = {
+            'tokenIn': dex.token0, 'tokenOut': dex.token1, 'fee': int(dex.fee),
+            'recipient': dex.account.address, 'deadline': int(time.time()) + 1800,
+            'amountIn': 10 ** 6, 'amountOutMinimum': 0, 'sqrtPriceLimitX96': 0,
+        }
+        tx = router.functions.exactInputSingle(params).build_transaction({
+            'from': dex.account.address, 'nonce': nonce, 'gas': 300000, 'gasPrice': 10 ** 9, 'chainId': 1,
+        })
+        dex.web3.eth.account.sign_transaction(tx, dex.account.key)
+        build.append(time.perf_counter() - started)
+
+    full = []
+    for _ in range(max(count // 10, 1)):
+        started = time.perf_counter()
+        dex.swap(10 ** 6, True)
+        full.append(time.perf_counter() - started)
+
+    return {'build_and_sign': _summary_ms(build), 'approve_and_swap': _summary_ms(full)}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}.{key}' if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(results, baseline):
+    """Lines of 'metric: baseline -> current (+x%)' for metrics present in both runs."""
+    current, previous = _flatten(results['results']), _flatten(baseline['results'])
+    lines = [f"baseline {baseline['meta'].get('commit')} -> current {results['meta'].get('commit')}"]
+    for name in sorted(current.keys() & previous.keys()):
+        before, after = previous[name], current[name]
+        change = f'{(after - before) / before * 100:+.1f}%' if before else 'n/a'
+        lines.append(f'  {name}: {before} -> {after} ({change})')
+    return '\n'.join(lines)
+
+
+def run(only=SCENARIOS, ticks=200, kline_days=7, sign_count=500, swap_count=100,
+        rpc_latency_ms=0.0, exchange_latency_ms=0.0, db_latency_ms=0.0):
+    rpc_server, rpc_url, chain = start_rpc_server(rpc_latency_ms / 1000)
+    exchange_server, exchange_url = start_exchange_server(exchange_latency_ms / 1000)
+    db_stats = install_db_stub(db_latency_ms / 1000)
+    results = {}
+    try:
+        if 'tick' in only:
+            results['tick'] = bench_tick(rpc_url, exchange_url, ticks)
+        if 'kline' in only:
+            results['kline'] = bench_kline(exchange_url, kline_days)
+        if 'sign' in only:
+            results['sign'] = bench_sign_throughput(sign_count)
+        if 'swap' in only:
+            results['swap'] = bench_swap(rpc_url, swap_count)
+    finally:
+        rpc_server.shutdown()
+        exchange_server.shutdown()
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'rpc_latency_ms': rpc_latency_ms,
+            'exchange_latency_ms': exchange_latency_ms,
+            'db_latency_ms': db_latency_ms,
+            'rpc_requests': chain.calls,
+            'db': db_stats.as_dict(),
+        },
+        'results': results,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--ticks', type=int, default=200)
+    parser.add_argument('--kline-days', type=int, default=7, help='1m candles to backfill')
+    parser.add_argument('--sign-count', type=int, default=500)
+    parser.add_argument('--swap-count', type=int, default=100)
+    parser.add_argument('--rpc-latency-ms', type=float, default=0.0)
+    parser.add_argument('--exchange-latency-ms', type=float, default=0.0)
+    parser.add_argument('--db-latency-ms', type=float, default=0.0)
+    parser.add_argument('--out', help='write the JSON result to this path')
+    parser.add_argument('--baseline', help='earlier JSON result to compare against')
+    args = parser.parse_args()
+
+    output = run(args.only, args.ticks, args.kline_days, args.sign_count, args.swap_count,
+                 args.rpc_latency_ms, args.exchange_latency_ms, args.db_latency_ms)
+    print(json.dumps(output, indent=2))
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            print(compare(output, json.load(f)), file=sys.stderr)
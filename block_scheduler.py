@@ -0,0 +1,167 @@
+"""
+Read pools when their chain produces a block instead of on a fixed timer.
+
+One thread per chain probes `eth_blockNumber` (a few bytes per call) at about
+half the chain's observed block time. A pool is read only on a new block and
+only once its own stride has elapsed: the stride doubles (up to `MAX_STRIDE`
+blocks) each time a read finds the pool unchanged and drops back to one block
+as soon as it moves, and no pool goes longer than `MAX_READ_AGE` seconds
+unread. Pools that are due on the same block are still read in one multicall.
+"""
+import datetime
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import time_rpc
+
+
+# Starting estimates; refined from observed block numbers
+DEFAULT_BLOCK_TIMES = {'eth': 12.0, 'bsc': 0.75, 'base': 2.0}
+FALLBACK_BLOCK_TIME = 2.0
+MIN_PROBE_INTERVAL = 0.5
+MAX_PROBE_INTERVAL = 6.0
+MAX_STRIDE = 32
+# Below PriceValidator's cross-venue max age, so quiet pools still count as references
+MAX_READ_AGE = 30.0
+# Weight of the newest observation in the block time estimate
+BLOCK_TIME_ALPHA = 0.2
+
+
+@dataclass
+class PoolCadence:
+    next_block: int = 0
+    stride: int = 1
+    last_read: float = 0.0
+    last_state: Optional[Tuple] = None
+
+
+def _state(snapshot) -> Tuple:
+    if snapshot.sqrt_price_x96 is not None:
+        return snapshot.sqrt_price_x96, snapshot.liquidity
+    return (snapshot.price,)
+
+
+class ChainPoller:
+    """
+    Block-driven reads for one chain.
+
+    `venues_fn()` returns the chain's current [(venue, dex)] (it may change as
+    shards move); `poll_fn(venue_dexes, now)` reads and stores them and
+    returns their snapshots in order.
+    """
+
+    def __init__(self, chain: str, venues_fn: Callable[[], List[tuple]], poll_fn: Callable,
+                 block_time: Optional[float] = None, max_stride: int = MAX_STRIDE,
+                 max_read_age: float = MAX_READ_AGE):
+        self.chain = chain
+        self.venues_fn = venues_fn
+        self.poll_fn = poll_fn
+        self.block_time = block_time or DEFAULT_BLOCK_TIMES.get(chain, FALLBACK_BLOCK_TIME)
+        self.max_stride = max_stride
+        self.max_read_age = max_read_age
+        self.cadence: Dict[str, PoolCadence] = {}
+        self._last_block: Optional[int] = None
+        self._last_block_seen = 0.0
+
+    def probe_interval(self) -> float:
+        return min(max(self.block_time / 2, MIN_PROBE_INTERVAL), MAX_PROBE_INTERVAL)
+
+    def _observe_block(self, block: int, now: float) -> bool:
+        """Update the block time estimate; True when `block` is new."""
+        if self._last_block is None:
+            self._last_block, self._last_block_seen = block, now
+            return True
+        if block <= self._last_block:
+            return False
+        per_block = (now - self._last_block_seen) / (block - self._last_block)
+        self.block_time += BLOCK_TIME_ALPHA * (per_block - self.block_time)
+        self._last_block, self._last_block_seen = block, now
+        return True
+
+    def step(self) -> float:
+        """Probe once, read the pools that are due; returns seconds until the next probe."""
+        venue_dexes = self.venues_fn()
+        if not venue_dexes:
+            return MAX_PROBE_INTERVAL
+        web3 = venue_dexes[0][1].web3
+        try:
+            with time_rpc(self.chain, 'eth_blockNumber'):
+                block = web3.eth.block_number
+        except Exception as e:
+            logging.error("eth_blockNumber failed on %s: %s", self.chain, e)
+            return MAX_PROBE_INTERVAL
+        now = time.monotonic()
+        new_block = self._observe_block(block, now)
+
+        names = {venue.name for venue, _ in venue_dexes}
+        for name in list(self.cadence):
+            if name not in names:
+                del self.cadence[name]
+        due = [
+            (venue, dex) for venue, dex in venue_dexes
+            if self._is_due(self.cadence.setdefault(venue.name, PoolCadence()), new_block, block, now)
+        ]
+        if due:
+            self._read(due, block, now)
+        return self.probe_interval()
+
+    def _is_due(self, cadence: PoolCadence, new_block: bool, block: int, now: float) -> bool:
+        if new_block and block >= cadence.next_block:
+            return True
+        # A stalled chain or a lagging RPC node still gets an occasional read
+        return now - cadence.last_read >= self.max_read_age
+
+    def _read(self, due: List[tuple], block: int, now: float):
+        try:
+            snapshots = self.poll_fn(due, datetime.datetime.now())
+        except Exception as e:
+            logging.error("Block poll failed on %s: %s", self.chain, e)
+            return
+        for (venue, _), snapshot in zip(due, snapshots or [None] * len(due)):
+            cadence = self.cadence[venue.name]
+            cadence.last_read = now
+            if snapshot is None:
+                # Retry on the next block
+                cadence.next_block = block + 1
+                continue
+            state = _state(snapshot)
+            if state == cadence.last_state:
+                cadence.stride = min(cadence.stride * 2, self.max_stride)
+            else:
+                cadence.stride = 1
+            cadence.last_state = state
+            cadence.next_block = block + cadence.stride
+
+
+class BlockScheduler:
+    """Runs a `ChainPoller` per chain on its own daemon thread."""
+
+    def __init__(self, chains: List[str], venues_fn: Callable[[str], List[tuple]], poll_fn: Callable):
+        self.pollers = [ChainPoller(chain, lambda chain=chain: venues_fn(chain), poll_fn) for chain in chains]
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        self._stopped.clear()
+        for poller in self.pollers:
+            thread = threading.Thread(target=self._run, args=(poller,), name=f'blocks-{poller.chain}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(timeout=MAX_PROBE_INTERVAL * 2)
+        self._threads = []
+
+    def _run(self, poller: ChainPoller):
+        while not self._stopped.is_set():
+            try:
+                delay = poller.step()
+            except Exception as e:
+                logging.error("Block scheduler error on %s: %s", poller.chain, e)
+                delay = MAX_PROBE_INTERVAL
+            self._stopped.wait(delay)
@@ -31,6 +31,7 @@ CREATE TABLE IF NOT EXISTS rave_dex_historical (
 
 CREATE INDEX IF NOT EXISTS idx_rave_dex_historical_created_at ON rave_dex_historical USING BTREE (created_at);
 CREATE INDEX IF NOT EXISTS idx_rave_dex_historical_dex_type ON rave_dex_historical USING BTREE (dex_type);
+CREATE INDEX IF NOT EXISTS idx_rave_dex_historical_dex_type_created_at ON rave_dex_historical USING BTREE (dex_type, created_at, id);
 
 CREATE TABLE IF NOT EXISTS token_pair_volume_hourly (
     token_pair VARCHAR(128) NOT NULL,
@@ -49,6 +50,51 @@ CREATE INDEX IF NOT EXISTS idx_token_pair_volume_hourly_type ON token_pair_volum
 CREATE INDEX IF NOT EXISTS idx_token_pair_volume_hourly_open_time ON token_pair_volume_hourly USING BTREE (open_time);
 CREATE INDEX IF NOT EXISTS idx_token_pair_volume_hourly_close_time ON token_pair_volume_hourly USING BTREE (close_time);
 CREATE INDEX IF NOT EXISTS idx_token_pair_volume_hourly_pair_type ON token_pair_volume_hourly USING BTREE (token_pair, type);
+
+CREATE TABLE IF NOT EXISTS aster_order_book_snapshot (
+    id BIGSERIAL PRIMARY KEY,
+    market VARCHAR(16) NOT NULL,
+    symbol VARCHAR(64) NOT NULL,
+    last_update_id BIGINT NOT NULL,
+    bids JSONB NOT NULL,
+    asks JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_aster_order_book_snapshot_symbol_created_at ON aster_order_book_snapshot USING BTREE (market, symbol, created_at);
+
+CREATE TABLE IF NOT EXISTS price_mgr_worker (
+    worker_id VARCHAR(128) PRIMARY KEY,
+    last_seen TIMESTAMPTZ NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS price_mgr_shard_lease (
+    shard SMALLINT PRIMARY KEY,
+    owner VARCHAR(128) NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    epoch BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS aster_funding_rate_history (
+    symbol VARCHAR(64) NOT NULL,
+    funding_time TIMESTAMPTZ NOT NULL,
+    funding_rate NUMERIC NOT NULL,
+    mark_price NUMERIC,
+    PRIMARY KEY (symbol, funding_time)
+);
+
+CREATE TABLE IF NOT EXISTS aster_price_kline (
+    symbol VARCHAR(64) NOT NULL,
+    price_type VARCHAR(16) NOT NULL,
+    interval VARCHAR(8) NOT NULL,
+    open_time TIMESTAMPTZ NOT NULL,
+    open_price NUMERIC NOT NULL,
+    high_price NUMERIC NOT NULL,
+    low_price NUMERIC NOT NULL,
+    close_price NUMERIC NOT NULL,
+    close_time TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (symbol, price_type, interval, open_time)
+);
 '''
 
 cur.execute(create_sql)
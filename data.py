@@ -1,6 +1,10 @@
 import os
+import json
 import psycopg2
+import psycopg2.extras
 from dotenv import load_dotenv
+from metrics import time_db_write
+from tracing import traced
 load_dotenv()
 
 def get_conn():
@@ -12,6 +16,8 @@ def get_conn():
         port=os.environ.get('PG_PORT', '5432')
     )
 
+@time_db_write('rave_dex_historical')
+@traced(cat='db')
 def insert_historical(dex_type, price, created_at):
     conn = get_conn()
     cur = conn.cursor()
@@ -24,6 +30,8 @@ def insert_historical(dex_type, price, created_at):
     cur.close()
     conn.close()
 
+@time_db_write('rave_dex_latest')
+@traced(cat='db')
 def upsert_latest(dex_type, price, created_at):
     conn = get_conn()
     cur = conn.cursor()
@@ -38,6 +46,8 @@ def upsert_latest(dex_type, price, created_at):
     cur.close()
     conn.close()
 
+@time_db_write('penrose_cex_latest')
+@traced(cat='db')
 def upsert_penrose_cex_latest(cex, symbol, spot_price, index_price, mark_price, funding_rate, timestamp):
     conn = get_conn()
     cur = conn.cursor()
@@ -60,6 +70,35 @@ def upsert_penrose_cex_latest(cex, symbol, spot_price, index_price, mark_price,
     cur.close()
     conn.close()
 
+@time_db_write('penrose_cex_latest')
+@traced(cat='db')
+def upsert_penrose_cex_latest_batch(rows):
+    """rows: (cex, symbol, spot_price, index_price, mark_price, funding_rate, timestamp)，一条语句写入全部交易对"""
+    if not rows:
+        return
+    # 同一语句里重复的 (cex, symbol) 会让 ON CONFLICT 报错，保留最后一条
+    values = list({(row[0], row[1]): row for row in rows}.values())
+    conn = get_conn()
+    cur = conn.cursor()
+    sql = """
+        INSERT INTO penrose_cex_latest (
+            cex, symbol, spot_price, index_price, mark_price, funding_rate, timestamp
+        ) VALUES %s
+        ON CONFLICT (cex, symbol)
+        DO UPDATE SET
+            spot_price = EXCLUDED.spot_price,
+            index_price = EXCLUDED.index_price,
+            mark_price = EXCLUDED.mark_price,
+            funding_rate = EXCLUDED.funding_rate,
+            timestamp = EXCLUDED.timestamp;
+    """
+    psycopg2.extras.execute_values(cur, sql, values, page_size=len(values))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+@time_db_write('rave_cex_history')
+@traced(cat='db')
 def insert_rave_cex_history(cex, spot_price, index_price, mark_price, funding_rate, timestamp):
     conn = get_conn()
     cur = conn.cursor()
@@ -75,3 +114,42 @@ def insert_rave_cex_history(cex, spot_price, index_price, mark_price, funding_ra
     cur.close()
     conn.close()
 
+@time_db_write('rave_cex_history')
+@traced(cat='db')
+def insert_rave_cex_history_batch(rows):
+    """rows: (cex, spot_price, index_price, mark_price, funding_rate, timestamp)"""
+    if not rows:
+        return
+    conn = get_conn()
+    cur = conn.cursor()
+    sql = """
+        INSERT INTO rave_cex_history (
+            cex, spot_price, index_price, mark_price, funding_rate, timestamp
+        ) VALUES %s
+    """
+    psycopg2.extras.execute_values(cur, sql, rows, page_size=len(rows))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+@time_db_write('aster_order_book_snapshot')
+@traced(cat='db')
+def insert_order_book_snapshots(rows):
+    """rows: (market, symbol, last_update_id, bids, asks, created_at)，bids/asks 为 [[price, qty], ...]"""
+    if not rows:
+        return
+    conn = get_conn()
+    cur = conn.cursor()
+    sql = """
+        INSERT INTO aster_order_book_snapshot (
+            market, symbol, last_update_id, bids, asks, created_at
+        ) VALUES %s
+    """
+    values = [
+        (market, symbol, last_update_id, json.dumps(bids), json.dumps(asks), created_at)
+        for market, symbol, last_update_id, bids, asks, created_at in rows
+    ]
+    psycopg2.extras.execute_values(cur, sql, values)
+    conn.commit()
+    cur.close()
+    conn.close()
@@ -1,12 +1,234 @@
+import asyncio
+import json
+import logging
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import List, Optional
+
+from eth_utils.abi import get_abi_output_types
+from metrics import time_rpc
+from preflight import allowance_override, simulator
+from receipt_watcher import watcher_for
+from tracing import span
+from util import sqrt_ratio_x96_to_price
+
+# Multicall3 has the same address on Ethereum, BSC and Base
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+# Keep a single eth_call well under typical RPC gas / payload limits
+MAX_MULTICALL_CALLS = 500
+
+with open('abi/multicall3_abi.json') as f:
+    MULTICALL3_ABI = json.load(f)
+
+
+@dataclass(frozen=True)
+class PoolSnapshot:
+    """One pool read. Fields other than `price` are None for implementations that cannot report them."""
+    price: float
+    sqrt_price_x96: Optional[int]
+    tick: Optional[int]
+    liquidity: Optional[int]
+    block_number: Optional[int]
+
+
+class PoolReader(ABC):
+    """只读池子：读取价格和快照。可以交易的池子继承 DexBase。"""
+    # 所在链（eth / bsc / base），同链的池子可以合并成一次 multicall
+    chain = None
+    # get_snapshot 依赖的只读调用中可以放进 Multicall3 的部分；为空表示只能逐个调用
+    BATCHABLE_READS = ()
+    # get_price 保留的小数位，None 表示不取整
+    PRICE_DECIMALS = None
+
+    @abstractmethod
+    def get_price(self):
+        """获取当前池价格"""
+        pass
+
+    def snapshot_reads(self):
+        """
+        Bound contract calls for `BATCHABLE_READS`, in order: slot0-style (sqrtPriceX96, tick, ...)
+        then liquidity. Implementations without batchable reads return an empty list.
+        """
+        return []
+
+    def price_from_sqrt_price(self, sqrt_price_x96):
+        """Quote-token price of the base token from sqrtPriceX96."""
+        with span('price_math', cat='dex'):
+            price = sqrt_ratio_x96_to_price(sqrt_price_x96, self.token0_decimals, self.token1_decimals)
+            # 如果quote token是token0，返回倒数（token0 per token1）；否则返回正向（token1 per token0）
+            if self.quote_token_address == self.token0:
+                price = 1 / price if price != 0 else 0
+            if self.PRICE_DECIMALS is not None:
+                price = round(price, self.PRICE_DECIMALS)
+            return price
+
+    def snapshot_from_results(self, results, block_number) -> PoolSnapshot:
+        slot0, liquidity = results
+        return PoolSnapshot(
+            price=self.price_from_sqrt_price(slot0[0]),
+            sqrt_price_x96=int(slot0[0]),
+            tick=int(slot0[1]),
+            liquidity=int(liquidity),
+            block_number=block_number,
+        )
+
+    def get_snapshot(self) -> PoolSnapshot:
+        snapshot = PoolReader.get_prices([self])[0]
+        if snapshot is None:
+            raise ValueError(f"Snapshot read failed for {type(self).__name__}")
+        return snapshot
+
+    @staticmethod
+    def get_prices(pools: List['PoolReader']) -> List[Optional[PoolSnapshot]]:
+        """
+        Read many pools with as few RPC calls as possible.
+
+        Batchable pools are grouped by chain and read through Multicall3
+        `tryBlockAndAggregate`, so every pool of a chain is read in one eth_call
+        at one block. Other pools fall back to their own `get_price`.
+
+        Returns:
+            Snapshots in the order of `pools`; None for a pool whose read failed
+        """
+        snapshots: List[Optional[PoolSnapshot]] = [None] * len(pools)
+        by_chain = {}
+        for index, pool in enumerate(pools):
+            if pool.BATCHABLE_READS:
+                by_chain.setdefault(pool.chain, []).append(index)
+            else:
+                try:
+                    with time_rpc(pool.chain, f'{type(pool).__name__}.get_price'):
+                        price = pool.get_price()
+                    snapshots[index] = PoolSnapshot(price, None, None, None, None)
+                except Exception as e:
+                    logging.error("get_price failed for %s: %s", type(pool).__name__, e)
+        for indexes in by_chain.values():
+            for start in range(0, len(indexes), MAX_MULTICALL_CALLS // 2):
+                chunk = indexes[start:start + MAX_MULTICALL_CALLS // 2]
+                try:
+                    chain = pools[chunk[0]].chain
+                    with time_rpc(chain, 'multicall'), span('multicall', cat='rpc', chain=chain, pools=len(chunk)):
+                        chunk_snapshots = _multicall_snapshots([pools[i] for i in chunk])
+                except Exception as e:
+                    logging.error("Multicall failed for %d pools on %s: %s", len(chunk), pools[chunk[0]].chain, e)
+                    continue
+                for index, snapshot in zip(chunk, chunk_snapshots):
+                    snapshots[index] = snapshot
+        return snapshots
+
+    @staticmethod
+    async def get_prices_async(pools: List['PoolReader']) -> List[Optional[PoolSnapshot]]:
+        """`get_prices` with each chain's multicall running concurrently in worker threads."""
+        by_chain = {}
+        for index, pool in enumerate(pools):
+            by_chain.setdefault(pool.chain, []).append(index)
+        groups = list(by_chain.values())
+        results = await asyncio.gather(*(
+            asyncio.to_thread(PoolReader.get_prices, [pools[i] for i in indexes]) for indexes in groups
+        ))
+        snapshots: List[Optional[PoolSnapshot]] = [None] * len(pools)
+        for indexes, group_snapshots in zip(groups, results):
+            for index, snapshot in zip(indexes, group_snapshots):
+                snapshots[index] = snapshot
+        return snapshots
+
+
+class DexBase(PoolReader):
+    """可以交易的池子：在 PoolReader 之上实现 swap。"""
 
-class DexBase(ABC):
     @abstractmethod
     def swap(self, amount_in, token_in_is0, amount_out_min=0, sqrt_price_limit_x96=0):
         """swap接口，执行兑换"""
         pass
 
-    @abstractmethod
-    def get_price(self):
-        """获取当前池价格"""
-        pass
\ No newline at end of file
+    def preflight(self, swap_tx, token_in, amount_in, amount_out_min=0, sqrt_price_limit_x96=0, state_key=None,
+                  approve_contract=None):
+        """
+        发送前用 eth_call 模拟 swap 交易，会 revert 时抛出 preflight.SwapReverted 而不广播。
+        缓存键不含 deadline，但包含 nonce，同一区块（或传入的池子状态）内同一笔交易只模拟一次。
+        传入 approve_contract 时在 approve 之前模拟：用 state override 假定 router 的授权已经是 amount_in；
+        找不到该 token 的 allowance 存储槽时返回 None，调用方应在 approve 完成后再模拟一次。
+        """
+        state_override = None
+        if approve_contract is not None:
+            state_override = allowance_override(self.web3, approve_contract, swap_tx['from'], swap_tx['to'],
+                                                amount_in)
+            if state_override is None:
+                return None
+        params_key = (getattr(self, 'pair_address', None), swap_tx.get('from'), swap_tx.get('to'),
+                      swap_tx.get('nonce'), token_in, int(amount_in), int(amount_out_min),
+                      int(sqrt_price_limit_x96), state_override is not None)
+        return simulator.check(self.web3, swap_tx, params_key, state_key, chain=self.chain or '',
+                               state_override=state_override)
+
+    def wait_for_receipt(self, tx_hash, timeout=120):
+        """等待交易回执；同一节点上所有待确认交易共用一个按区块批量查询的 ReceiptWatcher"""
+        return watcher_for(self.web3, self.chain or '').wait(tx_hash, timeout)
+
+
+_multicall_contracts = {}
+
+
+def _multicall_contract(web3):
+    multicall = _multicall_contracts.get(id(web3))
+    if multicall is None:
+        multicall = web3.eth.contract(address=MULTICALL3_ADDRESS, abi=MULTICALL3_ABI)
+        _multicall_contracts[id(web3)] = multicall
+    return multicall
+
+
+def multicall_read(web3, fns, chain: str = '') -> List[Optional[object]]:
+    """
+    Decoded results of bound read calls on one chain, MAX_MULTICALL_CALLS per eth_call;
+    None for a call that reverted. Single-output calls decode to the value itself.
+    """
+    multicall = _multicall_contract(web3)
+    results = []
+    for start in range(0, len(fns), MAX_MULTICALL_CALLS):
+        chunk = fns[start:start + MAX_MULTICALL_CALLS]
+        calls = [(fn.address, fn._encode_transaction_data()) for fn in chunk]
+        with time_rpc(chain, 'multicall'), span('multicall', cat='rpc', chain=chain, calls=len(calls)):
+            _block_number, _block_hash, raw = multicall.functions.tryBlockAndAggregate(False, calls).call()
+        for fn, (success, data) in zip(chunk, raw):
+            if not success:
+                results.append(None)
+                continue
+            values = web3.codec.decode(get_abi_output_types(fn.abi), data)
+            results.append(values[0] if len(values) == 1 else values)
+    return results
+
+
+def _multicall_snapshots(pools: List[PoolReader]) -> List[Optional[PoolSnapshot]]:
+    """One tryBlockAndAggregate call for pools that share a chain."""
+    web3 = pools[0].web3
+    multicall = _multicall_contract(web3)
+    reads = [pool.snapshot_reads() for pool in pools]
+    calls = [(fn.address, fn._encode_transaction_data()) for pool_reads in reads for fn in pool_reads]
+    with span('eth_call', cat='rpc', chain=pools[0].chain, calls=len(calls)):
+        block_number, _block_hash, results = multicall.functions.tryBlockAndAggregate(False, calls).call()
+
+    with span('decode', cat='dex', pools=len(pools)):
+        return _decode_snapshots(web3, pools, reads, results, block_number)
+
+
+def _decode_snapshots(web3, pools, reads, results, block_number) -> List[Optional[PoolSnapshot]]:
+    snapshots = []
+    offset = 0
+    for pool, pool_reads in zip(pools, reads):
+        pool_results = results[offset:offset + len(pool_reads)]
+        offset += len(pool_reads)
+        if not all(success for success, _ in pool_results):
+            logging.error("Multicall read reverted for %s", type(pool).__name__)
+            snapshots.append(None)
+            continue
+        decoded = []
+        for fn, (_, data) in zip(pool_reads, pool_results):
+            values = web3.codec.decode(get_abi_output_types(fn.abi), data)
+            decoded.append(values[0] if len(values) == 1 else values)
+        try:
+            snapshots.append(pool.snapshot_from_results(decoded, block_number))
+        except Exception as e:
+            logging.error("Snapshot decode failed for %s: %s", type(pool).__name__, e)
+            snapshots.append(None)
+    return snapshots
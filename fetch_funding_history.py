@@ -0,0 +1,270 @@
+"""
+Backfill Aster futures funding-rate history and mark / index price klines.
+
+    python fetch_funding_history.py --days 365                  # every futures symbol in the venue config
+    python fetch_funding_history.py --symbols RAVEUSDT --start 2025-01-01 --interval 1h
+
+`get_latest_funding_rate` only sees the current premium index, so funding and
+basis analysis used to be limited to how long the poller had been running.
+Here any range is split into windows that each fit one API page; the windows
+of every (symbol, series) are fetched in parallel and each is upserted as it
+arrives with COPY into a temp stage plus one INSERT ... ON CONFLICT, so
+re-running over an overlapping range is safe.
+"""
+import argparse
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, List, Sequence, Tuple
+
+import psycopg2
+import requests
+
+from fetch_kline_volume import (ASTER_FUTURE_SYMBOLS, FUTURES_API_HOST, MAX_KLINE_LIMIT, get_db_connection,
+                                interval_to_ms)
+from log_config import setup_logging
+from metrics import time_db_write, time_http
+from tracing import span, traced
+from venue_registry import load_registry
+
+
+MAX_FUNDING_LIMIT = 1000
+# Funding settles at most hourly, so a window this long always fits in one short page
+FUNDING_WINDOW_MS = (MAX_FUNDING_LIMIT - 1) * 3_600_000
+HISTORY_WORKERS = int(os.environ.get('FUNDING_HISTORY_WORKERS', '4'))
+PRICE_TYPES = ('mark', 'index')
+
+_session = requests.Session()
+
+
+def _get(endpoint: str, params: dict) -> list:
+    with time_http('aster_future', endpoint):
+        response = _session.get(f'{FUTURES_API_HOST}{endpoint}', params=params, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+@traced(cat='http')
+def get_funding_rate_history(symbol: str, start_time: int, end_time: int,
+                             limit: int = MAX_FUNDING_LIMIT) -> List[dict]:
+    """Settled funding rates in [start_time, end_time] (ms), oldest first."""
+    return _get('/fapi/v1/fundingRate', {
+        'symbol': symbol, 'startTime': start_time, 'endTime': end_time, 'limit': limit,
+    })
+
+
+@traced(cat='http')
+def get_price_klines(symbol: str, price_type: str, interval: str, start_time: int, end_time: int,
+                     limit: int = MAX_KLINE_LIMIT) -> List[List]:
+    """Mark or index price klines in [start_time, end_time] (ms); index klines are keyed by `pair`."""
+    if price_type == 'mark':
+        return _get('/fapi/v1/markPriceKlines', {
+            'symbol': symbol, 'interval': interval, 'startTime': start_time, 'endTime': end_time, 'limit': limit,
+        })
+    if price_type == 'index':
+        return _get('/fapi/v1/indexPriceKlines', {
+            'pair': symbol, 'interval': interval, 'startTime': start_time, 'endTime': end_time, 'limit': limit,
+        })
+    raise ValueError(f"price_type must be one of {PRICE_TYPES}, not {price_type!r}")
+
+
+@dataclass(frozen=True)
+class HistoryWindow:
+    """One slice of one series; `series` is 'funding' or a price type."""
+    symbol: str
+    series: str
+    start_ms: int
+    end_ms: int
+
+
+def split_windows(symbol: str, series: str, start_ms: int, end_ms: int, window_ms: int) -> Iterator[HistoryWindow]:
+    cursor = start_ms
+    while cursor < end_ms:
+        window_end = min(cursor + window_ms, end_ms)
+        yield HistoryWindow(symbol, series, cursor, window_end - 1 if window_end < end_ms else end_ms)
+        cursor = window_end
+
+
+def _page_through(fetch: Callable[[int, int], list], time_of: Callable, start_ms: int, end_ms: int,
+                  limit: int) -> list:
+    """All rows of one window; normally one request, more only if the window holds more than a page."""
+    rows, cursor = [], start_ms
+    while cursor <= end_ms:
+        page = fetch(cursor, end_ms)
+        rows.extend(page)
+        if len(page) < limit:
+            break
+        next_cursor = time_of(page[-1]) + 1
+        if next_cursor <= cursor:
+            break
+        cursor = next_cursor
+    return rows
+
+
+def fetch_window(window: HistoryWindow, interval: str) -> List[tuple]:
+    """Rows for `window`, already shaped for the COPY stage of its table."""
+    if window.series == 'funding':
+        raw = _page_through(
+            lambda start, end: get_funding_rate_history(window.symbol, start, end),
+            lambda row: int(row['fundingTime']), window.start_ms, window.end_ms, MAX_FUNDING_LIMIT,
+        )
+        return [
+            (window.symbol, int(row['fundingTime']), str(row['fundingRate']), str(row.get('markPrice') or r'\N'))
+            for row in raw
+        ]
+    raw = _page_through(
+        lambda start, end: get_price_klines(window.symbol, window.series, interval, start, end),
+        lambda kline: int(kline[0]), window.start_ms, window.end_ms, MAX_KLINE_LIMIT,
+    )
+    return [
+        (window.symbol, window.series, interval, int(k[0]), str(k[1]), str(k[2]), str(k[3]), str(k[4]), int(k[6]))
+        for k in raw
+    ]
+
+
+_STAGES = {
+    'funding': (
+        'aster_funding_rate_history',
+        """CREATE TEMP TABLE IF NOT EXISTS funding_rate_stage (
+               symbol VARCHAR(64), funding_time_ms BIGINT, funding_rate NUMERIC, mark_price NUMERIC
+           ) ON COMMIT DELETE ROWS""",
+        "COPY funding_rate_stage FROM STDIN",
+        """INSERT INTO aster_funding_rate_history (symbol, funding_time, funding_rate, mark_price)
+           SELECT DISTINCT ON (symbol, funding_time_ms)
+               symbol, to_timestamp(funding_time_ms / 1000.0), funding_rate, mark_price
+           FROM funding_rate_stage
+           ON CONFLICT (symbol, funding_time) DO UPDATE
+           SET funding_rate = EXCLUDED.funding_rate,
+               mark_price = COALESCE(EXCLUDED.mark_price, aster_funding_rate_history.mark_price)""",
+    ),
+    'kline': (
+        'aster_price_kline',
+        """CREATE TEMP TABLE IF NOT EXISTS price_kline_stage (
+               symbol VARCHAR(64), price_type VARCHAR(16), interval VARCHAR(8), open_time_ms BIGINT,
+               open_price NUMERIC, high_price NUMERIC, low_price NUMERIC, close_price NUMERIC,
+               close_time_ms BIGINT
+           ) ON COMMIT DELETE ROWS""",
+        "COPY price_kline_stage FROM STDIN",
+        """INSERT INTO aster_price_kline (
+               symbol, price_type, interval, open_time, open_price, high_price, low_price, close_price, close_time
+           )
+           SELECT DISTINCT ON (symbol, price_type, interval, open_time_ms)
+               symbol, price_type, interval, to_timestamp(open_time_ms / 1000.0),
+               open_price, high_price, low_price, close_price, to_timestamp(close_time_ms / 1000.0)
+           FROM price_kline_stage
+           ON CONFLICT (symbol, price_type, interval, open_time) DO UPDATE
+           SET open_price = EXCLUDED.open_price, high_price = EXCLUDED.high_price,
+               low_price = EXCLUDED.low_price, close_price = EXCLUDED.close_price,
+               close_time = EXCLUDED.close_time""",
+    ),
+}
+
+
+@traced(cat='db')
+def copy_history_rows(conn, kind: str, rows: Sequence[tuple]):
+    """
+    Upsert rows of `kind` ('funding' or 'kline') through a session temp stage,
+    the same COPY + INSERT ... SELECT merge as `copy_kline_volume_page`.
+    """
+    if not rows:
+        return
+    table, create_stage, copy_sql, merge_sql = _STAGES[kind]
+    buffer = io.StringIO('\n'.join('\t'.join(map(str, row)) for row in rows) + '\n')
+    cur = conn.cursor()
+    try:
+        with time_db_write(table):
+            cur.execute(create_stage)
+            cur.copy_expert(copy_sql, buffer)
+            cur.execute(merge_sql)
+            conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        logging.error("Error copying %d rows into %s: %s", len(rows), table, e)
+        raise
+    finally:
+        cur.close()
+
+
+@traced(cat='kline')
+def backfill_funding_history(symbols: Sequence[str], start_ms: int, end_ms: int, interval: str = '1h',
+                             price_types: Sequence[str] = PRICE_TYPES, workers: int = HISTORY_WORKERS,
+                             conn=None) -> Tuple[int, int]:
+    """
+    Fetch funding rates and `price_types` klines for [start_ms, end_ms] and upsert them.
+    Returns (funding rows, kline rows) written. Failed windows are logged and skipped;
+    re-running the same range fills them.
+    """
+    # One slot short of a full page, so no window needs a second (empty) request
+    kline_window_ms = (MAX_KLINE_LIMIT - 1) * interval_to_ms(interval)
+    windows = []
+    for symbol in symbols:
+        windows.extend(split_windows(symbol, 'funding', start_ms, end_ms, FUNDING_WINDOW_MS))
+        for price_type in price_types:
+            windows.extend(split_windows(symbol, price_type, start_ms, end_ms, kline_window_ms))
+    logging.info("Backfilling funding history: %d symbols, %d windows", len(symbols), len(windows))
+
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    written = {'funding': 0, 'kline': 0}
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='funding-history') as executor:
+            futures = {executor.submit(fetch_window, window, interval): window for window in windows}
+            # Writes stay on this thread (one connection); fetches keep running meanwhile
+            for future in as_completed(futures):
+                window = futures[future]
+                try:
+                    rows = future.result()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    logging.error("Fetching %s %s from %d failed: %s", window.symbol, window.series,
+                                  window.start_ms, e)
+                    continue
+                kind = 'funding' if window.series == 'funding' else 'kline'
+                try:
+                    with span('store_window', cat='db', symbol=window.symbol, series=window.series, rows=len(rows)):
+                        copy_history_rows(conn, kind, rows)
+                except psycopg2.Error as e:
+                    # copy_history_rows rolled back; the fetches already in flight still get stored
+                    logging.error("Storing %s %s from %d failed: %s", window.symbol, window.series,
+                                  window.start_ms, e)
+                    if own_conn and conn.closed:
+                        try:
+                            conn = get_db_connection()
+                        except psycopg2.Error as reconnect_error:
+                            logging.error("Reconnecting for the funding backfill failed: %s", reconnect_error)
+                    continue
+                written[kind] += len(rows)
+    finally:
+        if own_conn:
+            conn.close()
+    logging.info("Stored %d funding rates and %d price klines", written['funding'], written['kline'])
+    return written['funding'], written['kline']
+
+
+def _parse_date(value: str) -> datetime:
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--symbols', nargs='*',
+                        help='futures symbols (default: every cex future_symbol and klines.aster_future in the venue config)')
+    parser.add_argument('--days', type=int, default=30, help='range ending now, when --start is not given')
+    parser.add_argument('--start', type=_parse_date, help='YYYY-MM-DD')
+    parser.add_argument('--end', type=_parse_date, help='YYYY-MM-DD (default: now)')
+    parser.add_argument('--interval', default='1h', help='mark / index kline interval')
+    parser.add_argument('--price-types', nargs='*', default=list(PRICE_TYPES), choices=PRICE_TYPES)
+    parser.add_argument('--workers', type=int, default=HISTORY_WORKERS)
+    args = parser.parse_args()
+
+    setup_logging(json_format=False, console=True)
+    end = args.end or datetime.now()
+    start = args.start or end - timedelta(days=args.days)
+    # price_mgr polls funding for the cex feeds' future_symbol; klines.aster_future are the kline symbols
+    symbols = args.symbols or list(dict.fromkeys(load_registry().future_symbols() + list(ASTER_FUTURE_SYMBOLS)))
+    backfill_funding_history(
+        symbols, int(start.timestamp() * 1000), int(end.timestamp() * 1000),
+        args.interval, args.price_types, args.workers,
+    )
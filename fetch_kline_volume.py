@@ -1,12 +1,25 @@
 """Fetch K-line volume data from Aster API and insert into database."""
+import io
 import logging
 import os
-from datetime import datetime, timedelta
-from typing import List, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import repeat
+from typing import Iterator, List, Optional, Sequence
 import dotenv
 import psycopg2
+import psycopg2.extras
 import requests
 
+from aster_ws import AsterMarketStream
+from log_config import setup_logging
+from metrics import time_db_write, time_http
+from tracing import span, traced
+from venue_registry import KlineSymbols, load_registry
+
 
 # API base url
 API_HOST = 'https://sapi.asterdex.com'
@@ -18,6 +31,22 @@ dotenv.load_dotenv()
 MAX_KLINE_LIMIT = 1500
 
 
+def _load_kline_symbols() -> KlineSymbols:
+    """Symbols come from the `klines` section of the venue config; defaults apply without one."""
+    try:
+        return load_registry().klines
+    except FileNotFoundError:
+        logging.warning("Venue config not found, using default kline symbols")
+        return KlineSymbols('1h', ['SPACEUSD1'], ['SPACEUSDT'], ['ALPHA_606USDT'])
+
+
+_KLINE_SYMBOLS = _load_kline_symbols()
+KLINE_INTERVAL = _KLINE_SYMBOLS.interval
+ASTER_SPOT_SYMBOLS = _KLINE_SYMBOLS.aster_spot
+ASTER_FUTURE_SYMBOLS = _KLINE_SYMBOLS.aster_future
+ALPHA_SYMBOLS = _KLINE_SYMBOLS.alpha
+
+
 def get_db_connection():
     """Create and return database connection."""
     return psycopg2.connect(
@@ -29,6 +58,7 @@ def get_db_connection():
     )
 
 
+@traced(cat='http')
 def get_klines(symbol: str, interval: str = '1d', start_time: Optional[int] = None, 
                end_time: Optional[int] = None, limit: int = 500) -> List[List]:
     """
@@ -57,7 +87,8 @@ def get_klines(symbol: str, interval: str = '1d', start_time: Optional[int] = No
         params['endTime'] = end_time
     
     try:
-        response = requests.get(url, params=params, timeout=30)
+        with time_http('aster_spot', 'klines'):
+            response = requests.get(url, params=params, timeout=30)
         response.raise_for_status()
         data = response.json()
         logging.info("Fetched %d klines for %s", len(data), symbol)
@@ -67,6 +98,7 @@ def get_klines(symbol: str, interval: str = '1d', start_time: Optional[int] = No
         raise
 
 
+@traced(cat='http')
 def get_klines_futures(symbol: str, interval: str = '1d', start_time: Optional[int] = None, 
                        end_time: Optional[int] = None, limit: int = 500) -> List[List]:
     """
@@ -95,7 +127,8 @@ def get_klines_futures(symbol: str, interval: str = '1d', start_time: Optional[i
         params['endTime'] = end_time
     
     try:
-        response = requests.get(url, params=params, timeout=30)
+        with time_http('aster_future', 'klines'):
+            response = requests.get(url, params=params, timeout=30)
         response.raise_for_status()
         data = response.json()
         logging.info("Fetched %d futures klines for %s", len(data), symbol)
@@ -105,6 +138,7 @@ def get_klines_futures(symbol: str, interval: str = '1d', start_time: Optional[i
         raise
 
 
+@traced(cat='http')
 def get_klines_alpha(symbol: str, interval: str = '1d', start_time: Optional[int] = None, 
                      end_time: Optional[int] = None, limit: int = 500) -> List[List]:
     """
@@ -133,7 +167,8 @@ def get_klines_alpha(symbol: str, interval: str = '1d', start_time: Optional[int
         params['endTime'] = end_time
     
     try:
-        response = requests.get(url, params=params, timeout=30)
+        with time_http('alpha', 'klines'):
+            response = requests.get(url, params=params, timeout=30)
         response.raise_for_status()
         result = response.json()
         
@@ -151,6 +186,16 @@ def get_klines_alpha(symbol: str, interval: str = '1d', start_time: Optional[int
         raise
 
 
+def ms_to_utc(ms: int) -> datetime:
+    """
+    Epoch milliseconds as a UTC-aware datetime, the same instant as `to_timestamp(ms / 1000.0)`
+    in the COPY path. A naive datetime would be read in the DB session's TimeZone and give the
+    same candle a different `open_time` key whenever that differs from the host's.
+    """
+    return datetime.fromtimestamp(ms / 1000, timezone.utc)
+
+
+@traced(cat='db')
 def insert_kline_volume(conn, token_pair: str, volume: str, quote_volume: str, open_price: str,
                        close_price: str, open_time: int, close_time: int, data_type: str):
     """
@@ -167,9 +212,8 @@ def insert_kline_volume(conn, token_pair: str, volume: str, quote_volume: str, o
         close_time: Close time in milliseconds
         data_type: Data source type ('aster_spot', 'aster_future', 'alpha')
     """
-    # Convert milliseconds to PostgreSQL TIMESTAMPTZ
-    open_time_ts = datetime.fromtimestamp(open_time / 1000)
-    close_time_ts = datetime.fromtimestamp(close_time / 1000)
+    open_time_ts = ms_to_utc(open_time)
+    close_time_ts = ms_to_utc(close_time)
 
     cur = conn.cursor()
     try:
@@ -197,6 +241,47 @@ def insert_kline_volume(conn, token_pair: str, volume: str, quote_volume: str, o
         cur.close()
 
 
+@traced(cat='db')
+def upsert_kline_volume_batch(conn, rows: List[tuple]):
+    """
+    Upsert many K-line rows in one statement.
+
+    Args:
+        conn: Database connection
+        rows: Tuples of (token_pair, data_type, volume, quote_volume, open_price, close_price,
+              open_time_ms, close_time_ms)
+    """
+    if not rows:
+        return
+    values = [
+        (token_pair, data_type, volume, quote_volume, open_price, close_price,
+         ms_to_utc(open_time), ms_to_utc(close_time))
+        for token_pair, data_type, volume, quote_volume, open_price, close_price, open_time, close_time in rows
+    ]
+    cur = conn.cursor()
+    try:
+        insert_sql = """
+            INSERT INTO token_pair_volume_hourly (
+                token_pair, type, volume, quote_volume, open_price, close_price, open_time, close_time
+            )
+            VALUES %s
+            ON CONFLICT (token_pair, type, open_time) DO UPDATE
+            SET volume = EXCLUDED.volume, quote_volume = EXCLUDED.quote_volume,
+                open_price = EXCLUDED.open_price, close_price = EXCLUDED.close_price,
+                close_time = EXCLUDED.close_time
+        """
+        with time_db_write('token_pair_volume_hourly'):
+            psycopg2.extras.execute_values(cur, insert_sql, values, page_size=len(values))
+            conn.commit()
+        logging.debug("Upserted %d kline rows", len(values))
+    except psycopg2.Error as e:
+        conn.rollback()
+        logging.error("Error upserting %d kline rows: %s", len(values), e)
+        raise
+    finally:
+        cur.close()
+
+
 def _normalize_kline_fields(kline: List) -> tuple[int, int, str, str, str, str]:
     """
     Normalize kline fields across providers.
@@ -217,6 +302,126 @@ def _normalize_kline_fields(kline: List) -> tuple[int, int, str, str, str, str]:
     return open_time_ms, close_time_ms, volume, quote_volume, open_price, close_price
 
 
+@dataclass
+class KlinePage:
+    """One API page of klines, normalized column by column."""
+    open_times: List[int]
+    close_times: List[int]
+    volumes: Sequence[str]
+    quote_volumes: Sequence[str]
+    open_prices: Sequence[str]
+    close_prices: Sequence[str]
+
+    def __len__(self):
+        return len(self.open_times)
+
+    @property
+    def last_open_time(self) -> int:
+        return max(self.open_times)
+
+
+def _normalize_kline_page(klines: List[List]) -> KlinePage:
+    """
+    Column-wise counterpart of `_normalize_kline_fields` for a whole page.
+
+    Transposing once and mapping `int` / `str` over each column replaces the
+    per-row isinstance checks; `str` returns string fields unchanged.
+    """
+    columns = list(zip(*klines))
+    # zip stops at the shortest row, so the quote volume column exists only if every row has it
+    quote_volumes = list(map(str, columns[7])) if len(columns) > 7 else ['0'] * len(klines)
+    return KlinePage(
+        open_times=list(map(int, columns[0])),
+        close_times=list(map(int, columns[6])),
+        volumes=list(map(str, columns[5])),
+        quote_volumes=quote_volumes,
+        open_prices=list(map(str, columns[1])),
+        close_prices=list(map(str, columns[4])),
+    )
+
+
+def iter_kline_pages(fetch_fn, symbol: str, interval: str, start_time_ms: int,
+                     end_time_ms: int) -> Iterator[KlinePage]:
+    """
+    Yield normalized pages covering [start_time_ms, end_time_ms] in order.
+
+    The request for page N+1 is issued as soon as page N arrives, so it is in
+    flight while the caller writes page N. At most two pages are held at once,
+    whatever the length of the range.
+    """
+    def fetch_page(cursor_ms):
+        klines = fetch_fn(symbol, interval, cursor_ms, end_time_ms, limit=MAX_KLINE_LIMIT)
+        return _normalize_kline_page(klines) if klines else None
+
+    if start_time_ms >= end_time_ms:
+        return
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='kline-prefetch') as executor:
+        cursor_start = start_time_ms
+        future = executor.submit(fetch_page, cursor_start)
+        while future is not None:
+            page = future.result()
+            if page is None:
+                return
+            # Advance cursor; +1ms avoids repeating the last candle
+            next_cursor = page.last_open_time + 1
+            future = None
+            # A short page means the range is exhausted; a non-advancing one would loop forever
+            if len(page) >= MAX_KLINE_LIMIT and cursor_start < next_cursor < end_time_ms:
+                cursor_start = next_cursor
+                future = executor.submit(fetch_page, cursor_start)
+            yield page
+
+
+@traced(cat='db')
+def copy_kline_volume_page(conn, token_pair: str, data_type: str, page: KlinePage):
+    """
+    Upsert a page into `token_pair_volume_hourly` via COPY into a session temp table.
+
+    COPY has no ON CONFLICT, so rows land in `kline_volume_stage` first and are
+    merged with one INSERT ... SELECT; the stage empties itself on commit.
+    """
+    if not len(page):
+        return
+    n = len(page)
+    lines = map('\t'.join, zip(
+        repeat(token_pair, n), repeat(data_type, n), page.volumes, page.quote_volumes,
+        page.open_prices, page.close_prices, map(str, page.open_times), map(str, page.close_times),
+    ))
+    buffer = io.StringIO('\n'.join(lines) + '\n')
+    cur = conn.cursor()
+    try:
+        with time_db_write('token_pair_volume_hourly'):
+            cur.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS kline_volume_stage (
+                    token_pair VARCHAR(128), type VARCHAR(32), volume NUMERIC, quote_volume NUMERIC,
+                    open_price NUMERIC, close_price NUMERIC, open_time_ms BIGINT, close_time_ms BIGINT
+                ) ON COMMIT DELETE ROWS
+            """)
+            cur.copy_expert("COPY kline_volume_stage FROM STDIN", buffer)
+            cur.execute("""
+                INSERT INTO token_pair_volume_hourly (
+                    token_pair, type, volume, quote_volume, open_price, close_price, open_time, close_time
+                )
+                SELECT DISTINCT ON (token_pair, type, open_time_ms)
+                    token_pair, type, volume, quote_volume, open_price, close_price,
+                    to_timestamp(open_time_ms / 1000.0), to_timestamp(close_time_ms / 1000.0)
+                FROM kline_volume_stage
+                ON CONFLICT (token_pair, type, open_time) DO UPDATE
+                SET volume = EXCLUDED.volume, quote_volume = EXCLUDED.quote_volume,
+                    open_price = EXCLUDED.open_price, close_price = EXCLUDED.close_price,
+                    close_time = EXCLUDED.close_time
+            """)
+            conn.commit()
+        logging.debug("Copied %d kline rows for %s (%s)", n, token_pair, data_type)
+    except psycopg2.Error as e:
+        conn.rollback()
+        logging.error("Error copying %d kline rows for %s (%s): %s", n, token_pair, data_type, e)
+        raise
+    finally:
+        cur.close()
+
+
+@traced(cat='kline')
 def _fetch_and_store_volume_range(
     fetch_fn,
     symbol: str,
@@ -227,38 +432,13 @@ def _fetch_and_store_volume_range(
 ):
     """
     Fetch klines for [start_time_ms, end_time_ms] and upsert into DB.
-    Uses pagination to handle ranges that exceed API limit.
+    Pages are fetched one ahead of the COPY writes (see `iter_kline_pages`).
     """
     conn = get_db_connection()
     try:
-        cursor_start = start_time_ms
-        while cursor_start < end_time_ms:
-            klines = fetch_fn(symbol, interval, cursor_start, end_time_ms, limit=MAX_KLINE_LIMIT)
-            if not klines:
-                break
-
-            # Ensure ascending by open_time
-            klines_sorted = sorted(klines, key=lambda k: int(k[0]) if isinstance(k[0], str) else k[0])
-
-            last_open_time_ms = None
-            for kline in klines_sorted:
-                open_time_ms, close_time_ms, volume, quote_volume, open_price, close_price = _normalize_kline_fields(kline)
-                insert_kline_volume(conn, symbol, volume, quote_volume, open_price, close_price, open_time_ms, close_time_ms, data_type)
-                last_open_time_ms = open_time_ms
-
-            if last_open_time_ms is None:
-                break
-
-            # Advance cursor; +1ms avoids repeating the last candle
-            next_cursor = last_open_time_ms + 1
-            if next_cursor <= cursor_start:
-                # Safety against non-advancing responses
-                break
-            cursor_start = next_cursor
-
-            # If we didn't hit the limit, we likely exhausted the range
-            if len(klines_sorted) < MAX_KLINE_LIMIT:
-                break
+        for page in iter_kline_pages(fetch_fn, symbol, interval, start_time_ms, end_time_ms):
+            with span('store_page', cat='db', symbol=symbol, rows=len(page)):
+                copy_kline_volume_page(conn, symbol, data_type, page)
     finally:
         conn.close()
 
@@ -395,7 +575,8 @@ def fetch_and_store_volume_alpha(symbol: str, interval: str = '1d', days_back: i
         raise
 
 
-def fill_history_kline_volume(interval: str = '1h', days: int = 7):
+@traced(cat='kline')
+def fill_history_kline_volume(interval: str = KLINE_INTERVAL, days: int = 7):
     """
     Backfill kline volume for the last `days` days (default: 7).
 
@@ -407,10 +588,9 @@ def fill_history_kline_volume(interval: str = '1h', days: int = 7):
     start_time_ms = int(start_time.timestamp() * 1000)
     end_time_ms = int(end_time.timestamp() * 1000)
 
-    # Keep defaults aligned with the daily fetch function.
-    aster_spot_symbols = ['SPACEUSD1']
-    aster_future_symbols = ['SPACEUSDT']
-    alpha_symbols = ['ALPHA_606USDT']
+    aster_spot_symbols = ASTER_SPOT_SYMBOLS
+    aster_future_symbols = ASTER_FUTURE_SYMBOLS
+    alpha_symbols = ALPHA_SYMBOLS
 
     logging.info("Backfilling klines from %s to %s", start_time, end_time)
 
@@ -433,14 +613,15 @@ def fill_history_kline_volume(interval: str = '1h', days: int = 7):
             logging.error("Backfill failed for %s (alpha): %s", symbol, e)
 
 
+@traced(cat='kline')
 def run_daily_kline_volume_fetch():
     """Fetch and store K-line volume data (callable by other modules)."""
     # You can specify symbols to fetch, or fetch all active symbols
     # Option 1: Fetch specific symbols
     
-    interval = '1h'  # Daily klines
+    interval = KLINE_INTERVAL
     days_back = 1    # Fetch yesterday's data
-    aster_spot_symbols = ['SPACEUSD1']
+    aster_spot_symbols = ASTER_SPOT_SYMBOLS
     logging.info("Starting to fetch volume data for %d symbols", len(aster_spot_symbols))
     for symbol in aster_spot_symbols:
         try:
@@ -449,7 +630,7 @@ def run_daily_kline_volume_fetch():
             logging.error("Failed to process %s: %s", symbol, e)
             continue
     
-    aster_future_symbols = ['SPACEUSDT']
+    aster_future_symbols = ASTER_FUTURE_SYMBOLS
     logging.info("Starting to fetch volume data for %d symbols", len(aster_future_symbols))
     for symbol in aster_future_symbols:
         try:
@@ -458,7 +639,7 @@ def run_daily_kline_volume_fetch():
             logging.error("Failed to process %s: %s", symbol, e)
             continue
     
-    alpha_symbols = ['ALPHA_606USDT']
+    alpha_symbols = ALPHA_SYMBOLS
     logging.info("Starting to fetch volume data for %d symbols", len(alpha_symbols))
     for symbol in alpha_symbols:
         try:
@@ -469,9 +650,182 @@ def run_daily_kline_volume_fetch():
     logging.info("Finished fetching volume data")
 
 
+def interval_to_ms(interval: str) -> int:
+    """Convert a kline interval such as '15s', '1m', '1h' or '1d' to milliseconds."""
+    units = {'s': 1000, 'm': 60_000, 'h': 3_600_000, 'd': 86_400_000, 'w': 604_800_000}
+    return int(interval[:-1]) * units[interval[-1]]
+
+
+class LiveKlineIngestor:
+    """
+    Keep `token_pair_volume_hourly` current while candles close.
+
+    Aster spot/futures candles arrive from kline websocket streams; Alpha has no
+    stream, so it is polled every `poll_interval` seconds with `startTime` at the
+    last stored candle. Aster symbols are also polled every `catchup_interval`
+    seconds to fill any candles missed while the websocket was reconnecting.
+    Closed candles are buffered and upserted in micro-batches every
+    `flush_interval` seconds (or as soon as `max_batch` rows are pending).
+
+    `stream` reuses a running AsterMarketStream (e.g. price_mgr's) instead of
+    opening a second set of connections; it must already subscribe to the kline
+    symbols at `interval`, and it is not started or stopped here.
+    """
+
+    def __init__(self, interval: str = KLINE_INTERVAL, spot_symbols: Optional[List[str]] = None,
+                 future_symbols: Optional[List[str]] = None, alpha_symbols: Optional[List[str]] = None,
+                 poll_interval: float = 15, catchup_interval: float = 300,
+                 flush_interval: float = 1.0, max_batch: int = 500,
+                 stream: Optional[AsterMarketStream] = None):
+        self.interval = interval
+        self.interval_ms = interval_to_ms(interval)
+        self.spot_symbols = list(ASTER_SPOT_SYMBOLS if spot_symbols is None else spot_symbols)
+        self.future_symbols = list(ASTER_FUTURE_SYMBOLS if future_symbols is None else future_symbols)
+        self.alpha_symbols = list(ALPHA_SYMBOLS if alpha_symbols is None else alpha_symbols)
+        self.poll_interval = poll_interval
+        self.catchup_interval = catchup_interval
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        # (token_pair, data_type, open_time_ms) -> row; a later update of the same candle replaces the earlier one
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_now = threading.Event()
+        self._stopped = threading.Event()
+        # (token_pair, data_type) -> open time of the newest stored candle; written by the
+        # flush thread, read by the poll thread
+        self._last_open_time = {}
+        self._last_open_lock = threading.Lock()
+        self._conn = None
+        self._threads = []
+        self._owns_stream = stream is None
+        if stream is None:
+            stream = AsterMarketStream(self.spot_symbols, self.future_symbols, interval)
+        elif stream.kline_interval != interval:
+            raise ValueError(f"Shared stream has {stream.kline_interval} klines, ingestion needs {interval}")
+        self.stream = stream
+        # A shared stream also carries symbols that are not ingested
+        self._stream_symbols = {
+            'spot': {s.upper() for s in self.spot_symbols}, 'future': {s.upper() for s in self.future_symbols},
+        }
+        self.stream.add_kline_listener(self._on_stream_kline)
+
+    def start(self):
+        self._stopped.clear()
+        if self._owns_stream:
+            self.stream.start()
+        self._threads = [
+            threading.Thread(target=self._flush_loop, name='kline-flush', daemon=True),
+            threading.Thread(target=self._poll_loop, name='kline-poll', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._flush_now.set()
+        if self._owns_stream:
+            self.stream.stop()
+        else:
+            self.stream.remove_kline_listener(self._on_stream_kline)
+        for thread in self._threads:
+            thread.join(timeout=10)
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def submit(self, symbol: str, data_type: str, kline: List):
+        """Queue one closed candle (REST kline layout) for the next micro-batch."""
+        open_time_ms, close_time_ms, volume, quote_volume, open_price, close_price = _normalize_kline_fields(kline)
+        row = (symbol, data_type, volume, quote_volume, open_price, close_price, open_time_ms, close_time_ms)
+        with self._lock:
+            self._pending[(symbol, data_type, open_time_ms)] = row
+            pending = len(self._pending)
+        if pending >= self.max_batch:
+            self._flush_now.set()
+
+    def _on_stream_kline(self, market: str, symbol: str, kline: dict):
+        if symbol.upper() not in self._stream_symbols[market]:
+            return
+        data_type = 'aster_spot' if market == 'spot' else 'aster_future'
+        self.submit(symbol, data_type, [
+            kline['t'], kline['o'], kline['h'], kline['l'], kline['c'], kline['v'], kline['T'], kline['q']
+        ])
+
+    def flush(self):
+        """Upsert everything pending; rows are re-queued if the write fails."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        rows = list(batch.values())
+        try:
+            if self._conn is None or self._conn.closed:
+                self._conn = get_db_connection()
+            upsert_kline_volume_batch(self._conn, rows)
+        except psycopg2.Error as e:
+            logging.error("Live kline flush failed, re-queueing %d rows: %s", len(rows), e)
+            if self._conn is not None and self._conn.closed:
+                self._conn = None
+            with self._lock:
+                for key, row in batch.items():
+                    self._pending.setdefault(key, row)
+            return 0
+        with self._last_open_lock:
+            for token_pair, data_type, *_, open_time_ms, _close_time_ms in rows:
+                key = (token_pair, data_type)
+                if open_time_ms > self._last_open_time.get(key, 0):
+                    self._last_open_time[key] = open_time_ms
+        return len(rows)
+
+    def _flush_loop(self):
+        while not self._stopped.is_set():
+            self._flush_now.wait(self.flush_interval)
+            self._flush_now.clear()
+            self.flush()
+
+    def _poll_loop(self):
+        sources = [(get_klines_alpha, self.alpha_symbols, 'alpha')]
+        catchup_sources = [
+            (get_klines, self.spot_symbols, 'aster_spot'),
+            (get_klines_futures, self.future_symbols, 'aster_future'),
+        ]
+        last_catchup = 0.0
+        while not self._stopped.is_set():
+            self.poll_closed(sources)
+            if time.monotonic() - last_catchup >= self.catchup_interval:
+                self.poll_closed(catchup_sources)
+                last_catchup = time.monotonic()
+            self._stopped.wait(self.poll_interval)
+
+    def poll_closed(self, sources):
+        """Fetch candles closed since the last stored one for each (fetch_fn, symbols, data_type)."""
+        now_ms = int(time.time() * 1000)
+        for fetch_fn, symbols, data_type in sources:
+            for symbol in symbols:
+                with self._last_open_lock:
+                    last_open = self._last_open_time.get((symbol, data_type))
+                start_ms = last_open + 1 if last_open is not None else now_ms - 2 * self.interval_ms
+                try:
+                    klines = fetch_fn(symbol, self.interval, start_ms, None, limit=MAX_KLINE_LIMIT)
+                except requests.exceptions.RequestException as e:
+                    logging.error("Live kline poll failed for %s (%s): %s", symbol, data_type, e)
+                    continue
+                for kline in klines:
+                    # Only closed candles; the open one is still changing
+                    if int(kline[6]) < now_ms:
+                        self.submit(symbol, data_type, kline)
+
+
+def run_live_kline_ingestion(interval: str = KLINE_INTERVAL,
+                             stream: Optional[AsterMarketStream] = None) -> LiveKlineIngestor:
+    """Start streaming ingestion for the default symbols (callable by other modules), optionally on a shared stream."""
+    ingestor = LiveKlineIngestor(interval, stream=stream)
+    ingestor.start()
+    logging.info("Started live kline ingestion for %s candles", interval)
+    return ingestor
+
+
 if __name__ == '__main__':
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s'
-    )
+    setup_logging(json_format=False, console=True)
     fill_history_kline_volume()
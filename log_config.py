@@ -0,0 +1,130 @@
+"""
+Central logging setup: records are handed to a queue on the calling thread and
+formatted / written by a background listener, so a log call costs a queue put.
+"""
+import atexit
+import contextlib
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from typing import Optional
+
+
+LOG_FILE = os.environ.get('LOG_FILE', 'log')
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_MAX_BYTES = 50 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Record attributes copied into the JSON output when set (via `extra=` or `log_context`)
+CONTEXT_FIELDS = ('tick', 'venue', 'chain', 'symbol')
+
+_context: contextvars.ContextVar = contextvars.ContextVar('log_context', default={})
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """Attach fields (tick id, venue, ...) to every record logged by this thread inside the block."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the current `log_context` onto the record; explicit `extra=` values win."""
+
+    def filter(self, record):
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, context fields and exception."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        for key in CONTEXT_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    `QueueHandler.prepare` formats the message on the calling thread; this one
+    enqueues the record untouched so `msg % args` runs in the listener thread,
+    and only for records that pass the level check.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(level=LOG_LEVEL, path: Optional[str] = LOG_FILE, json_format: bool = True,
+                  console: bool = False, max_bytes: int = LOG_MAX_BYTES,
+                  backup_count: int = LOG_BACKUP_COUNT) -> logging.handlers.QueueListener:
+    """
+    Route the root logger through a queue to a rotating file (and optionally stderr).
+
+    Safe to call more than once; later calls are no-ops. Library modules must not
+    call `logging.basicConfig` themselves - entry points call this instead.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(
+        '%(asctime)s - %(levelname)s - %(threadName)s - %(message)s')
+    handlers = []
+    if path:
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    if console or not path:
+        stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(formatter)
+        handlers.append(stream_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the background writer."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
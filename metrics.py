@@ -0,0 +1,321 @@
+"""In-process metrics exposed in Prometheus text format on a local HTTP port."""
+import bisect
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('METRICS_PORT', '9464'))
+
+# Seconds; covers a fast local DB write up to a slow RPC timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    A named metric family. `labels(*values)` returns the child for one label
+    combination; children are cached, so the hot path is a dict lookup plus
+    an update under the child's own lock.
+    """
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} requires labels {self.labelnames}")
+        return self.labels()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled().inc(amount)
+
+    def samples(self):
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}'
+            for key, child in list(self._children.items())
+        ]
+
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_to_current_time(self):
+        self.value = time.time()
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._unlabelled().set(value)
+
+    def samples(self):
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}'
+            for key, child in list(self._children.items())
+        ]
+
+
+class AgeGauge(Gauge):
+    """Stores the time of the last `touch()` and exports the seconds elapsed since then."""
+
+    def samples(self):
+        now = time.time()
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(max(now - child.value, 0.0))}'
+            for key, child in list(self._children.items())
+            if child.value
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        # Non-cumulative per bucket, last slot is +Inf; made cumulative when rendered
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self, errors: Optional[_CounterChild] = None):
+        return Timer(self, errors)
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self._unlabelled().observe(value)
+
+    def time(self, errors: Optional[_CounterChild] = None):
+        return self._unlabelled().time(errors)
+
+    def samples(self):
+        lines = []
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Timer:
+    """
+    Context manager / decorator observing elapsed seconds into a histogram
+    child; when the body raises, `errors` (a counter child) is incremented
+    and the exception propagates.
+    """
+
+    __slots__ = ('histogram', 'errors', '_start')
+
+    def __init__(self, histogram: _HistogramChild, errors: Optional[_CounterChild] = None):
+        self.histogram = histogram
+        self.errors = errors
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self._start)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc()
+        return False
+
+    def __call__(self, fn):
+        histogram, errors = self.histogram, self.errors
+
+        def wrapper(*args, **kwargs):
+            with Timer(histogram, errors):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.__wrapped__ = fn
+        return wrapper
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+
+# ---- Metrics shared by the collectors -------------------------------------
+
+RPC_SECONDS = Histogram(
+    'rave_rpc_seconds', 'JSON-RPC call latency by chain and call', ('chain', 'call'))
+HTTP_SECONDS = Histogram(
+    'rave_http_seconds', 'Exchange REST request latency by venue and endpoint', ('venue', 'endpoint'))
+DB_WRITE_SECONDS = Histogram(
+    'rave_db_write_seconds', 'Database write latency by table', ('table',))
+TICK_SECONDS = Histogram(
+    'rave_tick_seconds', 'Duration of one full price_mgr polling tick')
+POLL_SECONDS = Histogram(
+    'rave_poll_seconds', 'Duration of one poll of a chain or CEX feed, including DB writes', ('venue', 'chain'))
+ERRORS = Counter(
+    'rave_errors_total', 'Errors by kind (rpc/http/db/read/rejected/preflight/lease_lost) and source', ('kind', 'source'))
+PRICE_AGE = AgeGauge(
+    'rave_price_age_seconds', 'Seconds since the last accepted price was stored', ('venue', 'chain'))
+QUERY_SECONDS = Histogram(
+    'rave_query_seconds', 'Query service database round trips by query', ('query',))
+QUERY_CACHE = Counter(
+    'rave_query_cache_total', 'Query service result cache lookups by query and result (hit/miss)', ('query', 'result'))
+
+
+def error_counter(kind: str, source: str) -> _CounterChild:
+    return ERRORS.labels(kind, source)
+
+
+def time_rpc(chain: str, call: str) -> Timer:
+    return RPC_SECONDS.labels(chain, call).time(ERRORS.labels('rpc', chain))
+
+
+def time_http(venue: str, endpoint: str) -> Timer:
+    return HTTP_SECONDS.labels(venue, endpoint).time(ERRORS.labels('http', venue))
+
+
+def time_db_write(table: str) -> Timer:
+    return DB_WRITE_SECONDS.labels(table).time(ERRORS.labels('db', table))
+
+
+# ---- Exporter ----------------------------------------------------------------
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the application log
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> ThreadingHTTPServer:
+    """Serve /metrics from a daemon thread; rendering happens only when scraped."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    logging.info("Metrics exporter listening on http://%s:%s/metrics", host, port)
+    return server
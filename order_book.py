@@ -0,0 +1,308 @@
+"""Local L2 order book mirror for Aster spot and futures."""
+import bisect
+import datetime
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import aster_future
+import aster_spot
+from aster_ws import FUTURES_WS_HOST, SPOT_WS_HOST, StreamConnection, combined_stream_url
+from data import insert_order_book_snapshots
+
+
+SNAPSHOT_DEPTH_LIMIT = 1000
+PERSIST_LEVELS = 20
+
+
+class BookSide:
+    """
+    One side of the book: a sorted key list for bisect plus a price -> qty dict.
+
+    Bids are keyed by -price so that index 0 is the best level on both sides.
+    Lookups are O(log n); inserts/removals shift the key list (memmove).
+    """
+
+    def __init__(self, descending: bool):
+        self.descending = descending
+        self._keys: List[float] = []
+        self.levels: Dict[float, float] = {}
+
+    def _key(self, price: float) -> float:
+        return -price if self.descending else price
+
+    def clear(self):
+        self._keys.clear()
+        self.levels.clear()
+
+    def set(self, price: float, qty: float):
+        key = self._key(price)
+        if qty == 0:
+            if self.levels.pop(price, None) is not None:
+                index = bisect.bisect_left(self._keys, key)
+                del self._keys[index]
+            return
+        if price not in self.levels:
+            bisect.insort(self._keys, key)
+        self.levels[price] = qty
+
+    def best(self) -> Optional[Tuple[float, float]]:
+        if not self._keys:
+            return None
+        price = self._key(self._keys[0])
+        return price, self.levels[price]
+
+    def qty_at(self, price: float) -> float:
+        return self.levels.get(price, 0.0)
+
+    def qty_through(self, price: float) -> float:
+        """Total quantity from the best level up to and including `price`."""
+        end = bisect.bisect_right(self._keys, self._key(price))
+        return sum(self.levels[self._key(key)] for key in self._keys[:end])
+
+    def iter_levels(self, count: Optional[int] = None):
+        keys = self._keys if count is None else self._keys[:count]
+        for key in keys:
+            price = self._key(key)
+            yield price, self.levels[price]
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class OrderBook:
+    """
+    L2 book for one symbol, built from a REST snapshot plus diff-depth events.
+
+    Sequence checks follow the exchange rules: the first applied event must
+    straddle the snapshot's lastUpdateId, and every later event must continue
+    from the previous one (`pu` on futures, `U == last u + 1` on spot). A gap
+    makes `apply_diff` return False and the book must be re-snapshotted.
+    """
+
+    def __init__(self, symbol: str, market: str):
+        self.symbol = symbol
+        self.market = market
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.last_update_id: Optional[int] = None
+        self._bridged = False
+        self.lock = threading.RLock()
+
+    @property
+    def synced(self) -> bool:
+        return self.last_update_id is not None
+
+    def reset(self):
+        with self.lock:
+            self.bids.clear()
+            self.asks.clear()
+            self.last_update_id = None
+            self._bridged = False
+
+    def apply_snapshot(self, snapshot: dict):
+        with self.lock:
+            self.reset()
+            for price, qty in snapshot['bids']:
+                self.bids.set(float(price), float(qty))
+            for price, qty in snapshot['asks']:
+                self.asks.set(float(price), float(qty))
+            self.last_update_id = int(snapshot['lastUpdateId'])
+
+    def apply_diff(self, event: dict) -> bool:
+        """Apply one depthUpdate event; returns False on a sequence gap."""
+        with self.lock:
+            if self.last_update_id is None:
+                return False
+            first_id, final_id = int(event['U']), int(event['u'])
+            if final_id <= self.last_update_id:
+                # Already contained in the snapshot
+                return True
+            if not self._bridged:
+                if first_id > self.last_update_id + 1:
+                    return False
+                self._bridged = True
+            elif 'pu' in event:
+                if int(event['pu']) != self.last_update_id:
+                    return False
+            elif first_id != self.last_update_id + 1:
+                return False
+            for price, qty in event['b']:
+                self.bids.set(float(price), float(qty))
+            for price, qty in event['a']:
+                self.asks.set(float(price), float(qty))
+            self.last_update_id = final_id
+            return True
+
+    def best_bid(self) -> Optional[Tuple[float, float]]:
+        with self.lock:
+            return self.bids.best()
+
+    def best_ask(self) -> Optional[Tuple[float, float]]:
+        with self.lock:
+            return self.asks.best()
+
+    def depth_at(self, side: str, price: float) -> float:
+        """Resting quantity at exactly `price`; side is 'BID' or 'ASK'."""
+        with self.lock:
+            return self._side(side).qty_at(price)
+
+    def depth_through(self, side: str, price: float) -> float:
+        """Cumulative quantity from the top of `side` through `price`."""
+        with self.lock:
+            return self._side(side).qty_through(price)
+
+    def vwap_for_size(self, order_side: str, size: float) -> Tuple[Optional[float], float]:
+        """
+        Average fill price for a market order of `size` base units.
+
+        Args:
+            order_side: 'BUY' (walks the asks) or 'SELL' (walks the bids)
+            size: Base quantity to fill
+
+        Returns:
+            (vwap, filled_qty); vwap is None when the book is empty on that side
+        """
+        with self.lock:
+            levels = self.asks if order_side == 'BUY' else self.bids
+            remaining = size
+            notional = 0.0
+            for price, qty in levels.iter_levels():
+                take = min(qty, remaining)
+                notional += take * price
+                remaining -= take
+                if remaining <= 0:
+                    break
+            filled = size - max(remaining, 0.0)
+            if filled == 0:
+                return None, 0.0
+            return notional / filled, filled
+
+    def compact(self, levels: int = PERSIST_LEVELS):
+        """Return (last_update_id, bids, asks) with the top `levels` of each side."""
+        with self.lock:
+            return (
+                self.last_update_id,
+                [[price, qty] for price, qty in self.bids.iter_levels(levels)],
+                [[price, qty] for price, qty in self.asks.iter_levels(levels)],
+            )
+
+    def _side(self, side: str) -> BookSide:
+        return self.bids if side == 'BID' else self.asks
+
+
+class OrderBookMaintainer:
+    """
+    Keeps `OrderBook`s for `symbols` in sync from the `<symbol>@depth@100ms` streams.
+
+    Events that arrive before the REST snapshot (or after a gap) are buffered and
+    replayed once a fresh snapshot is applied. Every `snapshot_interval` seconds
+    the top `persist_levels` of each synced book are written to Postgres.
+    """
+
+    def __init__(self, market: str, symbols: List[str], snapshot_interval: float = 60,
+                 persist_levels: int = PERSIST_LEVELS):
+        if market not in ('spot', 'future'):
+            raise ValueError(f"Unknown market: {market}")
+        self.market = market
+        self.snapshot_interval = snapshot_interval
+        self.persist_levels = persist_levels
+        self.books = {symbol.upper(): OrderBook(symbol.upper(), market) for symbol in symbols}
+        self._fetch_depth = aster_spot.get_depth if market == 'spot' else aster_future.get_depth
+        self._buffers: Dict[str, List[dict]] = {symbol: [] for symbol in self.books}
+        self._resyncing = set()
+        self._stopped = threading.Event()
+        self._persist_thread = None
+        host = SPOT_WS_HOST if market == 'spot' else FUTURES_WS_HOST
+        streams = [f"{symbol.lower()}@depth@100ms" for symbol in self.books]
+        self.connection = StreamConnection(
+            combined_stream_url(host, streams), self._on_message, name=f'aster-{market}-depth'
+        )
+
+    def start(self):
+        self._stopped.clear()
+        self.connection.start()
+        if self.snapshot_interval:
+            self._persist_thread = threading.Thread(
+                target=self._persist_loop, name=f'aster-{self.market}-book-persist', daemon=True
+            )
+            self._persist_thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self.connection.stop()
+
+    def get_book(self, symbol: str) -> Optional[OrderBook]:
+        """The book for `symbol`, or None while it is not synced."""
+        book = self.books.get(symbol.upper())
+        if book is None or not book.synced:
+            return None
+        return book
+
+    def _on_message(self, payload: dict):
+        event = payload.get('data', payload)
+        if event.get('e') != 'depthUpdate':
+            return
+        book = self.books.get(event['s'])
+        if book is None:
+            return
+        with book.lock:
+            if book.synced and book.apply_diff(event):
+                return
+            if book.synced:
+                logging.warning("Order book gap for %s (%s), resyncing", book.symbol, self.market)
+                book.reset()
+                self._buffers[book.symbol] = []
+            self._buffers[book.symbol].append(event)
+            if book.symbol in self._resyncing:
+                return
+            self._resyncing.add(book.symbol)
+        threading.Thread(target=self._resync, args=(book,), daemon=True).start()
+
+    def _resync(self, book: OrderBook):
+        try:
+            snapshot = self._fetch_depth(book.symbol, SNAPSHOT_DEPTH_LIMIT)
+        except Exception as e:
+            logging.error("Depth snapshot failed for %s (%s): %s", book.symbol, self.market, e)
+            with book.lock:
+                self._resyncing.discard(book.symbol)
+            return
+        with book.lock:
+            self._resyncing.discard(book.symbol)
+            book.apply_snapshot(snapshot)
+            buffered, self._buffers[book.symbol] = self._buffers[book.symbol], []
+            for event in buffered:
+                if not book.apply_diff(event):
+                    # The snapshot is older than the buffered stream; the next event triggers another resync
+                    logging.warning("Snapshot for %s (%s) did not bridge the stream", book.symbol, self.market)
+                    book.reset()
+                    break
+            else:
+                logging.info("Order book synced for %s (%s) at %s", book.symbol, self.market, book.last_update_id)
+
+    def persist_snapshots(self):
+        now = datetime.datetime.now()
+        rows = []
+        for book in self.books.values():
+            if not book.synced:
+                continue
+            last_update_id, bids, asks = book.compact(self.persist_levels)
+            rows.append((self.market, book.symbol, last_update_id, bids, asks, now))
+        insert_order_book_snapshots(rows)
+
+    def _persist_loop(self):
+        while not self._stopped.wait(self.snapshot_interval):
+            try:
+                self.persist_snapshots()
+            except Exception as e:
+                logging.error("Order book snapshot persist error (%s): %s", self.market, e)
+
+
+# if __name__ == '__main__':
+#     books = OrderBookMaintainer('future', ['RAVEUSDT'])
+#     books.start()
+#     while True:
+#         time.sleep(1)
+#         book = books.get_book('RAVEUSDT')
+#         if book:
+#             print(book.best_bid(), book.best_ask(), book.vwap_for_size('BUY', 1000))
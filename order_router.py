@@ -0,0 +1,358 @@
+"""
+Split one order across several pools so the total output is as large as possible.
+
+    python order_router.py buy 5000                # plan only: spend 5000 quote across every V3 venue
+    python order_router.py sell 200000 --execute   # sell 200k base and send the legs
+
+Every pool is read once (one multicall per chain for the prices, then one
+per pool for the initialized ticks ahead of the price) and its output curve is
+computed locally with the V3 swap step: constant liquidity between initialized
+ticks, `liquidityNet` applied at each crossing. Trying a split costs no RPC.
+The order is then handed out in `steps` slices, each to the pool whose next
+slice yields the most (output is concave in input, so this greedy fill
+converges on equal marginal prices).
+
+Only TICK_WORDS bitmap words ahead of the price are read; past them the curve
+assumes no liquidity, so a leg that would run further is under- rather than
+over-estimated and its `amount_out_min` stays reachable.
+"""
+import argparse
+import heapq
+import itertools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from dex_base import DexBase, PoolReader, PoolSnapshot, multicall_read
+from tracing import span
+
+
+Q96 = 2 ** 96
+DEFAULT_STEPS = 200
+DEFAULT_SLIPPAGE_BPS = 50
+# With per-leg costs, every subset of pools is tried up to this many pools
+MAX_SUBSET_POOLS = 8
+# tickBitmap words (256 tick spacings each) read ahead of the current price per pool
+TICK_WORDS = int(os.environ.get('ROUTER_TICK_WORDS', '4'))
+MIN_TICK, MAX_TICK = -887272, 887272
+
+
+def tick_to_sqrt_price_x96(tick: int) -> int:
+    """sqrtPriceX96 at `tick`; float precision is plenty for estimating output."""
+    tick = min(max(tick, MIN_TICK), MAX_TICK)
+    return int(1.0001 ** (tick / 2) * Q96)
+
+
+@dataclass(frozen=True)
+class LiquidityCurve:
+    """
+    Output of a V3 pool for an exact input. Liquidity is constant between the
+    initialized ticks in `crossings` and changes by their liquidityNet as the
+    price crosses them; past `limit_sqrt_price_x96` (the end of the ticks that
+    were read) no liquidity is assumed. Without crossings or a limit the
+    in-range liquidity is used for the whole move.
+    """
+    sqrt_price_x96: int
+    liquidity: int
+    fee_ppm: int
+    zero_for_one: bool
+    # (sqrtPriceX96 of an initialized tick, its liquidityNet) in swap order
+    crossings: Tuple[Tuple[int, int], ...] = ()
+    limit_sqrt_price_x96: Optional[int] = None
+
+    def amount_out(self, amount_in: int) -> int:
+        """Raw output for a raw input, fee taken from the input as the pool does."""
+        if amount_in <= 0:
+            return 0
+        remaining = amount_in * (1_000_000 - self.fee_ppm) // 1_000_000
+        liquidity, sqrt_price = self.liquidity, self.sqrt_price_x96
+        boundaries = list(self.crossings)
+        if self.limit_sqrt_price_x96 is not None:
+            boundaries.append((self.limit_sqrt_price_x96, None))
+        out = 0
+        for target, liquidity_net in boundaries:
+            if self.zero_for_one and target > sqrt_price or not self.zero_for_one and target < sqrt_price:
+                target = sqrt_price
+            if liquidity > 0:
+                needed = self._input_to(sqrt_price, target, liquidity)
+                if remaining < needed:
+                    return out + self._step_out(sqrt_price, remaining, liquidity)
+                remaining -= needed
+                out += self._output_to(sqrt_price, target, liquidity)
+            sqrt_price = target
+            if liquidity_net is None:
+                return out
+            # Crossing downwards leaves the range the tick opened, upwards enters it
+            liquidity += -liquidity_net if self.zero_for_one else liquidity_net
+        if liquidity > 0:
+            out += self._step_out(sqrt_price, remaining, liquidity)
+        return out
+
+    def _input_to(self, sqrt_price: int, target: int, liquidity: int) -> int:
+        """Input (after fee) that moves the price to `target`, rounded up."""
+        if self.zero_for_one:
+            return -(-liquidity * Q96 * (sqrt_price - target) // (sqrt_price * target))
+        return -(-liquidity * (target - sqrt_price) // Q96)
+
+    def _output_to(self, sqrt_price: int, target: int, liquidity: int) -> int:
+        if self.zero_for_one:
+            return liquidity * (sqrt_price - target) // Q96
+        return liquidity * Q96 * (target - sqrt_price) // (sqrt_price * target)
+
+    def _step_out(self, sqrt_price: int, amount: int, liquidity: int) -> int:
+        """Output of `amount` (after fee) that stays within one liquidity range."""
+        if amount <= 0:
+            return 0
+        if self.zero_for_one:
+            # token0 in: sqrtP' = L * sqrtP / (L + amount * sqrtP / Q96)
+            next_sqrt = -(-liquidity * sqrt_price * Q96 // (liquidity * Q96 + amount * sqrt_price))
+            return liquidity * (sqrt_price - next_sqrt) // Q96
+        # token1 in: sqrtP' = sqrtP + amount * Q96 / L
+        next_sqrt = sqrt_price + amount * Q96 // liquidity
+        return liquidity * Q96 * (next_sqrt - sqrt_price) // (sqrt_price * next_sqrt)
+
+
+_tick_spacings: Dict[str, int] = {}
+
+
+def read_tick_crossings(dex: DexBase, tick: int, zero_for_one: bool,
+                        words: int = TICK_WORDS) -> Tuple[Tuple[Tuple[int, int], ...], int]:
+    """
+    Initialized ticks the price meets when moving from `tick` in the swap direction,
+    as ((sqrtPriceX96, liquidityNet), ...) in swap order, plus the sqrtPriceX96
+    where the `words` bitmap words that were read end.
+    """
+    pair, chain = dex.pair, dex.chain or ''
+    spacing = _tick_spacings.get(pair.address)
+    if spacing is None:
+        spacing = _tick_spacings[pair.address] = int(pair.functions.tickSpacing().call())
+    compressed = tick // spacing
+    if zero_for_one:
+        # Downwards the tick the price sits on is crossed first
+        first_word = compressed >> 8
+        word_positions = [first_word - i for i in range(words)]
+        in_direction = lambda c: c <= compressed
+        limit_tick = word_positions[-1] * 256 * spacing
+    else:
+        first_word = (compressed + 1) >> 8
+        word_positions = [first_word + i for i in range(words)]
+        in_direction = lambda c: c > compressed
+        limit_tick = (word_positions[-1] * 256 + 255) * spacing
+    bitmaps = multicall_read(dex.web3, [pair.functions.tickBitmap(position) for position in word_positions], chain)
+    initialized = []
+    for position, bitmap in zip(word_positions, bitmaps):
+        if bitmap is None:
+            raise ValueError(f"tickBitmap({position}) reverted")
+        bits = [bit for bit in range(256) if bitmap >> bit & 1]
+        initialized.extend(c for c in (position * 256 + bit for bit in bits) if in_direction(c))
+    initialized.sort(reverse=zero_for_one)
+    ticks = [c * spacing for c in initialized]
+    infos = multicall_read(dex.web3, [pair.functions.ticks(t) for t in ticks], chain) if ticks else []
+    crossings = []
+    for t, info in zip(ticks, infos):
+        if info is None:
+            raise ValueError(f"ticks({t}) reverted")
+        # liquidityGross, liquidityNet, ... in every V3 fork
+        crossings.append((tick_to_sqrt_price_x96(t), int(info[1])))
+    return tuple(crossings), tick_to_sqrt_price_x96(limit_tick)
+
+
+@dataclass
+class _PoolSide:
+    """One candidate pool seen from the order's side, in human units."""
+    name: str
+    dex: DexBase
+    curve: LiquidityCurve
+    token_in_is0: bool
+    decimals_in: int
+    decimals_out: int
+
+    def output(self, amount_in: float) -> float:
+        raw = self.curve.amount_out(int(amount_in * 10 ** self.decimals_in))
+        return raw / 10 ** self.decimals_out
+
+
+@dataclass
+class RouteLeg:
+    name: str
+    dex: DexBase
+    token_in_is0: bool
+    amount_in: int           # raw units of the input token on this pool's chain
+    expected_out: int        # raw units of the output token
+    amount_out_min: int
+    share: float             # fraction of the order
+
+
+@dataclass
+class RoutePlan:
+    side: str
+    amount_in: float         # human units
+    expected_out: float      # human units, before leg costs
+    net_out: float           # expected_out minus the costs of the legs used
+    legs: List[RouteLeg] = field(default_factory=list)
+
+    def describe(self) -> str:
+        lines = [f"{self.side} {self.amount_in:g}: expected {self.expected_out:.6g} (net {self.net_out:.6g})"]
+        for leg in self.legs:
+            lines.append(f"  {leg.name:<28} {leg.share:6.1%}  in {leg.amount_in}  out~{leg.expected_out}"
+                         f"  min {leg.amount_out_min}")
+        return '\n'.join(lines)
+
+
+def _pool_side(name: str, dex: PoolReader, snapshot: Optional[PoolSnapshot], side: str) -> Optional[_PoolSide]:
+    if not isinstance(dex, DexBase):
+        logging.info("Skipping %s for routing: read-only pool", name)
+        return None
+    if snapshot is None or snapshot.liquidity is None or snapshot.tick is None or getattr(dex, 'fee', None) is None:
+        logging.info("Skipping %s for routing: no pool state or fee", name)
+        return None
+    quote_is0 = dex.quote_token_address == dex.token0
+    # buy = spend quote for base, sell = spend base for quote
+    token_in_is0 = quote_is0 if side == 'buy' else not quote_is0
+    try:
+        with span('route_ticks', cat='dex', venue=name):
+            crossings, limit = read_tick_crossings(dex, snapshot.tick, token_in_is0)
+    except Exception as e:
+        logging.info("Skipping %s for routing: tick read failed: %s", name, e)
+        return None
+    decimals0, decimals1 = dex.token0_decimals, dex.token1_decimals
+    return _PoolSide(
+        name, dex,
+        LiquidityCurve(snapshot.sqrt_price_x96, snapshot.liquidity, int(dex.fee), token_in_is0, crossings, limit),
+        token_in_is0,
+        decimals0 if token_in_is0 else decimals1,
+        decimals1 if token_in_is0 else decimals0,
+    )
+
+
+def _fill(pools: Sequence[_PoolSide], amount: float, steps: int) -> Tuple[List[float], float]:
+    """Greedy water-fill: each slice goes to the pool with the largest marginal output."""
+    slice_size = amount / steps
+    allocated = [0.0] * len(pools)
+    outputs = [0.0] * len(pools)
+    heap = [(-pool.output(slice_size), index) for index, pool in enumerate(pools)]
+    heapq.heapify(heap)
+    for _ in range(steps):
+        gain, index = heapq.heappop(heap)
+        allocated[index] += slice_size
+        outputs[index] -= gain
+        next_output = pools[index].output(allocated[index] + slice_size)
+        heapq.heappush(heap, (-(next_output - outputs[index]), index))
+    # Recompute from the final allocation so the total is not a sum of rounded slices
+    total = sum(pool.output(amount_in) for pool, amount_in in zip(pools, allocated) if amount_in)
+    return allocated, total
+
+
+def plan_route(venue_dexes: Sequence[Tuple[str, PoolReader]], side: str, amount: float,
+               slippage_bps: int = DEFAULT_SLIPPAGE_BPS, steps: int = DEFAULT_STEPS,
+               leg_costs: Optional[Dict[str, float]] = None,
+               snapshots: Optional[List[Optional[PoolSnapshot]]] = None) -> RoutePlan:
+    """
+    Split `amount` (human units of the input token) over `venue_dexes`.
+
+    side: 'buy' spends the quote token, 'sell' spends the base token.
+    leg_costs: optional per-venue cost of using a pool (e.g. gas), in output
+        token units; pools whose extra output does not cover it are dropped.
+    snapshots: pool states to plan against; read in one batch when omitted.
+    """
+    if side not in ('buy', 'sell'):
+        raise ValueError(f"side must be 'buy' or 'sell', not {side!r}")
+    if amount <= 0:
+        raise ValueError("amount must be positive")
+    if snapshots is None:
+        with span('route_snapshots', cat='dex', pools=len(venue_dexes)):
+            snapshots = PoolReader.get_prices([dex for _, dex in venue_dexes])
+    # Tick reads are one round trip pair per pool; pools on different chains read concurrently
+    with ThreadPoolExecutor(max_workers=max(len(venue_dexes), 1)) as executor:
+        sides = list(executor.map(
+            lambda item: _pool_side(item[0][0], item[0][1], item[1], side), zip(venue_dexes, snapshots)
+        ))
+    candidates = [pool for pool in sides if pool is not None]
+    if not candidates:
+        raise ValueError("No routable pools")
+
+    leg_costs = leg_costs or {}
+    if leg_costs and len(candidates) <= MAX_SUBSET_POOLS:
+        subsets = [
+            list(subset) for size in range(1, len(candidates) + 1)
+            for subset in itertools.combinations(candidates, size)
+        ]
+    else:
+        subsets = [candidates]
+
+    best = None
+    with span('route_fill', cat='dex', pools=len(candidates), subsets=len(subsets)):
+        for pools in subsets:
+            allocated, total = _fill(pools, amount, steps)
+            used = [(pool, amount_in) for pool, amount_in in zip(pools, allocated) if amount_in > 0]
+            net = total - sum(leg_costs.get(pool.name, 0.0) for pool, _ in used)
+            if best is None or net > best[2]:
+                best = (used, total, net)
+    used, total, net = best
+
+    legs = []
+    for pool, amount_in in used:
+        raw_in = int(amount_in * 10 ** pool.decimals_in)
+        expected = pool.curve.amount_out(raw_in)
+        legs.append(RouteLeg(
+            name=pool.name, dex=pool.dex, token_in_is0=pool.token_in_is0, amount_in=raw_in,
+            expected_out=expected, amount_out_min=expected * (10_000 - slippage_bps) // 10_000,
+            share=amount_in / amount,
+        ))
+    return RoutePlan(side, amount, total, net, legs)
+
+
+def execute_plan(plan: RoutePlan, max_workers: int = 8) -> List[Tuple[RouteLeg, object]]:
+    """
+    Send every leg through its pool's `swap`. Legs on different chains / accounts
+    run concurrently; legs sharing an account run one after another, since each
+    swap takes the account's next nonce. Returns (leg, receipt or exception).
+    """
+    groups: Dict[tuple, List[RouteLeg]] = {}
+    for leg in plan.legs:
+        groups.setdefault((leg.dex.chain, leg.dex.account.address), []).append(leg)
+
+    def run_group(legs):
+        results = []
+        for leg in legs:
+            try:
+                with span('route_leg', cat='dex', venue=leg.name):
+                    receipt = leg.dex.swap(leg.amount_in, leg.token_in_is0, leg.amount_out_min)
+                results.append((leg, receipt))
+            except Exception as e:
+                logging.error("Route leg %s failed: %s", leg.name, e)
+                results.append((leg, e))
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_group, legs) for legs in groups.values()]
+        return [result for future in futures for result in future.result()]
+
+
+if __name__ == '__main__':
+    from log_config import setup_logging
+    from venue_registry import load_registry
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('side', choices=('buy', 'sell'))
+    parser.add_argument('amount', type=float, help='input amount in token units')
+    parser.add_argument('--venues', nargs='*', help='venue names (default: every venue with pool state)')
+    parser.add_argument('--slippage-bps', type=int, default=DEFAULT_SLIPPAGE_BPS)
+    parser.add_argument('--steps', type=int, default=DEFAULT_STEPS)
+    parser.add_argument('--execute', action='store_true', help='send the swaps; without it only the plan is printed')
+    args = parser.parse_args()
+
+    setup_logging(json_format=False, console=True)
+    registry = load_registry()
+    selected = [
+        (venue.name, dex) for venue, dex in registry.build_dexes()
+        if not args.venues or venue.name in args.venues
+    ]
+    route = plan_route(selected, args.side, args.amount, args.slippage_bps, args.steps)
+    print(route.describe())
+    if args.execute:
+        for leg, outcome in execute_plan(route):
+            status = getattr(outcome, 'status', None)
+            print(f"{leg.name}: {'ok' if status == 1 else outcome}")
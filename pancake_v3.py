@@ -8,11 +8,13 @@ from dotenv import load_dotenv
 from web3.middleware import ExtraDataToPOAMiddleware
 
 from dex_base import DexBase
-from util import sqrt_ratio_x96_to_price
+from tracing import span, traced
 load_dotenv()
-logging.basicConfig(filename='log', level=logging.INFO)
 
 class PancakeV3Dex(DexBase):
+    chain = 'bsc'
+    BATCHABLE_READS = ('slot0', 'liquidity')
+
     def __init__(self, pair_address, quote_token_address='0x55d398326f99059fF775485246999027B3197955'):
         self.pair_address = pair_address
         self.router_address = Web3.to_checksum_address('0x1b81D678ffb9C0263b24A97847620C99d213eB14')  # Pancake V3 Router
@@ -36,18 +38,16 @@ class PancakeV3Dex(DexBase):
         self.token1_decimals = self.token1_contract.functions.decimals().call()
         self.router_abi = V3_ROUTER_ABI
 
+    @traced(cat='dex')
     def get_price(self):
-        slot0 = self.pair.functions.slot0().call()
-        sqrtPriceX96 = slot0[0]
-        price = sqrt_ratio_x96_to_price(sqrtPriceX96, self.token0_decimals, self.token1_decimals)
-        # 如果quote token是token0，返回price（token1 per token0）；否则返回倒数（token0 per token1）
-        if self.quote_token_address == self.token0:
-            price_inv = 1 / price if price != 0 else 0
-            logging.info(f"Current price (base token per quote token): {price_inv}")
-            return price_inv
-        else:
-            logging.info(f"Current price (quote token per base token): {price}")
-            return price
+        with span('eth_call', cat='rpc', chain=self.chain):
+            slot0 = self.pair.functions.slot0().call()
+        price = self.price_from_sqrt_price(slot0[0])
+        logging.debug("Current price (quote token per base token): %s", price)
+        return price
+
+    def snapshot_reads(self):
+        return [self.pair.functions.slot0(), self.pair.functions.liquidity()]
 
     def swap(self, amount_in, token_in_is0, amount_out_min=0, sqrt_price_limit_x96=0):
         token_in = self.token0 if token_in_is0 else self.token1
@@ -55,18 +55,6 @@ class PancakeV3Dex(DexBase):
         nonce = self.web3.eth.get_transaction_count(self.account.address)
         # 根据 token_in 动态选择 approve 的 token 合约
         approve_contract = self.token0_contract if token_in_is0 else self.token1_contract
-        approve_tx = approve_contract.functions.approve(self.router_address, amount_in).build_transaction({
-            'from': self.account.address,
-            'nonce': nonce
-        })
-        signed_approve = self.web3.eth.account.sign_transaction(approve_tx, self.account.key)
-        approve_hash = self.web3.eth.send_raw_transaction(signed_approve.raw_transaction)
-        logging.info(f"Approve tx: {approve_hash.hex()}")
-        res = self.web3.eth.wait_for_transaction_receipt(approve_hash)
-        if res.status == 1:
-            logging.info("Approve transaction succeeded!")
-        else:
-            logging.info("Approve transaction failed!")
         fee = self.fee
         # 构造dict参数，严格按照ABI结构体顺序
         params = {
@@ -86,10 +74,30 @@ class PancakeV3Dex(DexBase):
             'gas': 300000,
             'gasPrice': int(self.web3.eth.gas_price)
         })
+        # 先假定授权已完成来模拟，必然 revert 的 swap 连 approve 也不发送（失败时抛出 SwapReverted）
+        simulated = self.preflight(swap_tx, token_in, amount_in, amount_out_min, sqrt_price_limit_x96,
+                                   approve_contract=approve_contract)
+        approve_tx = approve_contract.functions.approve(self.router_address, amount_in).build_transaction({
+            'from': self.account.address,
+            'nonce': nonce
+        })
+        signed_approve = self.web3.eth.account.sign_transaction(approve_tx, self.account.key)
+        approve_hash = self.web3.eth.send_raw_transaction(signed_approve.raw_transaction)
+        logging.info("Approve tx: %s", approve_hash.hex())
+        res = self.wait_for_receipt(approve_hash)
+        if res.status == 1:
+            logging.info("Approve transaction succeeded!")
+        else:
+            logging.info("Approve transaction failed!")
+            # 模拟时假定了授权，approve 失败后 swap 必然 revert，不再发送
+            raise RuntimeError(f"Approve transaction {approve_hash.hex()} failed, swap not sent")
+        if simulated is None:
+            # 无法覆盖该 token 的授权时，在 approve 之后再模拟
+            self.preflight(swap_tx, token_in, amount_in, amount_out_min, sqrt_price_limit_x96)
         signed_swap = self.web3.eth.account.sign_transaction(swap_tx, self.account.key)
         swap_hash = self.web3.eth.send_raw_transaction(signed_swap.raw_transaction)
-        logging.info(f"Swap tx: {swap_hash.hex()}")
-        receipt = self.web3.eth.wait_for_transaction_receipt(swap_hash)
+        logging.info("Swap tx: %s", swap_hash.hex())
+        receipt = self.wait_for_receipt(swap_hash)
         if receipt.status == 1:
             logging.info("Swap transaction succeeded!")
         else:
@@ -106,7 +114,7 @@ class PancakeV3Dex(DexBase):
 #     dex = PancakeV3Dex(pair_address)
 #     logging.info("Testing get_price:")
 #     price = dex.get_price()
-#     logging.info(f"Current price: {price}")
+#     logging.info("Current price: %s", price)
 #     logging.info("Testing swap:")
 #     receipt = dex.swap(amount_in, token_in_is0, amount_out_min, sqrt_price_limit_x96)
-#     logging.info(f"Swap receipt: {receipt}")
\ No newline at end of file
+#     logging.info("Swap receipt: %s", receipt)
\ No newline at end of file
@@ -0,0 +1,221 @@
+"""
+Simulate a transaction with eth_call before it is signed and broadcast.
+
+`PreflightSimulator.check` runs the exact transaction (sender, calldata,
+value, gas, gas price) against the pending block and raises `SwapReverted`
+with a decoded reason when it would fail, so a doomed swap costs one eth_call
+instead of gas and a block of waiting. Results are cached per (chain, params,
+state): callers pass a params key without volatile fields such as the deadline,
+and the state is the pool state when known, else the current block.
+
+`allowance_override` lets a swap be simulated before its approve transactions
+are sent: it finds the token's allowance mapping slot once per token and
+returns an eth_call state override that sets the router's allowance.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+from eth_abi import decode, encode
+from eth_utils import keccak
+from web3.exceptions import ContractLogicError
+
+from metrics import error_counter, time_rpc
+from tracing import span
+
+
+ERROR_SELECTOR = bytes.fromhex('08c379a0')   # Error(string)
+PANIC_SELECTOR = bytes.fromhex('4e487b71')   # Panic(uint256)
+PANIC_CODES = {
+    0x01: 'assertion failed',
+    0x11: 'arithmetic overflow or underflow',
+    0x12: 'division or modulo by zero',
+    0x21: 'invalid enum value',
+    0x22: 'invalid storage byte array',
+    0x31: 'pop on empty array',
+    0x32: 'array index out of bounds',
+    0x41: 'out of memory',
+    0x51: 'call to zero function pointer',
+}
+# Short revert strings of the V3 routers / pools and what they usually mean
+KNOWN_REASONS = {
+    'STF': 'token transferFrom failed (allowance or balance too low)',
+    'TF': 'token transfer failed',
+    'Too little received': 'output below amountOutMinimum',
+    'Transaction too old': 'deadline passed',
+    'SPL': 'sqrtPriceLimitX96 on the wrong side of the current price',
+    'AS': 'amountSpecified is zero',
+    'LOK': 'pool is locked',
+    'IIA': 'insufficient input amount',
+}
+_CALL_FIELDS = ('from', 'to', 'data', 'value', 'gas', 'gasPrice', 'maxFeePerGas', 'maxPriorityFeePerGas')
+# Storage indexes tried for an ERC20's allowance mapping, with Solidity and Vyper key hashing
+ALLOWANCE_SLOT_PROBES = 16
+_PROBE_VALUE = 0x5eed5eed5eed5eed
+
+
+class SwapReverted(Exception):
+    def __init__(self, reason: str, data: bytes = b''):
+        super().__init__(reason)
+        self.reason = reason
+        self.data = data
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    success: bool
+    reason: Optional[str]
+    return_data: bytes
+
+
+def decode_revert(data) -> str:
+    """Human-readable reason for revert data (bytes or hex string)."""
+    if isinstance(data, str):
+        data = bytes.fromhex(data[2:] if data.startswith('0x') else data)
+    if not data:
+        return 'reverted without reason (or out of gas)'
+    selector, payload = data[:4], data[4:]
+    try:
+        if selector == ERROR_SELECTOR:
+            (message,) = decode(['string'], payload)
+            return f"{message} ({KNOWN_REASONS[message]})" if message in KNOWN_REASONS else message
+        if selector == PANIC_SELECTOR:
+            (code,) = decode(['uint256'], payload)
+            return f"panic 0x{code:02x}: {PANIC_CODES.get(code, 'unknown panic')}"
+    except Exception:
+        pass
+    return f"custom error 0x{selector.hex()}" + (f" (0x{payload.hex()})" if payload else '')
+
+
+def _revert_data(error: ContractLogicError) -> bytes:
+    data = error.data
+    if isinstance(data, dict):
+        data = data.get('data')
+    if isinstance(data, str) and data.startswith('0x'):
+        try:
+            return bytes.fromhex(data[2:])
+        except ValueError:
+            return b''
+    return data if isinstance(data, bytes) else b''
+
+
+class PreflightSimulator:
+    """eth_call dry runs with a bounded LRU of results."""
+
+    def __init__(self, max_entries: int = 1024, block_identifier: str = 'pending'):
+        self.max_entries = max_entries
+        self.block_identifier = block_identifier
+        self._cache: "OrderedDict[Hashable, SimulationResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def simulate(self, web3, tx: dict, params_key: Optional[Hashable] = None,
+                 state_key: Optional[Hashable] = None, chain: str = '',
+                 state_override: Optional[dict] = None) -> SimulationResult:
+        """
+        params_key: identifies the swap without volatile fields; defaults to the raw
+            (from, to, data, value), which only repeats when the calldata does.
+            It must also cover whatever `state_override` depends on.
+        state_key: pool state the result depends on; defaults to the latest block number.
+        state_override: eth_call state override, e.g. from `allowance_override`.
+        """
+        if params_key is None:
+            params_key = (tx.get('from'), tx.get('to'), tx.get('data'), tx.get('value', 0))
+        if state_key is None:
+            state_key = web3.eth.block_number
+        key = (id(web3), params_key, state_key)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        call = {field: tx[field] for field in _CALL_FIELDS if field in tx}
+        try:
+            with time_rpc(chain, 'preflight'), span('preflight', cat='rpc', chain=chain):
+                if state_override:
+                    return_data = web3.eth.call(call, self.block_identifier, state_override)
+                else:
+                    return_data = web3.eth.call(call, self.block_identifier)
+            result = SimulationResult(True, None, bytes(return_data))
+        except ContractLogicError as e:
+            data = _revert_data(e)
+            reason = decode_revert(data) if data else (e.message or str(e))
+            result = SimulationResult(False, reason, data)
+
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return result
+
+    def check(self, web3, tx: dict, params_key: Optional[Hashable] = None,
+              state_key: Optional[Hashable] = None, chain: str = '',
+              state_override: Optional[dict] = None) -> SimulationResult:
+        """`simulate`, raising SwapReverted instead of returning a failed result."""
+        result = self.simulate(web3, tx, params_key, state_key, chain, state_override)
+        if not result.success:
+            error_counter('preflight', chain).inc()
+            logging.error("Preflight on %s: transaction would revert: %s", chain, result.reason)
+            raise SwapReverted(result.reason, result.return_data)
+        return result
+
+
+def _allowance_slot(index: int, owner: str, spender: str, vyper: bool) -> bytes:
+    """Storage slot of allowance[owner][spender] for a mapping declared at `index`."""
+    if vyper:
+        inner = keccak(encode(['uint256', 'address'], [index, owner]))
+        return keccak(inner + encode(['address'], [spender]))
+    inner = keccak(encode(['address', 'uint256'], [owner, index]))
+    return keccak(encode(['address'], [spender]) + inner)
+
+
+# (id(web3), token) -> (index, vyper) of the allowance mapping, or None when no probe matched
+_allowance_layouts = {}
+_layouts_lock = threading.Lock()
+
+
+def _find_allowance_layout(web3, token_contract, owner: str, spender: str):
+    key = (id(web3), token_contract.address)
+    with _layouts_lock:
+        if key in _allowance_layouts:
+            return _allowance_layouts[key]
+    data = token_contract.functions.allowance(owner, spender)._encode_transaction_data()
+    probe = '0x' + _PROBE_VALUE.to_bytes(32, 'big').hex()
+    layout = None
+    for vyper in (False, True):
+        for index in range(ALLOWANCE_SLOT_PROBES):
+            slot = '0x' + _allowance_slot(index, owner, spender, vyper).hex()
+            try:
+                raw = web3.eth.call({'to': token_contract.address, 'data': data}, 'latest',
+                                    {token_contract.address: {'stateDiff': {slot: probe}}})
+            except Exception as e:
+                logging.info("Allowance slot probe failed for %s: %s", token_contract.address, e)
+                break
+            if len(raw) >= 32 and int.from_bytes(bytes(raw[:32]), 'big') == _PROBE_VALUE:
+                layout = (index, vyper)
+                break
+        if layout is not None:
+            break
+    if layout is None:
+        logging.info("No allowance slot found for %s; simulating after the approvals", token_contract.address)
+    with _layouts_lock:
+        _allowance_layouts[key] = layout
+    return layout
+
+
+def allowance_override(web3, token_contract, owner: str, spender: str, amount: int) -> Optional[dict]:
+    """
+    eth_call state override giving `spender` an allowance of `amount` from `owner`,
+    or None when the token's storage layout could not be found.
+    """
+    layout = _find_allowance_layout(web3, token_contract, owner, spender)
+    if layout is None:
+        return None
+    slot = '0x' + _allowance_slot(layout[0], owner, spender, layout[1]).hex()
+    return {token_contract.address: {'stateDiff': {slot: '0x' + int(amount).to_bytes(32, 'big').hex()}}}
+
+
+# Shared by every DEX client
+simulator = PreflightSimulator()
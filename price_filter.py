@@ -0,0 +1,114 @@
+"""Sanity checks applied to every fetched price before it is written to the database."""
+import logging
+import math
+import statistics
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from tick_buffer import TickBufferSet
+
+
+# 1.4826 * MAD estimates the standard deviation of normally distributed prices
+MAD_SCALE = 1.4826
+
+
+@dataclass(frozen=True)
+class ValidationResult:
+    accepted: bool
+    reason: str = 'ok'
+    flags: Tuple[str, ...] = field(default_factory=tuple)
+
+
+def is_valid_number(value) -> bool:
+    """False for None, non-numbers, NaN, inf, zero and negative values."""
+    if value is None or isinstance(value, bool):
+        return False
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return False
+    return math.isfinite(value) and value > 0
+
+
+class PriceValidator:
+    """
+    Decide whether a venue's new price may be persisted.
+
+    1. None / NaN / inf / <= 0 is rejected outright.
+    2. The price is compared to the venue's recent history (last `window` seconds
+       in the tick buffers): a move beyond `mad_k` scaled MADs, and at least
+       `min_band` relative, is a jump.
+    3. A jump is accepted when other venues quoting the same asset are within
+       `cross_tolerance` of the new price (the whole market moved), or once it
+       has repeated for `confirm_after` consecutive ticks (a real level shift on
+       one venue). Otherwise it is rejected as an outlier.
+
+    Only accepted prices should be recorded into the tick buffers, so a single
+    bad print never widens the band.
+    """
+
+    def __init__(self, buffers: TickBufferSet, window: float = 300, mad_k: float = 6.0,
+                 min_band: float = 0.01, min_samples: int = 5, cross_tolerance: float = 0.05,
+                 cross_max_age: float = 60, confirm_after: int = 3):
+        self.buffers = buffers
+        self.window = window
+        self.mad_k = mad_k
+        self.min_band = min_band
+        self.min_samples = min_samples
+        self.cross_tolerance = cross_tolerance
+        self.cross_max_age = cross_max_age
+        self.confirm_after = confirm_after
+        self._assets: Dict[str, str] = {}
+        self._pending_jumps: Dict[str, int] = {}
+
+    def register(self, venue: str, asset: str):
+        """Venues registered with the same asset are used to cross-check each other."""
+        self._assets[venue] = asset
+
+    def cross_venue_reference(self, venue: str, now: float) -> Optional[float]:
+        """Median of the other venues' latest fresh prices for the same asset."""
+        asset = self._assets.get(venue)
+        if asset is None:
+            return None
+        prices = []
+        for other, other_asset in self._assets.items():
+            if other == venue or other_asset != asset:
+                continue
+            buffer = self.buffers.get(other)
+            last = buffer.last() if buffer is not None else None
+            if last is not None and now - last[0] <= self.cross_max_age:
+                prices.append(last[1])
+        return statistics.median(prices) if prices else None
+
+    def check(self, venue: str, price, now: float) -> ValidationResult:
+        if not is_valid_number(price):
+            return ValidationResult(False, 'invalid')
+        price = float(price)
+
+        buffer = self.buffers.get(venue)
+        history = buffer.window(self.window, now)[1] if buffer is not None else []
+        if len(history) < self.min_samples:
+            return ValidationResult(True, 'ok', ('cold',))
+
+        median = statistics.median(history)
+        mad = statistics.median(abs(p - median) for p in history)
+        band = max(self.mad_k * MAD_SCALE * mad, self.min_band * median)
+        if abs(price - median) <= band:
+            self._pending_jumps.pop(venue, None)
+            return ValidationResult(True)
+
+        reference = self.cross_venue_reference(venue, now)
+        if reference is not None and abs(price / reference - 1) <= self.cross_tolerance:
+            self._pending_jumps.pop(venue, None)
+            return ValidationResult(True, 'ok', ('jump', 'confirmed_by_venues'))
+
+        repeats = self._pending_jumps.get(venue, 0) + 1
+        if repeats >= self.confirm_after:
+            self._pending_jumps.pop(venue, None)
+            return ValidationResult(True, 'ok', ('jump', 'persisted'))
+        self._pending_jumps[venue] = repeats
+        logging.warning(
+            "Rejected outlier for %s: %s (median %s, band %s, cross-venue %s)",
+            venue, price, median, band, reference,
+        )
+        return ValidationResult(False, 'jump', ('jump',))
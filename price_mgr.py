@@ -1,73 +1,365 @@
 import time
+import argparse
+import atexit
+import contextvars
 import datetime
 import logging
-from web3 import Web3
-from pancake_v4 import PancakeV4Dex
-from uniswap_v4 import UniswapV4Dex
-from aerodrome_v3 import AerodromeV3Dex
-from data import insert_historical, upsert_latest, insert_rave_cex_history, upsert_penrose_cex_latest
-from aster_future import get_latest_funding_rate
-from aster_spot import get_latest_price_spot
-from fetch_kline_volume import run_daily_kline_volume_fetch
-
-logging.basicConfig(filename='log', level=logging.INFO)
-# 实际主网合约地址请替换
-PANCAKE_ID = '0x101552cfd9d16f17db7d11fde6082e4671e9fe39cb21679bb3fad5be9e5ec2c9'
-PANCAKE_MGR = Web3.to_checksum_address('0xa0FfB9c1CE1Fe56963B0321B32E7A0302114058b')
-
-UNISWAP_ID = '0xCA47E80BD01A1F5BCC8CF709D48A5399D533447E03D56F488498DC83C35B5831'
-UNISWAP_STATE_VIEW = Web3.to_checksum_address('0x7ffe42c4a5deea5b0fec41c94c136cf115597227')  # USDT on Ethereum
-
-AERO_PAIR = Web3.to_checksum_address('0x51663B8A28E7Ea197c5CcF983AfC084Da0a8023D')
-QUOTE_TOKEN_AERODROME = Web3.to_checksum_address('0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913')  # USDT on Base
-
-def main():
-    pancake = PancakeV4Dex(PANCAKE_ID, PANCAKE_MGR)
-    uniswap = UniswapV4Dex(UNISWAP_ID, UNISWAP_STATE_VIEW)
-    aerodrome = AerodromeV3Dex(AERO_PAIR, quote_token_address=QUOTE_TOKEN_AERODROME)
-    last_kline_fetch_date = None
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dex_base import PoolReader
+from data import (get_conn, insert_historical, upsert_latest, insert_rave_cex_history, insert_rave_cex_history_batch,
+                  upsert_penrose_cex_latest, upsert_penrose_cex_latest_batch)
+from aster_future import get_all_premium_index, get_latest_funding_rate
+from aster_spot import get_all_spot_prices, get_latest_price_spot
+from aster_ws import AsterMarketStream
+from block_scheduler import BlockScheduler
+from fetch_kline_volume import (ASTER_FUTURE_SYMBOLS, ASTER_SPOT_SYMBOLS, KLINE_INTERVAL, run_daily_kline_volume_fetch,
+                                run_live_kline_ingestion)
+from log_config import log_context, setup_logging
+from metrics import ERRORS, POLL_SECONDS, PRICE_AGE, TICK_SECONDS, start_metrics_server
+from price_filter import PriceValidator, is_valid_number
+from sharding import DEFAULT_SHARD_COUNT, SINGLETON_SHARD, ShardCoordinator
+from tick_buffer import TickBufferSet
+from tick_tape import TapeRecorder
+from tracing import enable_tracing, span
+from venue_registry import load_registry
 
-    while True:
-        now = datetime.datetime.now()
-        # Run kline volume fetch once per day
-        if last_kline_fetch_date != now.date():
-            try:
-                run_daily_kline_volume_fetch()
-                last_kline_fetch_date = now.date()
-            except Exception as e:
-                logging.info("Daily kline volume fetch error: %s", e)
+
+# 池子、交易所和交易对配置见 venues.yaml
+POLL_INTERVAL = 5
+# block：每条链出新块时才读取池子（按池子活跃度自适应间隔）；interval：每 POLL_INTERVAL 秒读取一次
+POLL_MODES = ('block', 'interval')
+# stream：每个交易对读 websocket 缓存，缺失时逐个 REST 请求；batch：每轮两次全量 REST 请求，一条语句写入全部交易对
+CEX_MODES = ('stream', 'batch')
+MAX_POLL_WORKERS = 16
+# worker 模式下池子客户端初始化失败后的重试间隔（秒），每次失败翻倍
+BUILD_RETRY_MIN = 30
+BUILD_RETRY_MAX = 600
+
+# 每个池子/交易对最近的价格，供信号、看板和校验使用，无需查询 rave_dex_historical
+tick_buffers = TickBufferSet()
+# 写库前的价格校验，只有通过校验的价格才会写入 tick_buffers 和数据库
+price_validator = PriceValidator(tick_buffers)
+# 设置 RECORD_FILE 时把每轮读到的价格录制下来，供 replay.py 离线回放
+recorder = None
+# batch 模式下与 premiumIndex 并发请求全量现货价格
+_snapshot_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cex-snapshot')
+# worker 模式下由 main 设置：写库前再确认一次租约，读取耗时超过租约余量时不会和新的持有者重复写入
+owns_venue = None
+
+
+def still_owns(name):
+    """True unless worker mode is on and the shard of `name` was lost since the poll started."""
+    if owns_venue is None or owns_venue(name):
+        return True
+    ERRORS.labels('lease_lost', name).inc()
+    logging.info("%s shard lease lost during the poll, dropping its write", name, extra={'venue': name})
+    return False
+
+
+def get_cex_prices(market_stream, feed):
+    """Read spot/funding from the websocket cache, falling back to REST when it is empty or stale."""
+    funding = market_stream.get_funding(feed.future_symbol)
+    if funding is None:
+        funding = get_latest_funding_rate(feed.future_symbol)
+    if funding is None:
+        funding = (None, None, None)
+    spot_price = market_stream.get_spot_price(feed.spot_symbol)
+    if spot_price is None:
+        spot_price = get_latest_price_spot(feed.spot_symbol)
+    mark_price, index_price, funding_rate = funding
+    return spot_price, index_price, mark_price, funding_rate
+
+
+def poll_chain(venue_dexes, now):
+    """Read every pool of one chain in a single batched call, then store each price; returns the snapshots."""
+    chain = venue_dexes[0][0].chain
+    with POLL_SECONDS.labels(chain, chain).time(), log_context(chain=chain), span('poll_chain', chain=chain):
+        venues = [venue for venue, _ in venue_dexes]
+        snapshots = PoolReader.get_prices([dex for _, dex in venue_dexes])
+        if recorder is not None:
+            recorder.record_dex([venue.name for venue in venues], snapshots, now.timestamp())
+        store_chain_snapshots(venues, snapshots, now)
+        return snapshots
+
+
+def store_chain_snapshots(venues, snapshots, now):
+    """Validate and persist one chain's pool snapshots; shared by live polling and replay."""
+    for venue, snapshot in zip(venues, snapshots):
+        if snapshot is None:
+            ERRORS.labels('read', venue.name).inc()
+            logging.info("%s error: pool read failed", venue.name, extra={'venue': venue.name})
+            continue
+        with span('validate', venue=venue.name):
+            result = price_validator.check(venue.name, snapshot.price, now.timestamp())
+        if not result.accepted:
+            ERRORS.labels('rejected', venue.name).inc()
+            logging.info("%s price %s rejected: %s", venue.name, snapshot.price, result.reason,
+                         extra={'venue': venue.name})
+            continue
+        tick_buffers.record(venue.name, now.timestamp(), snapshot.price, snapshot.block_number)
+        if not still_owns(venue.name):
+            continue
         try:
-            price_pancake = pancake.get_price()
-            insert_historical(0, price_pancake, now)
-            upsert_latest(0, price_pancake, now)
+            with span('store', cat='db', venue=venue.name):
+                insert_historical(venue.dex_type, snapshot.price, now)
+                upsert_latest(venue.dex_type, snapshot.price, now)
+            PRICE_AGE.labels(venue.name, venue.chain).set_to_current_time()
         except Exception as e:
-            logging.info("PancakeV3Dex error: %s", e)
+            logging.info("%s error: %s", venue.name, e, extra={'venue': venue.name})
+
+
+def poll_cex(feed, market_stream, now):
+    with POLL_SECONDS.labels(feed.name, feed.type).time(), log_context(venue=feed.name), span('poll_cex', venue=feed.name):
         try:
-            price_uniswap = uniswap.get_price()
-            insert_historical(1, price_uniswap, now)
-            upsert_latest(1, price_uniswap, now)
+            prices = get_cex_prices(market_stream, feed)
         except Exception as e:
-            logging.info("UniswapV3Dex error: %s", e)
+            logging.info("Error fetching funding rate or spot price for %s: %s", feed.name, e)
+            return
+        if recorder is not None:
+            recorder.record_cex(feed.name, prices, now.timestamp())
+        store_cex_prices(feed, prices, now)
+
+
+def poll_cex_batch(feeds, now):
+    """
+    Batch snapshot mode: one all-symbol /ticker/price and one /premiumIndex request
+    per tick, fanned out to every feed and written with a single multi-row upsert,
+    so the cost does not grow with the number of tracked symbols.
+    """
+    if not feeds:
+        return
+    with POLL_SECONDS.labels('cex_batch', 'cex').time(), span('poll_cex_batch', feeds=len(feeds)):
+        spot_request = _snapshot_executor.submit(get_all_spot_prices)
+        premium_index = get_all_premium_index()
+        spot_prices = spot_request.result()
+        checked = []
+        for feed in feeds:
+            mark_price, index_price, funding_rate = premium_index.get(feed.future_symbol, (None, None, None))
+            prices = (spot_prices.get(feed.spot_symbol), index_price, mark_price, funding_rate)
+            if recorder is not None:
+                recorder.record_cex(feed.name, prices, now.timestamp())
+            with log_context(venue=feed.name):
+                if check_cex_prices(feed, prices, now):
+                    checked.append((feed, prices))
+        latest_rows, history_rows, stored = [], [], []
+        for feed, prices in checked:
+            if not still_owns(feed.name):
+                continue
+            latest_rows.append((feed.cex, feed.symbol, *prices, now))
+            if feed.history:
+                history_rows.append((feed.cex, *prices, now))
+            stored.append(feed)
         try:
-            price_aero = aerodrome.get_price()
-            insert_historical(2, price_aero, now)
-            upsert_latest(2, price_aero, now)
+            with span('store', cat='db', rows=len(latest_rows)):
+                upsert_penrose_cex_latest_batch(latest_rows)
+                insert_rave_cex_history_batch(history_rows)
         except Exception as e:
-            logging.info("AerodromeV3Dex error: %s", e)
-        try:
-            mark_price, index_price, funding_rate = get_latest_funding_rate('RAVEUSDT')
-            spot_price = get_latest_price_spot('RAVEUSD1')
-            logging.info(f"Fetched funding rate: {funding_rate}, spot price: {spot_price}")
-            upsert_penrose_cex_latest(
-                6, 'RAVE', spot_price, index_price, mark_price, funding_rate, now
-            )
+            logging.info("Error storing batch CEX prices: %s", e)
+            return
+        for feed in stored:
+            PRICE_AGE.labels(feed.name, feed.type).set_to_current_time()
+
+
+def check_cex_prices(feed, prices, now):
+    """Validate one CEX feed's (spot, index, mark, funding); accepted spot prices go into tick_buffers."""
+    spot_price, index_price, mark_price, funding_rate = prices
+    logging.info("Fetched funding rate: %s, spot price: %s", funding_rate, spot_price)
+    if not (is_valid_number(index_price) and is_valid_number(mark_price) and funding_rate is not None):
+        ERRORS.labels('read', feed.name).inc()
+        logging.info("%s funding data missing or invalid, skipping tick", feed.name)
+        return False
+    result = price_validator.check(feed.name, spot_price, now.timestamp())
+    if not result.accepted:
+        ERRORS.labels('rejected', feed.name).inc()
+        logging.info("%s spot price %s rejected: %s", feed.name, spot_price, result.reason)
+        return False
+    tick_buffers.record(feed.name, now.timestamp(), spot_price)
+    return True
+
+
+def store_cex_prices(feed, prices, now):
+    """Validate and persist one CEX feed's (spot, index, mark, funding); shared by live polling and replay."""
+    try:
+        if not check_cex_prices(feed, prices, now) or not still_owns(feed.name):
+            return
+        spot_price, index_price, mark_price, funding_rate = prices
+        upsert_penrose_cex_latest(
+            feed.cex, feed.symbol, spot_price, index_price, mark_price, funding_rate, now
+        )
+        if feed.history:
             insert_rave_cex_history(
-                6, spot_price, index_price, mark_price, funding_rate, now
+                feed.cex, spot_price, index_price, mark_price, funding_rate, now
             )
+        PRICE_AGE.labels(feed.name, feed.type).set_to_current_time()
+    except Exception as e:
+        logging.info("Error storing prices for %s: %s", feed.name, e)
+
+
+class OwnedVenues:
+    """
+    The venues this process polls. Without a coordinator that is every venue;
+    in worker mode only venues whose shard this worker currently leases, with
+    DEX clients built the first time their shard is acquired. A venue whose
+    client fails to build is retried with exponential backoff.
+    """
+
+    def __init__(self, registry, coordinator=None):
+        self.registry = registry
+        self.coordinator = coordinator
+        self._dexes = {}
+        # Chain poller threads share this object: the lock guards _dexes / _building / _retry_at
+        self._lock = threading.Lock()
+        self._building = set()
+        self._retry_at = {}
+        if coordinator is None:
+            self._dexes = {venue.name: dex for venue, dex in registry.build_dexes()}
+
+    def _dex(self, venue):
+        with self._lock:
+            dex = self._dexes.get(venue.name)
+            if dex is not None or self.coordinator is None or venue.name in self._building:
+                return dex
+            retry_at, _ = self._retry_at.get(venue.name, (0.0, 0.0))
+            if time.monotonic() < retry_at:
+                return None
+            self._building.add(venue.name)
+        # Constructors make RPC calls: build outside the lock so other chains keep polling
+        try:
+            dex = venue.build()
         except Exception as e:
-            logging.info("Error fetching funding rate or spot price: %s", e)
+            with self._lock:
+                _, delay = self._retry_at.get(venue.name, (0.0, 0.0))
+                delay = min(max(delay * 2, BUILD_RETRY_MIN), BUILD_RETRY_MAX)
+                self._retry_at[venue.name] = (time.monotonic() + delay, delay)
+                self._building.discard(venue.name)
+            logging.error("Failed to initialise venue %s (%s), retrying in %.0fs: %s",
+                          venue.name, venue.type, delay, e)
+            return None
+        with self._lock:
+            self._dexes[venue.name] = dex
+            self._retry_at.pop(venue.name, None)
+            self._building.discard(venue.name)
+        return dex
+
+    def owns(self, name):
+        return self.coordinator is None or self.coordinator.owns_name(name)
+
+    def dexes_by_chain(self, chain=None):
+        """Owned (venue, dex) pairs grouped by chain; with `chain`, only that chain's venues are built."""
+        chains = {}
+        for venue in self.registry.dex:
+            if chain is not None and venue.chain != chain:
+                continue
+            if not self.owns(venue.name):
+                continue
+            dex = self._dex(venue)
+            if dex is not None:
+                chains.setdefault(venue.chain, []).append((venue, dex))
+        return chains
+
+    def cex_feeds(self):
+        return [feed for feed in self.registry.cex if self.owns(feed.name)]
+
+    def runs_singletons(self):
+        """Kline ingestion and the daily fetch run in exactly one process."""
+        return self.coordinator is None or self.coordinator.owns(SINGLETON_SHARD)
+
+
+def main(worker=False, shard_count=DEFAULT_SHARD_COUNT, poll_mode='block', cex_mode='stream'):
+    setup_logging()
+    start_metrics_server()
+    # 设置 TRACE_FILE 时记录每轮各阶段耗时，可用 chrome://tracing 或 ui.perfetto.dev 打开
+    enable_tracing()
+    global recorder, owns_venue
+    if os.environ.get('RECORD_FILE'):
+        recorder = TapeRecorder(os.environ['RECORD_FILE'])
+        atexit.register(recorder.close)
+    registry = load_registry()
+    for venue in registry.dex:
+        price_validator.register(venue.name, venue.asset or venue.name)
+    for feed in registry.cex:
+        price_validator.register(feed.name, feed.symbol)
+    coordinator = None
+    if worker:
+        # 多进程/多机部署：按 shard 租约分配池子，只有租约持有者才读取和写库
+        coordinator = ShardCoordinator(get_conn, shard_count)
+        coordinator.start()
+        atexit.register(coordinator.stop)
+    owned = OwnedVenues(registry, coordinator)
+    if coordinator is not None:
+        owns_venue = owned.owns
+    market_stream = None
+    if cex_mode == 'stream':
+        # K 线实时采集复用同一组连接：一并订阅 K 线交易对
+        market_stream = AsterMarketStream(
+            list(dict.fromkeys(registry.spot_symbols() + list(ASTER_SPOT_SYMBOLS))),
+            list(dict.fromkeys(registry.future_symbols() + list(ASTER_FUTURE_SYMBOLS))),
+            KLINE_INTERVAL,
+        )
+        market_stream.start()
+    if poll_mode == 'block':
+        # DEX 池子由各链的出块线程读取，下面的主循环只处理 CEX 和定时任务
+        scheduler = BlockScheduler(
+            sorted({venue.chain for venue in registry.dex}),
+            lambda chain: owned.dexes_by_chain(chain).get(chain, []),
+            poll_chain,
+        )
+        scheduler.start()
+        atexit.register(scheduler.stop)
+    # Closed candles are upserted as they close; the daily fetch below reconciles any gaps
+    kline_ingestor = None
+    last_kline_fetch_date = None
+    executor = ThreadPoolExecutor(max_workers=MAX_POLL_WORKERS)
+    tick = 0
+
+    while True:
+        tick += 1
+        now = datetime.datetime.now()
+        runs_singletons = owned.runs_singletons()
+        if runs_singletons and kline_ingestor is None:
+            kline_ingestor = run_live_kline_ingestion(stream=market_stream)
+        elif not runs_singletons and kline_ingestor is not None:
+            kline_ingestor.stop()
+            kline_ingestor = None
+        # Run kline volume fetch once per day
+        if runs_singletons and last_kline_fetch_date != now.date():
+            try:
+                run_daily_kline_volume_fetch()
+                last_kline_fetch_date = now.date()
+            except Exception as e:
+                logging.info("Daily kline volume fetch error: %s", e)
+        # 同链池子合并成一次 multicall，各链之间并发读取
+        with TICK_SECONDS.time(), log_context(tick=tick), span('tick', tick=tick):
+            # 复制 context，让工作线程里的日志也带上 tick id
+            tasks = []
+            if poll_mode == 'interval':
+                tasks += [
+                    executor.submit(contextvars.copy_context().run, poll_chain, venue_dexes, now)
+                    for venue_dexes in owned.dexes_by_chain().values()
+                ]
+            if cex_mode == 'batch':
+                tasks.append(executor.submit(contextvars.copy_context().run, poll_cex_batch, owned.cex_feeds(), now))
+            else:
+                tasks += [
+                    executor.submit(contextvars.copy_context().run, poll_cex, feed, market_stream, now)
+                    for feed in owned.cex_feeds()
+                ]
+            for task in tasks:
+                task.result()
 
-        time.sleep(5)
+        time.sleep(POLL_INTERVAL)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Poll DEX pools and CEX feeds and store their prices.')
+    parser.add_argument('--worker', action='store_true',
+                        help='share venues with other workers through shard leases in Postgres')
+    parser.add_argument('--shards', type=int, default=int(os.environ.get('PRICE_MGR_SHARDS', DEFAULT_SHARD_COUNT)),
+                        help='number of shards venues are hashed into (same value on every worker)')
+    parser.add_argument('--poll-mode', choices=POLL_MODES, default=os.environ.get('POLL_MODE', 'block'),
+                        help='read pools on every new block (adaptive) or on a fixed interval')
+    parser.add_argument('--cex-mode', choices=CEX_MODES, default=os.environ.get('CEX_MODE', 'stream'),
+                        help='per-symbol websocket/REST reads, or two all-symbol REST snapshots per tick')
+    args = parser.parse_args()
+    main(args.worker, args.shards, args.poll_mode, args.cex_mode)
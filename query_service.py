@@ -0,0 +1,675 @@
+"""
+Read-only GraphQL service over the collected price, candle and volume history.
+
+    python query_service.py --port 8080        # GraphiQL at http://127.0.0.1:8080/graphql
+
+Nested fields (e.g. `venues { latest prices { ... } }`) are resolved through
+per-request DataLoaders, so N venues cost one query per field instead of N.
+Lists use keyset pagination (`first` / `after`, `pageInfo.endCursor`), and
+results go through an LRU cache: results older than the reconciliation horizon
+(`FINAL_SECONDS`, past anything the daily kline fetch still backfills) are kept
+until evicted, settled but more recent ones for `SETTLED_TTL` seconds, and
+anything touching the live edge for `LIVE_TTL` seconds.
+"""
+import argparse
+import base64
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import graphene
+from flask import Flask, Response
+from flask_graphql import GraphQLView
+from graphene.types.datetime import DateTime
+from promise import Promise
+from promise.dataloader import DataLoader
+
+import data
+from log_config import setup_logging
+from metrics import ERRORS, QUERY_CACHE, QUERY_SECONDS, REGISTRY
+from venue_registry import VenueRegistry, load_registry
+
+
+QUERY_HOST = os.environ.get('QUERY_HOST', '127.0.0.1')
+QUERY_PORT = int(os.environ.get('QUERY_PORT', '8080'))
+POOL_SIZE = int(os.environ.get('QUERY_POOL_SIZE', '8'))
+CACHE_SIZE = int(os.environ.get('QUERY_CACHE_SIZE', '4096'))
+# Results that can still change are served from cache for at most this long
+LIVE_TTL = 5.0
+# Rows older than this are settled: late ticks are written within a few seconds
+SETTLE_SECONDS = 60.0
+# Settled results can still gain backfilled rows (the daily kline fetch re-reads the last day),
+# so they are re-read this often until they pass the reconciliation horizon below
+SETTLED_TTL = float(os.environ.get('QUERY_SETTLED_TTL', '300'))
+# Older than this, nothing writes into a range any more and results are cached until evicted
+FINAL_SECONDS = float(os.environ.get('QUERY_FINAL_SECONDS', str(2 * 86400)))
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+MAX_SPREAD_BUCKETS = 10000
+
+
+# ---- result cache ----------------------------------------------------------------
+
+class ResultCache:
+    """Thread-safe LRU; each entry has its own expiry, `ttl=None` keeps it until evicted."""
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float]):
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = ResultCache()
+
+
+def _older_than(timestamp: Optional[datetime.datetime], seconds: float) -> bool:
+    if timestamp is None:
+        return False
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.astimezone()
+    return timestamp <= now - datetime.timedelta(seconds=seconds)
+
+
+def _settled(timestamp: Optional[datetime.datetime]) -> bool:
+    return _older_than(timestamp, SETTLE_SECONDS)
+
+
+def _ttl_before(boundary: Optional[datetime.datetime]) -> Optional[float]:
+    """Cache lifetime of a result whose rows all lie before `boundary` (None: open-ended)."""
+    if _older_than(boundary, FINAL_SECONDS):
+        return None
+    if _settled(boundary):
+        return SETTLED_TTL
+    return LIVE_TTL
+
+
+# ---- connections -------------------------------------------------------------------
+
+class ConnectionPool:
+    """Bounded pool of autocommit connections from `data.get_conn`."""
+
+    def __init__(self, size: int = POOL_SIZE, factory: Optional[Callable] = None):
+        self.factory = factory or (lambda: data.get_conn())
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.Semaphore(size)
+
+    @contextmanager
+    def cursor(self):
+        self._slots.acquire()
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            if conn is None or conn.closed:
+                conn = self.factory()
+                conn.autocommit = True
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+            self._idle.put(conn)
+        except Exception:
+            if conn is not None:
+                conn.close()
+            raise
+        finally:
+            self._slots.release()
+
+
+pool = ConnectionPool()
+
+
+def _run(query_name: str, sql: str, params: Sequence) -> List[tuple]:
+    with QUERY_SECONDS.labels(query_name).time(ERRORS.labels('db', 'query_service')):
+        with pool.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchall()
+
+
+# ---- keyset pages --------------------------------------------------------------------
+
+@dataclass
+class Page:
+    items: List[tuple]
+    has_next_page: bool
+    end_cursor: Optional[str]
+
+
+def encode_cursor(*values) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[list]:
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return [datetime.datetime.fromisoformat(value) if isinstance(value, str) else value for value in values]
+
+
+def _page_size(first: Optional[int]) -> int:
+    first = DEFAULT_PAGE_SIZE if first is None else first
+    if not 1 <= first <= MAX_PAGE_SIZE:
+        raise ValueError(f"first must be between 1 and {MAX_PAGE_SIZE}")
+    return first
+
+
+def _make_page(rows: List[tuple], first: int, cursor_of: Callable[[tuple], tuple]) -> Page:
+    items = rows[:first]
+    return Page(items, len(rows) > first, encode_cursor(*cursor_of(items[-1])) if items else None)
+
+
+def _page_ttl(page: Page, first: int, end: Optional[datetime.datetime],
+              last_time: Optional[datetime.datetime]) -> Optional[float]:
+    """
+    Rows can only be added to a page below its boundary: its newest row when
+    the page is full (keyset order puts later rows on the next page), else the
+    end of its range. The page is cached according to how old that boundary is.
+    """
+    if page.items and len(page.items) >= first:
+        return _ttl_before(last_time)
+    return _ttl_before(end)
+
+
+def _load_cached(query_name: str, keys: List[Hashable],
+                 fetch_missing: Callable[[List[Hashable]], Dict[Hashable, Tuple[Any, Optional[float]]]]) -> List[Any]:
+    """Serve `keys` from the cache and fetch the rest in one call returning {key: (value, ttl)}."""
+    results, missing = {}, []
+    for key in keys:
+        hit, value = cache.get((query_name, key))
+        if hit:
+            results[key] = value
+        else:
+            missing.append(key)
+    QUERY_CACHE.labels(query_name, 'hit').inc(len(keys) - len(missing))
+    if missing:
+        QUERY_CACHE.labels(query_name, 'miss').inc(len(missing))
+        for key, (value, ttl) in fetch_missing(missing).items():
+            cache.put((query_name, key), value, ttl)
+            results[key] = value
+    return [results.get(key) for key in keys]
+
+
+def _group_by_range(keys: List[tuple]) -> Dict[tuple, List[tuple]]:
+    """Keys are (entity..., range...); batch together those asking for the same range."""
+    groups: Dict[tuple, List[tuple]] = {}
+    for key in keys:
+        groups.setdefault(key[-4:], []).append(key)
+    return groups
+
+
+# ---- queries ----------------------------------------------------------------------------
+# Every batch is one round trip: the requested entities are unnested and each
+# one runs its own index-ordered, LIMITed scan through a LATERAL join.
+
+def fetch_dex_prices(keys: List[tuple]) -> Dict[tuple, Tuple[Page, Optional[float]]]:
+    """keys: (dex_type, start, end, first, after)"""
+    results = {}
+    for (start, end, first, after), group in _group_by_range(keys).items():
+        cursor = decode_cursor(after) or [None, None]
+        rows = _run('dex_prices', """
+            SELECT k.dex_type, h.id, h.price, h.created_at
+            FROM unnest(%s::smallint[]) AS k(dex_type)
+            CROSS JOIN LATERAL (
+                SELECT id, price, created_at FROM rave_dex_historical
+                WHERE dex_type = k.dex_type
+                  AND created_at >= COALESCE(%s::timestamptz, '-infinity')
+                  AND created_at < COALESCE(%s::timestamptz, 'infinity')
+                  AND (created_at, id) > (COALESCE(%s::timestamptz, '-infinity'), COALESCE(%s::integer, -1))
+                ORDER BY created_at, id
+                LIMIT %s
+            ) h
+            ORDER BY k.dex_type, h.created_at, h.id
+        """, ([key[0] for key in group], start, end, cursor[0], cursor[1], first + 1))
+        by_type: Dict[int, List[tuple]] = {}
+        for dex_type, row_id, price, created_at in rows:
+            by_type.setdefault(dex_type, []).append((row_id, price, created_at))
+        for key in group:
+            page = _make_page(by_type.get(key[0], []), first, lambda row: (row[2], row[0]))
+            last_time = page.items[-1][2] if page.items else None
+            results[key] = (page, _page_ttl(page, first, end, last_time))
+    return results
+
+
+def fetch_candles(keys: List[tuple]) -> Dict[tuple, Tuple[Page, Optional[float]]]:
+    """keys: (token_pair, source, start, end, first, after)"""
+    results = {}
+    for (start, end, first, after), group in _group_by_range(keys).items():
+        cursor = decode_cursor(after) or [None]
+        rows = _run('candles', """
+            SELECT k.token_pair, k.type, c.open_time, c.close_time, c.open_price, c.close_price,
+                   c.volume, c.quote_volume
+            FROM unnest(%s::text[], %s::text[]) AS k(token_pair, type)
+            CROSS JOIN LATERAL (
+                SELECT open_time, close_time, open_price, close_price, volume, quote_volume
+                FROM token_pair_volume_hourly
+                WHERE token_pair = k.token_pair AND type = k.type
+                  AND open_time >= COALESCE(%s::timestamptz, '-infinity')
+                  AND open_time < COALESCE(%s::timestamptz, 'infinity')
+                  AND open_time > COALESCE(%s::timestamptz, '-infinity')
+                ORDER BY open_time
+                LIMIT %s
+            ) c
+            ORDER BY k.token_pair, k.type, c.open_time
+        """, ([key[0] for key in group], [key[1] for key in group], start, end, cursor[0], first + 1))
+        by_pair: Dict[tuple, List[tuple]] = {}
+        for token_pair, source, *candle in rows:
+            by_pair.setdefault((token_pair, source), []).append(tuple(candle))
+        for key in group:
+            page = _make_page(by_pair.get(key[:2], []), first, lambda row: (row[0],))
+            # A candle is final once it has closed, not when it opened
+            last_close = page.items[-1][1] if page.items else None
+            results[key] = (page, _page_ttl(page, first, end, last_close))
+    return results
+
+
+def fetch_volume_totals(keys: List[tuple]) -> Dict[tuple, Tuple[tuple, Optional[float]]]:
+    """keys: (token_pair, source, start, end); value: (volume, quote_volume, candles)"""
+    groups: Dict[tuple, List[tuple]] = {}
+    for key in keys:
+        groups.setdefault(key[2:], []).append(key)
+    results = {}
+    for (start, end), group in groups.items():
+        rows = _run('volume_totals', """
+            SELECT v.token_pair, v.type, sum(v.volume), sum(v.quote_volume), count(*), max(v.close_time)
+            FROM token_pair_volume_hourly v
+            JOIN unnest(%s::text[], %s::text[]) AS k(token_pair, type)
+              ON v.token_pair = k.token_pair AND v.type = k.type
+            WHERE v.open_time >= %s AND v.open_time < %s
+            GROUP BY v.token_pair, v.type
+        """, ([key[0] for key in group], [key[1] for key in group], start, end))
+        totals = {(token_pair, source): rest for token_pair, source, *rest in rows}
+        for key in group:
+            volume, quote_volume, candles, last_close = totals.get(key[:2], (0, 0, 0, None))
+            ttl = _ttl_before(end)
+            if last_close is not None:
+                # The last candle may close after `end`; the total changes until it is final too
+                close_ttl = _ttl_before(last_close)
+                ttl = close_ttl if ttl is None else ttl if close_ttl is None else min(ttl, close_ttl)
+            results[key] = ((volume, quote_volume, candles), ttl)
+    return results
+
+
+def fetch_dex_latest(dex_types: List[int]) -> Dict[int, Tuple[Optional[tuple], float]]:
+    rows = _run('dex_latest', """
+        SELECT dex_type, price, created_at FROM rave_dex_latest WHERE dex_type = ANY(%s::smallint[])
+    """, (list(dex_types),))
+    latest = {dex_type: (price, created_at) for dex_type, price, created_at in rows}
+    return {dex_type: (latest.get(dex_type), LIVE_TTL) for dex_type in dex_types}
+
+
+def fetch_cex_latest(keys: List[tuple]) -> Dict[tuple, Tuple[Optional[tuple], float]]:
+    """keys: (cex, symbol)"""
+    rows = _run('cex_latest', """
+        SELECT cex, symbol, spot_price, index_price, mark_price, funding_rate, timestamp
+        FROM penrose_cex_latest WHERE cex = ANY(%s) AND symbol = ANY(%s)
+    """, (list({key[0] for key in keys}), list({key[1] for key in keys})))
+    latest = {(cex, symbol): tuple(rest) for cex, symbol, *rest in rows}
+    return {key: (latest.get(key), LIVE_TTL) for key in keys}
+
+
+def fetch_cex_history(cex: int, start, end, first: int, after: Optional[str]) -> Page:
+    def fetch(keys):
+        cursor = decode_cursor(after) or [None]
+        rows = _run('cex_history', """
+            SELECT timestamp, spot_price, index_price, mark_price, funding_rate
+            FROM rave_cex_history
+            WHERE cex = %s
+              AND timestamp >= COALESCE(%s::timestamptz, '-infinity')
+              AND timestamp < COALESCE(%s::timestamptz, 'infinity')
+              AND timestamp > COALESCE(%s::timestamptz, '-infinity')
+            ORDER BY timestamp
+            LIMIT %s
+        """, (cex, start, end, cursor[0], first + 1))
+        page = _make_page(rows, first, lambda row: (row[0],))
+        return {keys[0]: (page, _page_ttl(page, first, end, page.items[-1][0] if page.items else None))}
+    return _load_cached('cex_history', [(cex, start, end, first, after)], fetch)[0]
+
+
+def fetch_spreads(dex_type: int, cex: int, start, end, bucket_seconds: int) -> List[tuple]:
+    """(bucket, dex average, cex spot average) for buckets where both sides have data."""
+    if (end - start).total_seconds() / bucket_seconds > MAX_SPREAD_BUCKETS:
+        raise ValueError(f"Range covers more than {MAX_SPREAD_BUCKETS} buckets; use a larger bucketSeconds")
+
+    def fetch(keys):
+        rows = _run('spreads', """
+            WITH dex AS (
+                SELECT floor(extract(epoch FROM created_at) / %(bucket)s) AS bucket, avg(price) AS price
+                FROM rave_dex_historical
+                WHERE dex_type = %(dex_type)s AND created_at >= %(start)s AND created_at < %(end)s
+                GROUP BY 1
+            ), cex AS (
+                SELECT floor(extract(epoch FROM timestamp) / %(bucket)s) AS bucket, avg(spot_price) AS price
+                FROM rave_cex_history
+                WHERE cex = %(cex)s AND timestamp >= %(start)s AND timestamp < %(end)s
+                GROUP BY 1
+            )
+            SELECT to_timestamp(dex.bucket * %(bucket)s), dex.price, cex.price
+            FROM dex JOIN cex USING (bucket)
+            ORDER BY dex.bucket
+        """, {'bucket': bucket_seconds, 'dex_type': dex_type, 'cex': cex, 'start': start, 'end': end})
+        return {keys[0]: (rows, _ttl_before(end))}
+    return _load_cached('spreads', [(dex_type, cex, start, end, bucket_seconds)], fetch)[0]
+
+
+# ---- loaders --------------------------------------------------------------------------------
+
+class _CachedLoader(DataLoader):
+    """DataLoader whose batches go through the result cache; one instance per request."""
+    query_name = ''
+    fetch = None
+
+    def batch_load_fn(self, keys):
+        return Promise.resolve(_load_cached(self.query_name, list(keys), type(self).fetch))
+
+
+class DexPriceLoader(_CachedLoader):
+    query_name = 'dex_prices'
+    fetch = staticmethod(fetch_dex_prices)
+
+
+class CandleLoader(_CachedLoader):
+    query_name = 'candles'
+    fetch = staticmethod(fetch_candles)
+
+
+class VolumeLoader(_CachedLoader):
+    query_name = 'volume_totals'
+    fetch = staticmethod(fetch_volume_totals)
+
+
+class DexLatestLoader(_CachedLoader):
+    query_name = 'dex_latest'
+    fetch = staticmethod(fetch_dex_latest)
+
+
+class CexLatestLoader(_CachedLoader):
+    query_name = 'cex_latest'
+    fetch = staticmethod(fetch_cex_latest)
+
+
+@dataclass
+class RequestContext:
+    registry: VenueRegistry
+    dex_prices: DexPriceLoader
+    candles: CandleLoader
+    volumes: VolumeLoader
+    dex_latest: DexLatestLoader
+    cex_latest: CexLatestLoader
+
+    @classmethod
+    def create(cls, registry: VenueRegistry) -> 'RequestContext':
+        return cls(registry, DexPriceLoader(), CandleLoader(), VolumeLoader(), DexLatestLoader(), CexLatestLoader())
+
+
+# ---- schema ---------------------------------------------------------------------------------
+
+class PageInfo(graphene.ObjectType):
+    end_cursor = graphene.String()
+    has_next_page = graphene.Boolean(required=True)
+
+
+def _page_info(page: Page) -> PageInfo:
+    return PageInfo(end_cursor=page.end_cursor, has_next_page=page.has_next_page)
+
+
+class PricePoint(graphene.ObjectType):
+    time = DateTime(required=True)
+    price = graphene.Float(required=True)
+
+
+class PricePage(graphene.ObjectType):
+    items = graphene.List(graphene.NonNull(PricePoint), required=True)
+    page_info = graphene.Field(PageInfo, required=True)
+
+
+def _price_page(page: Page) -> PricePage:
+    items = [PricePoint(time=created_at, price=price) for _, price, created_at in page.items]
+    return PricePage(items=items, page_info=_page_info(page))
+
+
+class Candle(graphene.ObjectType):
+    open_time = DateTime(required=True)
+    close_time = DateTime(required=True)
+    open = graphene.Float(required=True)
+    close = graphene.Float(required=True)
+    volume = graphene.Float(required=True)
+    quote_volume = graphene.Float(required=True)
+
+
+class CandlePage(graphene.ObjectType):
+    items = graphene.List(graphene.NonNull(Candle), required=True)
+    page_info = graphene.Field(PageInfo, required=True)
+
+
+def _candle_page(page: Page) -> CandlePage:
+    items = [
+        Candle(open_time=open_time, close_time=close_time, open=open_price, close=close_price,
+               volume=volume, quote_volume=quote_volume)
+        for open_time, close_time, open_price, close_price, volume, quote_volume in page.items
+    ]
+    return CandlePage(items=items, page_info=_page_info(page))
+
+
+class VolumeTotal(graphene.ObjectType):
+    symbol = graphene.String(required=True)
+    source = graphene.String(required=True)
+    volume = graphene.Float(required=True)
+    quote_volume = graphene.Float(required=True)
+    candles = graphene.Int(required=True)
+
+
+class CexQuote(graphene.ObjectType):
+    time = DateTime(required=True)
+    spot_price = graphene.Float()
+    index_price = graphene.Float()
+    mark_price = graphene.Float()
+    funding_rate = graphene.Float()
+
+
+class CexQuotePage(graphene.ObjectType):
+    items = graphene.List(graphene.NonNull(CexQuote), required=True)
+    page_info = graphene.Field(PageInfo, required=True)
+
+
+class SpreadPoint(graphene.ObjectType):
+    time = DateTime(required=True)
+    dex_price = graphene.Float(required=True)
+    cex_price = graphene.Float(required=True)
+    spread = graphene.Float(required=True)
+    spread_bps = graphene.Float(required=True)
+
+
+def _range_args(**extra):
+    return dict(start=DateTime(), end=DateTime(), first=graphene.Int(), after=graphene.String(), **extra)
+
+
+class Venue(graphene.ObjectType):
+    name = graphene.String(required=True)
+    chain = graphene.String(required=True)
+    type = graphene.String(required=True)
+    dex_type = graphene.Int(required=True)
+    asset = graphene.String()
+    latest = graphene.Field(PricePoint)
+    prices = graphene.Field(PricePage, required=True, **_range_args())
+
+    def resolve_latest(self, info):
+        def to_point(row):
+            return None if row is None else PricePoint(price=row[0], time=row[1])
+        return info.context.dex_latest.load(self.dex_type).then(to_point)
+
+    def resolve_prices(self, info, start=None, end=None, first=None, after=None):
+        key = (self.dex_type, start, end, _page_size(first), after)
+        return info.context.dex_prices.load(key).then(_price_page)
+
+
+class CexFeed(graphene.ObjectType):
+    name = graphene.String(required=True)
+    cex = graphene.Int(required=True)
+    symbol = graphene.String(required=True)
+    latest = graphene.Field(CexQuote)
+
+    def resolve_latest(self, info):
+        def to_quote(row):
+            if row is None:
+                return None
+            spot_price, index_price, mark_price, funding_rate, timestamp = row
+            return CexQuote(time=timestamp, spot_price=spot_price, index_price=index_price,
+                            mark_price=mark_price, funding_rate=funding_rate)
+        return info.context.cex_latest.load((self.cex, self.symbol)).then(to_quote)
+
+
+def _venue(info, name: str):
+    for venue in info.context.registry.dex:
+        if venue.name == name:
+            return venue
+    raise ValueError(f"Unknown venue {name!r}")
+
+
+def _cex_feed(info, name: str):
+    for feed in info.context.registry.cex:
+        if feed.name == name:
+            return feed
+    raise ValueError(f"Unknown CEX feed {name!r}")
+
+
+def _to_venue(venue) -> Venue:
+    return Venue(name=venue.name, chain=venue.chain, type=venue.type, dex_type=venue.dex_type, asset=venue.asset)
+
+
+class Query(graphene.ObjectType):
+    venues = graphene.List(graphene.NonNull(Venue), required=True, chain=graphene.String())
+    cex_feeds = graphene.List(graphene.NonNull(CexFeed), required=True)
+    prices = graphene.Field(PricePage, required=True, **_range_args(venue=graphene.String(required=True)))
+    candles = graphene.Field(CandlePage, required=True, **_range_args(
+        symbol=graphene.String(required=True), source=graphene.String(required=True)))
+    volumes = graphene.List(
+        graphene.NonNull(VolumeTotal), required=True, symbols=graphene.List(graphene.NonNull(graphene.String), required=True),
+        source=graphene.String(required=True), start=DateTime(required=True), end=DateTime(required=True))
+    cex_history = graphene.Field(CexQuotePage, required=True, **_range_args(feed=graphene.String(required=True)))
+    spreads = graphene.List(
+        graphene.NonNull(SpreadPoint), required=True, venue=graphene.String(required=True),
+        feed=graphene.String(required=True), start=DateTime(required=True), end=DateTime(required=True),
+        bucket_seconds=graphene.Int(default_value=60))
+
+    def resolve_venues(self, info, chain=None):
+        return [_to_venue(venue) for venue in info.context.registry.dex if chain is None or venue.chain == chain]
+
+    def resolve_cex_feeds(self, info):
+        return [CexFeed(name=feed.name, cex=feed.cex, symbol=feed.symbol) for feed in info.context.registry.cex]
+
+    def resolve_prices(self, info, venue, start=None, end=None, first=None, after=None):
+        return _to_venue(_venue(info, venue)).resolve_prices(info, start, end, first, after)
+
+    def resolve_candles(self, info, symbol, source, start=None, end=None, first=None, after=None):
+        key = (symbol, source, start, end, _page_size(first), after)
+        return info.context.candles.load(key).then(_candle_page)
+
+    def resolve_volumes(self, info, symbols, source, start, end):
+        def to_totals(values):
+            return [
+                VolumeTotal(symbol=symbol, source=source, volume=volume, quote_volume=quote_volume, candles=candles)
+                for symbol, (volume, quote_volume, candles) in zip(symbols, values)
+            ]
+        keys = [(symbol, source, start, end) for symbol in symbols]
+        return info.context.volumes.load_many(keys).then(to_totals)
+
+    def resolve_cex_history(self, info, feed, start=None, end=None, first=None, after=None):
+        page = fetch_cex_history(_cex_feed(info, feed).cex, start, end, _page_size(first), after)
+        items = [
+            CexQuote(time=timestamp, spot_price=spot_price, index_price=index_price,
+                     mark_price=mark_price, funding_rate=funding_rate)
+            for timestamp, spot_price, index_price, mark_price, funding_rate in page.items
+        ]
+        return CexQuotePage(items=items, page_info=_page_info(page))
+
+    def resolve_spreads(self, info, venue, feed, start, end, bucket_seconds=60):
+        if bucket_seconds <= 0:
+            raise ValueError("bucketSeconds must be positive")
+        rows = fetch_spreads(_venue(info, venue).dex_type, _cex_feed(info, feed).cex, start, end, bucket_seconds)
+        return [
+            SpreadPoint(time=bucket, dex_price=dex_price, cex_price=cex_price,
+                        spread=dex_price - cex_price, spread_bps=(dex_price - cex_price) / cex_price * 10000)
+            for bucket, dex_price, cex_price in rows
+        ]
+
+
+schema = graphene.Schema(query=Query)
+
+
+# ---- HTTP ---------------------------------------------------------------------------------
+
+class _QueryView(GraphQLView):
+    registry: Optional[VenueRegistry] = None
+
+    def get_context(self):
+        # Loaders must not outlive the request, or they would cache across users
+        return RequestContext.create(self.registry)
+
+
+def create_app(registry: Optional[VenueRegistry] = None) -> Flask:
+    app = Flask(__name__)
+    app.add_url_rule('/graphql', view_func=_QueryView.as_view(
+        'graphql', schema=schema, graphiql=True, registry=registry or load_registry()))
+
+    @app.route('/healthz')
+    def healthz():
+        return {'status': 'ok'}
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default=QUERY_HOST)
+    parser.add_argument('--port', type=int, default=QUERY_PORT)
+    parser.add_argument('--config', help='venue config (default $VENUES_CONFIG or venues.yaml)')
+    args = parser.parse_args()
+
+    setup_logging()
+    app = create_app(load_registry(args.config))
+    logging.info("Query service listening on http://%s:%s/graphql", args.host, args.port)
+    app.run(host=args.host, port=args.port, threaded=True)
@@ -0,0 +1,195 @@
+"""
+Wait for transaction receipts with one RPC round per block per chain.
+
+`wait_for_transaction_receipt` polls the node on its own for every transaction,
+so concurrent swaps (router legs, approve + swap on several chains) multiply the
+RPC load. A `ReceiptWatcher` per node instead keeps every pending hash, probes
+`eth_blockNumber` at about half the block time and, on each new block, asks for
+all pending receipts in a single JSON-RPC batch. Each hash resolves a Future.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+from web3._utils.method_formatters import receipt_formatter
+from web3.exceptions import TimeExhausted, TransactionNotFound
+
+from block_scheduler import (BLOCK_TIME_ALPHA, DEFAULT_BLOCK_TIMES, FALLBACK_BLOCK_TIME, MAX_PROBE_INTERVAL,
+                             MIN_PROBE_INTERVAL)
+from metrics import error_counter, time_rpc
+from tracing import span
+
+
+# Same default as web3's wait_for_transaction_receipt
+DEFAULT_TIMEOUT = 120.0
+# Larger batches are split so one request stays under typical RPC payload limits
+MAX_BATCH = 100
+
+
+def _hex_hash(tx_hash) -> str:
+    return HexBytes(tx_hash).to_0x_hex()
+
+
+@dataclass
+class _Pending:
+    future: Future
+    deadline: float
+    # Checked on the next probe even if no new block arrived
+    fresh: bool = True
+
+
+class ReceiptWatcher:
+    """Pending receipts of one node, resolved by a single daemon thread."""
+
+    def __init__(self, web3, chain: str = '', block_time: Optional[float] = None):
+        self.web3 = web3
+        self.chain = chain
+        self.block_time = block_time or DEFAULT_BLOCK_TIMES.get(chain, FALLBACK_BLOCK_TIME)
+        self._pending: Dict[str, _Pending] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._last_block: Optional[int] = None
+        self._last_block_seen = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def probe_interval(self) -> float:
+        return min(max(self.block_time / 2, MIN_PROBE_INTERVAL), MAX_PROBE_INTERVAL)
+
+    def watch(self, tx_hash, timeout: float = DEFAULT_TIMEOUT, callback: Optional[Callable] = None) -> Future:
+        """
+        Future for the receipt of `tx_hash`; it fails with TimeExhausted after `timeout`
+        seconds. `callback(future)` runs when it resolves. Watching a hash twice
+        returns the same Future.
+        """
+        key = _hex_hash(tx_hash)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = _Pending(Future(), time.monotonic() + timeout)
+            else:
+                pending.deadline = max(pending.deadline, time.monotonic() + timeout)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f'receipts-{self.chain or id(self.web3)}',
+                                                daemon=True)
+                self._thread.start()
+        if callback is not None:
+            pending.future.add_done_callback(callback)
+        self._wakeup.set()
+        return pending.future
+
+    def wait(self, tx_hash, timeout: float = DEFAULT_TIMEOUT):
+        """Blocking drop-in for `web3.eth.wait_for_transaction_receipt`."""
+        return self.watch(tx_hash, timeout).result()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    # Exit when idle; the next watch() starts a new thread
+                    self._thread = None
+                    return
+            self.step()
+            self._wakeup.wait(self.probe_interval())
+            self._wakeup.clear()
+
+    def _observe_block(self, block: int, now: float) -> bool:
+        """Refine the block time estimate like ChainPoller; True when `block` is new."""
+        if self._last_block is not None and block <= self._last_block:
+            return False
+        if self._last_block is not None:
+            per_block = (now - self._last_block_seen) / (block - self._last_block)
+            self.block_time += BLOCK_TIME_ALPHA * (per_block - self.block_time)
+        self._last_block, self._last_block_seen = block, now
+        return True
+
+    def step(self):
+        """Probe once; on a new block (or for newly watched hashes) fetch the pending receipts."""
+        receipts = {}
+        try:
+            with time_rpc(self.chain, 'eth_blockNumber'):
+                block = self.web3.eth.block_number
+            new_block = self._observe_block(block, time.monotonic())
+            with self._lock:
+                due = [key for key, pending in self._pending.items() if new_block or pending.fresh]
+                for key in due:
+                    self._pending[key].fresh = False
+            if due:
+                receipts = self._fetch(due)
+        except Exception as e:
+            error_counter('rpc', self.chain).inc()
+            logging.error("Receipt watcher error on %s: %s", self.chain, e)
+
+        # Timeouts apply even while the node is failing
+        now = time.monotonic()
+        resolved = []
+        with self._lock:
+            for key in list(self._pending):
+                pending = self._pending[key]
+                if key in receipts:
+                    resolved.append((pending.future, receipts[key], None))
+                elif now >= pending.deadline:
+                    resolved.append((pending.future, None, TimeExhausted(
+                        f"Transaction {key} is not in the chain after the watch timeout")))
+                else:
+                    continue
+                del self._pending[key]
+        # Outside the lock: callbacks may watch further hashes
+        for future, receipt, error in resolved:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(receipt)
+
+    def _fetch(self, keys: List[str]) -> Dict[str, AttributeDict]:
+        """Receipts that exist for `keys`, one batch request per MAX_BATCH hashes."""
+        receipts = {}
+        for start in range(0, len(keys), MAX_BATCH):
+            chunk = keys[start:start + MAX_BATCH]
+            with time_rpc(self.chain, 'eth_getTransactionReceipt'), \
+                    span('receipt_batch', cat='rpc', chain=self.chain, hashes=len(chunk)):
+                results = self._batch(chunk)
+            receipts.update((key, receipt) for key, receipt in zip(chunk, results) if receipt is not None)
+        return receipts
+
+    def _batch(self, keys: List[str]) -> List[Optional[AttributeDict]]:
+        provider = self.web3.provider
+        if len(keys) > 1 and hasattr(provider, 'make_batch_request'):
+            try:
+                # web3 returns the responses sorted by id, i.e. in request order
+                responses = provider.make_batch_request([('eth_getTransactionReceipt', [key]) for key in keys])
+                if isinstance(responses, list) and len(responses) == len(keys):
+                    return [
+                        AttributeDict.recursive(receipt_formatter(response['result']))
+                        if response.get('result') else None
+                        for response in responses
+                    ]
+                logging.warning("Unexpected batch reply from %s node, fetching receipts one by one: %s",
+                                self.chain, responses)
+            except Exception as e:
+                error_counter('rpc', self.chain).inc()
+                logging.warning("Receipt batch failed on %s, fetching receipts one by one: %s", self.chain, e)
+        results = []
+        for key in keys:
+            try:
+                results.append(self.web3.eth.get_transaction_receipt(key))
+            except TransactionNotFound:
+                results.append(None)
+        return results
+
+
+_watchers: Dict[int, ReceiptWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def watcher_for(web3, chain: str = '') -> ReceiptWatcher:
+    """The shared watcher of a Web3 instance (one per node connection)."""
+    with _watchers_lock:
+        watcher = _watchers.get(id(web3))
+        if watcher is None or watcher.web3 is not web3:
+            watcher = _watchers[id(web3)] = ReceiptWatcher(web3, chain)
+        return watcher
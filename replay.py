@@ -0,0 +1,130 @@
+"""
+Replay a tick tape recorded by price_mgr (RECORD_FILE=...) through the same
+validation / tick-buffer / DB pipeline, without any network access.
+
+    python replay.py ticks.tape --speed 0                     # as fast as possible, in-memory DB
+    python replay.py ticks.tape --speed 100 --db rave_replay  # into a scratch Postgres database
+
+`--speed N` replays N times faster than recorded; 0 means no pacing at all.
+Writes go to the in-memory stub from bench/ unless `--db` names a database;
+the production database from .env (PG_DATABASE) is refused, since replayed
+timestamps would overwrite the live latest-price rows.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import price_mgr
+from log_config import setup_logging
+from tick_tape import TapeTick, read_tape
+from venue_registry import VenueRegistry, load_registry
+
+
+def replay(path: str, speed: float = 1.0, registry: Optional[VenueRegistry] = None,
+           max_workers: int = price_mgr.MAX_POLL_WORKERS,
+           on_tick: Optional[Callable[[TapeTick], None]] = None) -> dict:
+    """
+    Feed every recorded tick to `price_mgr.store_chain_snapshots` / `store_cex_prices`.
+
+    Venues are matched to the registry by name; records for unknown venues are
+    skipped. Returns replay statistics.
+    """
+    registry = registry or load_registry()
+    dex_venues = {venue.name: venue for venue in registry.dex}
+    cex_feeds = {feed.name: feed for feed in registry.cex}
+    for venue in registry.dex:
+        price_mgr.price_validator.register(venue.name, venue.asset or venue.name)
+    for feed in registry.cex:
+        price_mgr.price_validator.register(feed.name, feed.symbol)
+
+    ticks = dex_records = cex_records = 0
+    first_timestamp = last_timestamp = None
+    max_lag = 0.0
+    unknown = set()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for tick in read_tape(path):
+            if first_timestamp is None:
+                first_timestamp = tick.timestamp
+            last_timestamp = tick.timestamp
+            if speed > 0:
+                due = started + (tick.timestamp - first_timestamp) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+
+            now = datetime.datetime.fromtimestamp(tick.timestamp)
+            by_chain = {}
+            for name, snapshot in tick.dex:
+                venue = dex_venues.get(name)
+                if venue is None:
+                    unknown.add(name)
+                    continue
+                venues, snapshots = by_chain.setdefault(venue.chain, ([], []))
+                venues.append(venue)
+                snapshots.append(snapshot)
+            tasks = [
+                executor.submit(price_mgr.store_chain_snapshots, venues, snapshots, now)
+                for venues, snapshots in by_chain.values()
+            ]
+            for name, prices in tick.cex:
+                feed = cex_feeds.get(name)
+                if feed is None:
+                    unknown.add(name)
+                    continue
+                tasks.append(executor.submit(price_mgr.store_cex_prices, feed, prices, now))
+            for task in tasks:
+                task.result()
+
+            ticks += 1
+            dex_records += len(tick.dex)
+            cex_records += len(tick.cex)
+            if on_tick is not None:
+                on_tick(tick)
+
+    if unknown:
+        logging.warning("Skipped records for venues missing from the registry: %s", sorted(unknown))
+    elapsed = time.perf_counter() - started
+    recorded = (last_timestamp - first_timestamp) if ticks else 0.0
+    return {
+        'ticks': ticks,
+        'dex_records': dex_records,
+        'cex_records': cex_records,
+        'recorded_seconds': round(recorded, 3),
+        'replay_seconds': round(elapsed, 3),
+        'effective_speed': round(recorded / elapsed, 1) if elapsed and recorded else None,
+        'ticks_per_sec': round(ticks / elapsed, 1) if elapsed else None,
+        'max_lag_seconds': round(max_lag, 3),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('tape')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed multiplier; 0 = unpaced')
+    parser.add_argument('--config', help='venue config (default $VENUES_CONFIG or venues.yaml)')
+    parser.add_argument('--db', help='Postgres database to write to, on the .env server (default: in-memory stub); '
+                                     'must not be the PG_DATABASE price_mgr writes to')
+    parser.add_argument('--db-latency-ms', type=float, default=0.0, help='round trip added by the in-memory stub')
+    args = parser.parse_args()
+
+    setup_logging()
+    db_stats = None
+    if args.db:
+        if args.db == os.environ.get('PG_DATABASE'):
+            parser.error(f"refusing to replay into the production database {args.db!r}; pass a scratch database")
+        os.environ['PG_DATABASE'] = args.db
+    else:
+        from bench.db_stub import install
+        db_stats = install(args.db_latency_ms / 1000)
+    stats = replay(args.tape, args.speed, load_registry(args.config))
+    if db_stats is not None:
+        stats['db'] = db_stats.as_dict()
+    print(json.dumps(stats, indent=2))
@@ -0,0 +1,221 @@
+"""
+Split venues across several price_mgr workers using a lease table in Postgres.
+
+Every venue / feed maps to one of `shard_count` shards by a stable hash of
+its name. Workers heartbeat into `price_mgr_worker` and hold time-limited
+leases on shards in `price_mgr_shard_lease`:
+
+* each worker aims for ceil(shards / live workers) shards, claiming free or
+  expired leases and releasing its excess when new workers join;
+* a worker that stops renewing loses its leases after `lease_ttl` seconds and
+  the survivors pick them up on their next heartbeat;
+* a worker treats a lease as lost `safety_margin` seconds before it can expire
+  in the database, so two workers never write the same shard at once.
+"""
+import logging
+import math
+import os
+import socket
+import threading
+import time
+import zlib
+from typing import Callable, Optional, Set
+
+
+DEFAULT_SHARD_COUNT = 16
+LEASE_TTL = 30.0
+RENEW_INTERVAL = 5.0
+# Shard whose owner also runs the singleton jobs (kline ingestion, daily fetch)
+SINGLETON_SHARD = 0
+
+
+def shard_for(name: str, shard_count: int) -> int:
+    """Stable across processes and hosts (unlike the built-in hash)."""
+    return zlib.crc32(name.encode()) % shard_count
+
+
+def default_worker_id() -> str:
+    return os.environ.get('WORKER_ID') or f'{socket.gethostname()}:{os.getpid()}'
+
+
+class ShardCoordinator:
+    """
+    Background heartbeat that keeps this worker's share of shard leases.
+
+    `owned_shards()` / `owns()` are cheap local reads and only report leases
+    whose local deadline has not passed, so a worker cut off from the database
+    stops writing before anyone else can take over its shards.
+    """
+
+    def __init__(self, conn_factory: Callable, shard_count: int = DEFAULT_SHARD_COUNT,
+                 worker_id: Optional[str] = None, lease_ttl: float = LEASE_TTL,
+                 renew_interval: float = RENEW_INTERVAL, safety_margin: Optional[float] = None):
+        if renew_interval * 2 >= lease_ttl:
+            raise ValueError("lease_ttl must be more than twice renew_interval")
+        self.conn_factory = conn_factory
+        self.shard_count = shard_count
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_ttl = lease_ttl
+        self.renew_interval = renew_interval
+        self.safety_margin = renew_interval if safety_margin is None else safety_margin
+        self._owned: Set[int] = set()
+        self._valid_until = 0.0
+        self._conn = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners = []
+
+    # ---- local queries -------------------------------------------------------
+
+    def owned_shards(self) -> Set[int]:
+        with self._lock:
+            if time.monotonic() >= self._valid_until:
+                return set()
+            return set(self._owned)
+
+    def owns(self, shard: int) -> bool:
+        with self._lock:
+            return shard in self._owned and time.monotonic() < self._valid_until
+
+    def owns_name(self, name: str) -> bool:
+        return self.owns(shard_for(name, self.shard_count))
+
+    def add_listener(self, callback: Callable[[Set[int], Set[int]], None]):
+        """callback(gained, lost) runs on the heartbeat thread whenever ownership changes."""
+        self._listeners.append(callback)
+
+    # ---- lifecycle -----------------------------------------------------------
+
+    def start(self):
+        self.heartbeat()
+        self._thread = threading.Thread(target=self._run, name='shard-heartbeat', daemon=True)
+        self._thread.start()
+
+    def stop(self, release: bool = True):
+        """Stop heartbeating; with `release`, hand the shards back immediately instead of waiting for expiry."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.renew_interval * 2)
+        if release:
+            try:
+                with self._cursor() as cur:
+                    cur.execute("DELETE FROM price_mgr_shard_lease WHERE owner = %s", (self.worker_id,))
+                    cur.execute("DELETE FROM price_mgr_worker WHERE worker_id = %s", (self.worker_id,))
+            except Exception as e:
+                logging.warning("Failed to release shard leases for %s: %s", self.worker_id, e)
+        self._set_owned(set(), 0.0)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _run(self):
+        while not self._stopped.wait(self.renew_interval):
+            self.heartbeat()
+
+    # ---- lease protocol ------------------------------------------------------
+
+    def _cursor(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = self.conn_factory()
+            self._conn.autocommit = True
+        return self._conn.cursor()
+
+    def heartbeat(self):
+        """Renew held leases, then release or claim shards to converge on a fair share."""
+        started = time.monotonic()
+        ttl = f'{self.lease_ttl} seconds'
+        try:
+            with self._cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO price_mgr_worker (worker_id, last_seen) VALUES (%s, now())
+                    ON CONFLICT (worker_id) DO UPDATE SET last_seen = EXCLUDED.last_seen
+                    """,
+                    (self.worker_id,),
+                )
+                cur.execute(
+                    """
+                    UPDATE price_mgr_shard_lease SET expires_at = now() + %s::interval
+                    WHERE owner = %s AND expires_at > now() AND shard < %s
+                    RETURNING shard
+                    """,
+                    (ttl, self.worker_id, self.shard_count),
+                )
+                owned = {row[0] for row in cur.fetchall()}
+
+                cur.execute(
+                    "SELECT count(*) FROM price_mgr_worker WHERE last_seen > now() - %s::interval",
+                    (ttl,),
+                )
+                live_workers = max(cur.fetchone()[0], 1)
+                target = math.ceil(self.shard_count / live_workers)
+
+                if len(owned) > target:
+                    excess = sorted(owned)[target:]
+                    cur.execute(
+                        "DELETE FROM price_mgr_shard_lease WHERE owner = %s AND shard = ANY(%s)",
+                        (self.worker_id, excess),
+                    )
+                    owned -= set(excess)
+
+                if len(owned) < target:
+                    owned |= self._claim(cur, owned, target - len(owned), ttl)
+        except Exception as e:
+            logging.error("Shard heartbeat failed for %s: %s", self.worker_id, e)
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                finally:
+                    self._conn = None
+            # Keep the previous leases until their local deadline runs out
+            return
+        self._set_owned(owned, started + self.lease_ttl - self.safety_margin)
+
+    def _claim(self, cur, owned: Set[int], wanted: int, ttl: str) -> Set[int]:
+        cur.execute(
+            "SELECT shard FROM price_mgr_shard_lease WHERE expires_at > now() AND shard < %s",
+            (self.shard_count,),
+        )
+        taken = {row[0] for row in cur.fetchall()} | owned
+        # Start at a worker-specific offset so concurrent workers don't race for the same shards
+        offset = zlib.crc32(self.worker_id.encode()) % self.shard_count
+        candidates = [(offset + i) % self.shard_count for i in range(self.shard_count)]
+        claimed = set()
+        for shard in candidates:
+            if len(claimed) >= wanted:
+                break
+            if shard in taken:
+                continue
+            cur.execute(
+                """
+                INSERT INTO price_mgr_shard_lease (shard, owner, expires_at, epoch)
+                VALUES (%s, %s, now() + %s::interval, 1)
+                ON CONFLICT (shard) DO UPDATE
+                SET owner = EXCLUDED.owner, expires_at = EXCLUDED.expires_at,
+                    epoch = price_mgr_shard_lease.epoch + 1
+                WHERE price_mgr_shard_lease.expires_at <= now()
+                RETURNING epoch
+                """,
+                (shard, self.worker_id, ttl),
+            )
+            row = cur.fetchone()
+            if row is not None:
+                claimed.add(shard)
+                logging.info("Worker %s acquired shard %s (epoch %s)", self.worker_id, shard, row[0])
+        return claimed
+
+    def _set_owned(self, owned: Set[int], valid_until: float):
+        with self._lock:
+            previous = self._owned if time.monotonic() < self._valid_until else set()
+            self._owned = owned
+            self._valid_until = valid_until
+        gained, lost = owned - previous, previous - owned
+        if gained or lost:
+            logging.info("Worker %s shards now %s (gained %s, lost %s)",
+                         self.worker_id, sorted(owned), sorted(gained), sorted(lost))
+            for callback in self._listeners:
+                try:
+                    callback(gained, lost)
+                except Exception as e:
+                    logging.error("Shard listener failed: %s", e)
@@ -0,0 +1,132 @@
+"""Fixed-capacity in-memory ring buffers of recent ticks, one per venue."""
+import math
+import threading
+import time
+from array import array
+from typing import Dict, Optional, Tuple
+
+
+# One hour at 1 s resolution; 24 bytes per slot -> ~86 KB per venue
+DEFAULT_CAPACITY = 3600
+
+
+class TickRingBuffer:
+    """
+    Timestamps, prices and block numbers stored as three preallocated `array` columns.
+
+    Memory is fixed at creation (capacity * 24 bytes). Timestamps must be
+    non-decreasing; window queries locate their start by binary search over
+    the ring, so every stat touches only the samples inside the window.
+    """
+
+    __slots__ = ('capacity', 'timestamps', 'prices', 'blocks', '_head', '_size', '_lock')
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.prices = array('d', bytes(8 * capacity))
+        # -1 when the tick has no block (CEX prices)
+        self.blocks = array('q', bytes(8 * capacity))
+        self._head = 0  # index of the oldest sample
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp: float, price: float, block_number: Optional[int] = None):
+        with self._lock:
+            if self._size < self.capacity:
+                index = (self._head + self._size) % self.capacity
+                self._size += 1
+            else:
+                index = self._head
+                self._head = (self._head + 1) % self.capacity
+            self.timestamps[index] = timestamp
+            self.prices[index] = price
+            self.blocks[index] = -1 if block_number is None else block_number
+
+    def last(self) -> Optional[Tuple[float, float, int]]:
+        """(timestamp, price, block_number) of the newest sample."""
+        with self._lock:
+            if not self._size:
+                return None
+            index = (self._head + self._size - 1) % self.capacity
+            return self.timestamps[index], self.prices[index], self.blocks[index]
+
+    def _window(self, since: float):
+        """Contiguous copies of (timestamps, prices) for samples with timestamp >= since."""
+        with self._lock:
+            lo, hi = 0, self._size
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.timestamps[(self._head + mid) % self.capacity] < since:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            start = (self._head + lo) % self.capacity
+            count = self._size - lo
+            end = start + count
+            if end <= self.capacity:
+                return self.timestamps[start:end], self.prices[start:end]
+            wrap = end - self.capacity
+            return (self.timestamps[start:] + self.timestamps[:wrap],
+                    self.prices[start:] + self.prices[:wrap])
+
+    def window(self, seconds: float, now: Optional[float] = None):
+        """Copies of the (timestamps, prices) columns for the last `seconds` seconds."""
+        now = time.time() if now is None else now
+        return self._window(now - seconds)
+
+    def twap(self, seconds: float, now: Optional[float] = None) -> Optional[float]:
+        """Time-weighted average price; each price holds until the next tick (the last one until `now`)."""
+        now = time.time() if now is None else now
+        timestamps, prices = self._window(now - seconds)
+        if not prices:
+            return None
+        durations = [b - a for a, b in zip(timestamps, timestamps[1:])]
+        durations.append(max(now - timestamps[-1], 0.0))
+        total = math.fsum(durations)
+        if total == 0:
+            return math.fsum(prices) / len(prices)
+        return math.fsum(p * d for p, d in zip(prices, durations)) / total
+
+    def volatility(self, seconds: float, now: Optional[float] = None) -> Optional[float]:
+        """Standard deviation of tick-to-tick log returns inside the window."""
+        _, prices = self.window(seconds, now)
+        returns = [math.log(b / a) for a, b in zip(prices, prices[1:]) if a > 0 and b > 0]
+        if len(returns) < 2:
+            return None
+        mean = math.fsum(returns) / len(returns)
+        return math.sqrt(math.fsum((r - mean) ** 2 for r in returns) / (len(returns) - 1))
+
+    def min_max(self, seconds: float, now: Optional[float] = None) -> Optional[Tuple[float, float]]:
+        _, prices = self.window(seconds, now)
+        if not prices:
+            return None
+        return min(prices), max(prices)
+
+
+class TickBufferSet:
+    """Lazily created `TickRingBuffer` per venue name, all with the same capacity."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._buffers: Dict[str, TickRingBuffer] = {}
+        self._lock = threading.Lock()
+
+    def get(self, venue: str) -> Optional[TickRingBuffer]:
+        return self._buffers.get(venue)
+
+    def record(self, venue: str, timestamp: float, price: float, block_number: Optional[int] = None):
+        buffer = self._buffers.get(venue)
+        if buffer is None:
+            with self._lock:
+                buffer = self._buffers.setdefault(venue, TickRingBuffer(self.capacity))
+        buffer.append(timestamp, price, block_number)
+
+    def venues(self):
+        return list(self._buffers)
+
+    def memory_bytes(self) -> int:
+        return len(self._buffers) * self.capacity * 24
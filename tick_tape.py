@@ -0,0 +1,187 @@
+"""
+Compact binary recording of the decoded prices price_mgr reads each tick.
+
+A tape is a magic header followed by typed, fixed-layout records:
+
+    V  venue definition   id, kind (dex/cex), name
+    T  tick start         unix timestamp
+    D  DEX snapshot       venue id, flags, price, sqrtPriceX96, tick, liquidity, block
+    C  CEX prices         venue id, spot, index, mark, funding (NaN = missing)
+
+Venue names are written once and referenced by id, so a DEX record is 60
+bytes and a CEX record 35 bytes. `TapeRecorder` appends from the polling
+threads; `read_tape` yields ticks back in order for the replay driver.
+"""
+import math
+import mmap
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from dex_base import PoolSnapshot
+
+
+MAGIC = b'RAVETAPE'
+VERSION = 1
+
+_HEADER = struct.Struct('<8sH')
+_VENUE = struct.Struct('<cHBB')           # type, id, kind, name length (+ name bytes)
+_TICK = struct.Struct('<cd')
+_DEX = struct.Struct('<cHBd20si16sq')     # type, id, flags, price, sqrtPriceX96, tick, liquidity, block
+_CEX = struct.Struct('<cH4d')
+
+KIND_DEX, KIND_CEX = 0, 1
+
+# D record flags
+FLAG_FAILED = 1      # the read failed; the rest of the record is empty
+FLAG_POOL_STATE = 2  # sqrtPriceX96 / tick / liquidity are set
+FLAG_BLOCK = 4       # block number is set
+
+# Buffered writes are flushed at least this often
+FLUSH_INTERVAL = 5.0
+
+
+@dataclass
+class TapeTick:
+    timestamp: float
+    dex: List[Tuple[str, Optional[PoolSnapshot]]] = field(default_factory=list)
+    cex: List[Tuple[str, Tuple[Optional[float], ...]]] = field(default_factory=list)
+
+
+def _float_or_nan(value) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _nan_to_none(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class TapeRecorder:
+    """Thread-safe appender; `record_*` calls are a struct pack and a buffered write."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: BinaryIO = open(path, 'wb')
+        self._file.write(_HEADER.pack(MAGIC, VERSION))
+        self._venue_ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def _venue_id(self, name: str, kind: int) -> int:
+        venue_id = self._venue_ids.get(name)
+        if venue_id is None:
+            venue_id = len(self._venue_ids)
+            self._venue_ids[name] = venue_id
+            encoded = name.encode()
+            self._file.write(_VENUE.pack(b'V', venue_id, kind, len(encoded)) + encoded)
+        return venue_id
+
+    def _maybe_flush(self):
+        now = time.monotonic()
+        if now - self._last_flush >= FLUSH_INTERVAL:
+            self._file.flush()
+            self._last_flush = now
+
+    def record_dex(self, venue_names: List[str], snapshots: List[Optional[PoolSnapshot]],
+                   timestamp: Optional[float] = None):
+        """With `timestamp`, the records are preceded by their own tick marker under the same lock."""
+        with self._lock:
+            if timestamp is not None:
+                self._file.write(_TICK.pack(b'T', timestamp))
+            for name, snapshot in zip(venue_names, snapshots):
+                venue_id = self._venue_id(name, KIND_DEX)
+                if snapshot is None:
+                    self._file.write(_DEX.pack(b'D', venue_id, FLAG_FAILED, 0.0, b'', 0, b'', 0))
+                    continue
+                flags = 0
+                if snapshot.sqrt_price_x96 is not None:
+                    flags |= FLAG_POOL_STATE
+                if snapshot.block_number is not None:
+                    flags |= FLAG_BLOCK
+                self._file.write(_DEX.pack(
+                    b'D', venue_id, flags, float(snapshot.price),
+                    (snapshot.sqrt_price_x96 or 0).to_bytes(20, 'big'),
+                    snapshot.tick or 0,
+                    (snapshot.liquidity or 0).to_bytes(16, 'big'),
+                    snapshot.block_number or 0,
+                ))
+            self._maybe_flush()
+
+    def record_cex(self, feed_name: str, prices: Tuple, timestamp: Optional[float] = None):
+        """prices: (spot, index, mark, funding_rate) as returned by price_mgr.get_cex_prices."""
+        with self._lock:
+            if timestamp is not None:
+                self._file.write(_TICK.pack(b'T', timestamp))
+            venue_id = self._venue_id(feed_name, KIND_CEX)
+            self._file.write(_CEX.pack(b'C', venue_id, *(_float_or_nan(value) for value in prices)))
+            self._maybe_flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def read_tape(path: str) -> Iterator[TapeTick]:
+    """
+    Yield ticks in recorded order. Records before the first tick marker are
+    ignored, and a record cut short by a crash mid-write ends the tape.
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        yield from _read_records(path, data)
+
+
+def _read_records(path: str, data) -> Iterator[TapeTick]:
+    magic, version = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} tick tape")
+    offset = _HEADER.size
+    names: Dict[int, str] = {}
+    current: Optional[TapeTick] = None
+    while offset < len(data):
+        record_type = data[offset:offset + 1]
+        if record_type == b'V':
+            if offset + _VENUE.size > len(data):
+                break
+            _, venue_id, _kind, length = _VENUE.unpack_from(data, offset)
+            offset += _VENUE.size
+            names[venue_id] = data[offset:offset + length].decode()
+            offset += length
+        elif record_type == b'T':
+            if offset + _TICK.size > len(data):
+                break
+            if current is not None:
+                yield current
+            current = TapeTick(_TICK.unpack_from(data, offset)[1])
+            offset += _TICK.size
+        elif record_type == b'D':
+            if offset + _DEX.size > len(data):
+                break
+            _, venue_id, flags, price, sqrt_price, tick, liquidity, block = _DEX.unpack_from(data, offset)
+            offset += _DEX.size
+            if current is None:
+                continue
+            snapshot = None
+            if not flags & FLAG_FAILED:
+                pool_state = flags & FLAG_POOL_STATE
+                snapshot = PoolSnapshot(
+                    price=price,
+                    sqrt_price_x96=int.from_bytes(sqrt_price, 'big') if pool_state else None,
+                    tick=tick if pool_state else None,
+                    liquidity=int.from_bytes(liquidity, 'big') if pool_state else None,
+                    block_number=block if flags & FLAG_BLOCK else None,
+                )
+            current.dex.append((names[venue_id], snapshot))
+        elif record_type == b'C':
+            if offset + _CEX.size > len(data):
+                break
+            _, venue_id, *prices = _CEX.unpack_from(data, offset)
+            offset += _CEX.size
+            if current is not None:
+                current.cex.append((names[venue_id], tuple(_nan_to_none(value) for value in prices)))
+        else:
+            raise ValueError(f"Corrupt tick tape {path} at byte {offset}")
+    if current is not None:
+        yield current
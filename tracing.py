@@ -0,0 +1,187 @@
+"""
+Optional span tracing exported as Chrome trace JSON (chrome://tracing, ui.perfetto.dev).
+
+Disabled unless `enable_tracing()` is called (price_mgr does so when TRACE_FILE
+is set); a disabled `span()` returns a shared no-op object. Enabled spans
+are appended to an in-memory deque and a background thread streams them to
+the trace file once per `flush_interval`.
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+
+TRACE_FILE = os.environ.get('TRACE_FILE')
+# Events beyond this between two flushes are dropped (oldest first)
+MAX_BUFFERED_EVENTS = 200_000
+
+# perf_counter() + _EPOCH ~= time.time(), so traces from several processes line up
+_EPOCH = time.time() - time.perf_counter()
+_PID = os.getpid()
+
+_enabled = False
+_events: deque = deque(maxlen=MAX_BUFFERED_EVENTS)
+_thread_names = {}
+_writer: Optional['_TraceWriter'] = None
+
+
+class _Span:
+    __slots__ = ('name', 'cat', 'args', '_start')
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def set(self, **args):
+        """Attach args discovered inside the span (row counts, block numbers, ...)."""
+        self.args.update(args)
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        tid = threading.get_ident()
+        if tid not in _thread_names:
+            _thread_names[tid] = threading.current_thread().name
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        _events.append((self.name, self.cat, self._start, end - self._start, tid, self.args))
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def set(self, **args):
+        pass
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, cat: str = 'app', **args):
+    """
+    Time the enclosed block as one trace event.
+
+    Usage:
+        with span('multicall', cat='rpc', chain='bsc') as s:
+            ...
+            s.set(pools=3)
+    """
+    if not _enabled:
+        return _NOOP
+    return _Span(name, cat, args)
+
+
+def traced(name: Optional[str] = None, cat: str = 'app'):
+    """Decorator form of `span`; the span name defaults to module.qualname."""
+    def decorator(fn):
+        span_name = name or f'{fn.__module__}.{fn.__qualname__}'
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(span_name, cat, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def tracing_enabled() -> bool:
+    return _enabled
+
+
+class _TraceWriter:
+    """Streams events to a JSON array file; the closing bracket is written on stop."""
+
+    def __init__(self, path: str, flush_interval: float):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write('[')
+        self._first = True
+        self._named_threads = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='trace-writer', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _write(self, event: dict):
+        self._file.write(('\n' if self._first else ',\n') + json.dumps(event, default=str))
+        self._first = False
+
+    def flush(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            while _events:
+                name, cat, start, duration, tid, args = _events.popleft()
+                if tid not in self._named_threads:
+                    self._named_threads.add(tid)
+                    self._write({'name': 'thread_name', 'ph': 'M', 'pid': _PID, 'tid': tid,
+                                 'args': {'name': _thread_names.get(tid, str(tid))}})
+                event = {'name': name, 'cat': cat, 'ph': 'X', 'pid': _PID, 'tid': tid,
+                         'ts': round((start + _EPOCH) * 1e6, 1), 'dur': round(duration * 1e6, 1)}
+                if args:
+                    event['args'] = args
+                self._write(event)
+            self._file.flush()
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+        with self._lock:
+            if not self._file.closed:
+                self._file.write('\n]\n')
+                self._file.close()
+
+
+def enable_tracing(path: Optional[str] = None, flush_interval: float = 1.0) -> bool:
+    """
+    Start recording spans to `path` (default $TRACE_FILE). Returns False and
+    stays disabled when no path is configured.
+    """
+    global _enabled, _writer
+    path = path or TRACE_FILE
+    if not path:
+        return False
+    if _writer is not None:
+        return True
+    _writer = _TraceWriter(path, flush_interval)
+    _writer.start()
+    _enabled = True
+    atexit.register(disable_tracing)
+    logging.info("Tracing enabled, writing Chrome trace events to %s", path)
+    return True
+
+
+def disable_tracing():
+    """Stop recording, flush the remaining events and close the trace file."""
+    global _enabled, _writer
+    _enabled = False
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
@@ -6,12 +6,14 @@ from web3 import Web3
 from eth_account import Account
 from dotenv import load_dotenv
 from dex_base import DexBase
-from util import sqrt_ratio_x96_to_price
+from tracing import span, traced
 
 load_dotenv()
-logging.basicConfig(filename='log', level=logging.INFO)
 
 class UniswapV3Dex(DexBase):
+    chain = 'eth'
+    BATCHABLE_READS = ('slot0', 'liquidity')
+
     def __init__(self, pair_address, quote_token_address='0xdAC17F958D2ee523a2206206994597C13D831ec7', web3=None):
         self.pair_address = pair_address
         self.router_address = Web3.to_checksum_address('0xE592427A0AEce92De3Edee1F18E0157C05861564')  # Uniswap V3 Router
@@ -34,18 +36,16 @@ class UniswapV3Dex(DexBase):
         self.token1_decimals = self.token1_contract.functions.decimals().call()
         self.router_abi = V3_ROUTER_ABI
 
+    @traced(cat='dex')
     def get_price(self):
-        slot0 = self.pair.functions.slot0().call()
-        sqrtPriceX96 = slot0[0]
-        price = sqrt_ratio_x96_to_price(sqrtPriceX96, self.token0_decimals, self.token1_decimals)
-        # 如果quote token是token0，返回倒数（token0 per token1）；否则返回正向（token1 per token0）
-        if self.quote_token_address == self.token0:
-            price_inv = 1 / price if price != 0 else 0
-            logging.info(f"Current price (base token per quote token): {price_inv}")
-            return price_inv
-        else:
-            logging.info(f"Current price (quote token per base token): {price}")
-            return price
+        with span('eth_call', cat='rpc', chain=self.chain):
+            slot0 = self.pair.functions.slot0().call()
+        price = self.price_from_sqrt_price(slot0[0])
+        logging.debug("Current price (quote token per base token): %s", price)
+        return price
+
+    def snapshot_reads(self):
+        return [self.pair.functions.slot0(), self.pair.functions.liquidity()]
 
     def swap(self, amount_in, token_in_is0, amount_out_min=0, sqrt_price_limit_x96=0):
         token_in = self.token0 if token_in_is0 else self.token1
@@ -55,20 +55,44 @@ class UniswapV3Dex(DexBase):
         approve_contract = self.token0_contract if token_in_is0 else self.token1_contract
         # USDT (TetherToken) 合约要求先将 allowance 设为 0，再设为新值
         current_allowance = approve_contract.functions.allowance(self.account.address, self.router_address).call()
+        # reset（如需要）和 approve 各占一个 nonce，swap 在它们之后
+        swap_nonce = nonce + (2 if current_allowance != 0 else 1)
+        fee = self.fee
+        params = {
+            'tokenIn': token_in,
+            'tokenOut': token_out,
+            'fee': int(fee),
+            'recipient': self.account.address,
+            'deadline': int(time.time()) + 1800,
+            'amountIn': int(amount_in),
+            'amountOutMinimum': int(amount_out_min),
+            'sqrtPriceLimitX96': int(sqrt_price_limit_x96)
+        }
+        router = self.web3.eth.contract(address=self.router_address, abi=self.router_abi)
+        swap_tx = router.functions.exactInputSingle(params).build_transaction({
+            'from': self.account.address,
+            'nonce': swap_nonce,
+            'gas': 300000,
+            'gasPrice': int(self.web3.eth.gas_price * 1.2)
+        })
+        # 先假定授权已完成来模拟，必然 revert 的 swap 连 approve 也不发送（失败时抛出 SwapReverted）
+        simulated = self.preflight(swap_tx, token_in, amount_in, amount_out_min, sqrt_price_limit_x96,
+                                   approve_contract=approve_contract)
         if current_allowance != 0:
-            logging.info(f"Current allowance for router: {current_allowance}, resetting to 0...")
+            logging.info("Current allowance for router: %s, resetting to 0...", current_allowance)
             reset_tx = approve_contract.functions.approve(self.router_address, 0).build_transaction({
                 'from': self.account.address,
                 'nonce': nonce
             })
             signed_reset = self.web3.eth.account.sign_transaction(reset_tx, self.account.key)
             reset_hash = self.web3.eth.send_raw_transaction(signed_reset.raw_transaction)
-            logging.info(f"Reset allowance tx: {reset_hash.hex()}")
-            res_reset = self.web3.eth.wait_for_transaction_receipt(reset_hash)
+            logging.info("Reset allowance tx: %s", reset_hash.hex())
+            res_reset = self.wait_for_receipt(reset_hash)
             if res_reset.status == 1:
                 logging.info("Allowance reset to 0 succeeded!")
             else:
                 logging.info("Allowance reset to 0 failed!")
+                raise RuntimeError(f"Allowance reset transaction {reset_hash.hex()} failed, swap not sent")
             nonce += 1
         approve_tx = approve_contract.functions.approve(self.router_address, amount_in).build_transaction({
             'from': self.account.address,
@@ -76,34 +100,21 @@ class UniswapV3Dex(DexBase):
         })
         signed_approve = self.web3.eth.account.sign_transaction(approve_tx, self.account.key)
         approve_hash = self.web3.eth.send_raw_transaction(signed_approve.raw_transaction)
-        logging.info(f"Approve tx: {approve_hash.hex()}")
-        res = self.web3.eth.wait_for_transaction_receipt(approve_hash)
+        logging.info("Approve tx: %s", approve_hash.hex())
+        res = self.wait_for_receipt(approve_hash)
         if res.status == 1:
             logging.info("Approve transaction succeeded!")
         else:
             logging.info("Approve transaction failed!")
-        fee = self.fee
-        params = {
-            'tokenIn': token_in,
-            'tokenOut': token_out,
-            'fee': int(fee),
-            'recipient': self.account.address,
-            'deadline': int(time.time()) + 1800,
-            'amountIn': int(amount_in),
-            'amountOutMinimum': int(amount_out_min),
-            'sqrtPriceLimitX96': int(sqrt_price_limit_x96)
-        }
-        router = self.web3.eth.contract(address=self.router_address, abi=self.router_abi)
-        swap_tx = router.functions.exactInputSingle(params).build_transaction({
-            'from': self.account.address,
-            'nonce': nonce + 1,
-            'gas': 300000,
-            'gasPrice': int(self.web3.eth.gas_price * 1.2)
-        })
+            # 模拟时假定了授权，approve 失败后 swap 必然 revert，不再发送
+            raise RuntimeError(f"Approve transaction {approve_hash.hex()} failed, swap not sent")
+        if simulated is None:
+            # 无法覆盖该 token 的授权时，在 approve 之后再模拟
+            self.preflight(swap_tx, token_in, amount_in, amount_out_min, sqrt_price_limit_x96)
         signed_swap = self.web3.eth.account.sign_transaction(swap_tx, self.account.key)
         swap_hash = self.web3.eth.send_raw_transaction(signed_swap.raw_transaction)
-        logging.info(f"Swap tx: {swap_hash.hex()}")
-        receipt = self.web3.eth.wait_for_transaction_receipt(swap_hash)
+        logging.info("Swap tx: %s", swap_hash.hex())
+        receipt = self.wait_for_receipt(swap_hash)
         if receipt.status == 1:
             logging.info("Swap transaction succeeded!")
         else:
@@ -121,7 +132,7 @@ class UniswapV3Dex(DexBase):
 #     dex = UniswapV3Dex(test_pair_address)
 #     logging.info("Testing get_price:")
 #     current_price = dex.get_price()
-#     logging.info(f"Current price: {current_price}")
+#     logging.info("Current price: %s", current_price)
 #     logging.info("Testing swap:")
 #     swap_receipt = dex.swap(test_amount_in, test_token_in_is0, test_amount_out_min, test_sqrt_price_limit_x96)
-#     logging.info(f"Swap receipt: {swap_receipt}")
\ No newline at end of file
+#     logging.info("Swap receipt: %s", swap_receipt)
\ No newline at end of file
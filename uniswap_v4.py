@@ -4,13 +4,20 @@ import logging
 from web3 import Web3
 from dotenv import load_dotenv
 from web3.middleware import ExtraDataToPOAMiddleware
-from util import sqrt_ratio_x96_to_price
+from dex_base import PoolReader
+from tracing import span, traced
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
 
-class UniswapV4Dex:
-    def __init__(self, pair_id, pool_mgr_address, quote_token_address='0xdAC17F958D2ee523a2206206994597C13D831ec7'):
+RAVE_TOKEN_ADDRESS = '0x97693439EA2f0ecdeb9135881E49f354656a911c'
+
+class UniswapV4Dex(PoolReader):
+    chain = 'eth'
+    BATCHABLE_READS = ('getSlot0', 'getLiquidity')
+    PRICE_DECIMALS = 6
+
+    def __init__(self, pair_id, pool_mgr_address, quote_token_address='0xdAC17F958D2ee523a2206206994597C13D831ec7',
+                 base_token_address=RAVE_TOKEN_ADDRESS):
         self.pair_id = pair_id
         self.pool_mgr_address = pool_mgr_address
         self.quote_token_address = Web3.to_checksum_address(quote_token_address)
@@ -21,25 +28,26 @@ class UniswapV4Dex:
         with open('abi/erc20_abi.json') as f:
             ERC20_ABI = json.load(f)
         self.pool_mgr = self.web3.eth.contract(address=pool_mgr_address, abi=V4_POOL_MGR_ABI)
-        self.token0 = "0x97693439EA2f0ecdeb9135881E49f354656a911c"
-        self.token1 = quote_token_address
+        # V4 池子的 currency0 是地址较小的 token
+        base_token_address = Web3.to_checksum_address(base_token_address)
+        self.token0, self.token1 = sorted(
+            (base_token_address, self.quote_token_address), key=lambda address: int(address, 16)
+        )
         self.token0_contract = self.web3.eth.contract(address=self.token0, abi=ERC20_ABI)
         self.token1_contract = self.web3.eth.contract(address=self.token1, abi=ERC20_ABI)
         self.token0_decimals = self.token0_contract.functions.decimals().call()
         self.token1_decimals = self.token1_contract.functions.decimals().call()
 
+    @traced(cat='dex')
     def get_price(self):
-        slot0 = self.pool_mgr.functions.getSlot0(self.pair_id).call()
-        sqrtPriceX96 = slot0[0]
-        price = sqrt_ratio_x96_to_price(sqrtPriceX96, self.token0_decimals, self.token1_decimals)
-        # 如果quote token是token0，返回price（token1 per token0）；否则返回倒数（token0 per token1）
-        if self.quote_token_address == self.token0:
-            price_inv = 1 / price if price != 0 else 0
-            logging.info(f"Current price (base token per quote token): {price_inv}")
-            return round(price_inv, 6)
-        else:
-            logging.info(f"Current price (quote token per base token): {price}")
-            return round(price, 6)
+        with span('eth_call', cat='rpc', chain=self.chain):
+            slot0 = self.pool_mgr.functions.getSlot0(self.pair_id).call()
+        price = self.price_from_sqrt_price(slot0[0])
+        logging.debug("Current price (quote token per base token): %s", price)
+        return price
+
+    def snapshot_reads(self):
+        return [self.pool_mgr.functions.getSlot0(self.pair_id), self.pool_mgr.functions.getLiquidity(self.pair_id)]
 
 # if __name__ == "__main__":
 #     # 示例地址，请替换为实际 Pancake V3 合约地址
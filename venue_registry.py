@@ -0,0 +1,164 @@
+"""Config-driven registry of DEX pools, CEX feeds and kline symbols."""
+import importlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import yaml
+from web3 import Web3
+
+
+DEFAULT_CONFIG_PATH = 'venues.yaml'
+
+# type -> (module, class); resolved lazily so importing the registry stays cheap
+DEX_TYPES = {
+    'uniswap_v3': ('uniswap_v3', 'UniswapV3Dex'),
+    'pancake_v3': ('pancake_v3', 'PancakeV3Dex'),
+    'aerodrome_v3': ('aerodrome_v3', 'AerodromeV3Dex'),
+    'uniswap_v4': ('uniswap_v4', 'UniswapV4Dex'),
+    'pancake_v4': ('pancake_v4', 'PancakeV4Dex'),
+}
+CEX_TYPES = {'aster'}
+
+# Constructor params that are addresses and must be checksummed
+_ADDRESS_PARAMS = {'pair_address', 'pool_mgr_address', 'quote_token_address', 'base_token_address'}
+
+
+def register_dex_type(name: str, module: str, class_name: str):
+    """Make a new `PoolReader` / `DexBase` implementation available to config files."""
+    DEX_TYPES[name] = (module, class_name)
+
+
+@dataclass
+class DexVenue:
+    name: str
+    type: str
+    dex_type: int
+    chain: str
+    params: Dict = field(default_factory=dict)
+    # Venues quoting the same asset are cross-checked against each other
+    asset: Optional[str] = None
+
+    def build(self):
+        """Instantiate the configured DEX implementation."""
+        module_name, class_name = DEX_TYPES[self.type]
+        dex_class = getattr(importlib.import_module(module_name), class_name)
+        params = {
+            key: Web3.to_checksum_address(value) if key in _ADDRESS_PARAMS else value
+            for key, value in self.params.items()
+        }
+        return dex_class(**params)
+
+
+@dataclass
+class CexFeed:
+    name: str
+    type: str
+    cex: int
+    symbol: str
+    spot_symbol: Optional[str] = None
+    future_symbol: Optional[str] = None
+    history: bool = False
+
+
+@dataclass
+class KlineSymbols:
+    interval: str = '1h'
+    aster_spot: List[str] = field(default_factory=list)
+    aster_future: List[str] = field(default_factory=list)
+    alpha: List[str] = field(default_factory=list)
+
+
+@dataclass
+class VenueRegistry:
+    dex: List[DexVenue]
+    cex: List[CexFeed]
+    klines: KlineSymbols
+
+    def dex_by_chain(self) -> Dict[str, List[DexVenue]]:
+        chains: Dict[str, List[DexVenue]] = {}
+        for venue in self.dex:
+            chains.setdefault(venue.chain, []).append(venue)
+        return chains
+
+    def build_dexes(self):
+        """
+        Instantiate every DEX venue; a venue that fails to initialise is logged and skipped.
+
+        Returns:
+            List of (DexVenue, PoolReader) pairs; only DexBase instances can swap
+        """
+        built = []
+        for venue in self.dex:
+            try:
+                built.append((venue, venue.build()))
+            except Exception as e:
+                logging.error("Failed to initialise venue %s (%s): %s", venue.name, venue.type, e)
+        return built
+
+    def spot_symbols(self) -> List[str]:
+        return [feed.spot_symbol for feed in self.cex if feed.spot_symbol]
+
+    def future_symbols(self) -> List[str]:
+        return [feed.future_symbol for feed in self.cex if feed.future_symbol]
+
+
+def _read_config(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.json'):
+            return json.load(f)
+        return yaml.safe_load(f) or {}
+
+
+def parse_registry(config: dict) -> VenueRegistry:
+    """Validate a config dict and build the registry; raises ValueError on bad entries."""
+    dex_venues = []
+    seen_names, seen_ids = set(), set()
+    for entry in config.get('dex', []):
+        venue = DexVenue(
+            name=entry['name'],
+            type=entry['type'],
+            dex_type=int(entry['dex_type']),
+            chain=entry['chain'],
+            params=dict(entry.get('params') or {}),
+            asset=entry.get('asset'),
+        )
+        if venue.type not in DEX_TYPES:
+            raise ValueError(f"Unknown dex type {venue.type!r} for venue {venue.name!r}")
+        if venue.name in seen_names or venue.dex_type in seen_ids:
+            raise ValueError(f"Duplicate dex venue name or dex_type: {venue.name!r} / {venue.dex_type}")
+        seen_names.add(venue.name)
+        seen_ids.add(venue.dex_type)
+        dex_venues.append(venue)
+
+    cex_feeds = []
+    for entry in config.get('cex', []):
+        feed = CexFeed(
+            name=entry['name'],
+            type=entry.get('type', 'aster'),
+            cex=int(entry['cex']),
+            symbol=entry['symbol'],
+            spot_symbol=entry.get('spot_symbol'),
+            future_symbol=entry.get('future_symbol'),
+            history=bool(entry.get('history', False)),
+        )
+        if feed.type not in CEX_TYPES:
+            raise ValueError(f"Unknown cex type {feed.type!r} for feed {feed.name!r}")
+        cex_feeds.append(feed)
+
+    klines = config.get('klines') or {}
+    kline_symbols = KlineSymbols(
+        interval=klines.get('interval', '1h'),
+        aster_spot=list(klines.get('aster_spot', [])),
+        aster_future=list(klines.get('aster_future', [])),
+        alpha=list(klines.get('alpha', [])),
+    )
+    return VenueRegistry(dex_venues, cex_feeds, kline_symbols)
+
+
+def load_registry(path: Optional[str] = None) -> VenueRegistry:
+    """Load the registry from `path`, $VENUES_CONFIG or venues.yaml."""
+    path = path or os.environ.get('VENUES_CONFIG', DEFAULT_CONFIG_PATH)
+    return parse_registry(_read_config(path))